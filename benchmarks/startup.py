@@ -0,0 +1,63 @@
+"""
+Measures the startup: the time to import the models and the URL
+configuration and to run manage.py check, each in fresh processes.
+
+    python benchmarks/startup.py [--repeat N]
+
+Prints one JSON object per measurement with the fastest of N runs and the
+optional dependencies (see HEAVY) the imports loaded.
+"""
+import json
+import optparse
+import subprocess
+import sys
+import time
+from os.path import abspath, dirname, join as path_join
+
+BASE_DIR = dirname(dirname(abspath(__file__)))
+
+# dependencies only needed once repositories or job configurations are used
+HEAVY = ('pygit2', 'lxml.etree', 'vcs.git', 'jenkins.jobs')
+
+IMPORT = """
+import json, os, sys, time
+sys.path.insert(0, {base!r})
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'riot_job_manager.settings')
+start = time.time()
+{imports}
+print json.dumps({{'seconds': time.time() - start,
+                   'loaded': [m for m in {heavy!r} if m in sys.modules]}})
+"""
+
+def import_time(modules):
+    """Seconds to import modules in a fresh interpreter and the HEAVY ones
+    this loaded"""
+    code = IMPORT.format(base=BASE_DIR, heavy=HEAVY, imports='\n'.join(
+        'import ' + module for module in modules))
+    return json.loads(subprocess.check_output([sys.executable, '-c', code]))
+
+def check_time():
+    """Wall seconds of manage.py check"""
+    with open('/dev/null', 'w') as devnull:
+        start = time.time()
+        subprocess.check_call([sys.executable,
+                               path_join(BASE_DIR, 'manage.py'), 'check'],
+                              stdout=devnull, stderr=devnull)
+        return time.time() - start
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--repeat', type='int', default=5)
+    options, _ = parser.parse_args()
+
+    for name, modules in (('import models', ['board_app_creator.models']),
+                          ('import urls', ['board_app_creator.urls'])):
+        runs = [import_time(modules) for _ in range(options.repeat)]
+        print json.dumps({'name': name, 'loaded': runs[0]['loaded'],
+                          'seconds': round(min(r['seconds'] for r in runs),
+                                           3)}, sort_keys=True)
+    print json.dumps({'name': 'manage.py check', 'seconds': round(min(
+        check_time() for _ in range(options.repeat)), 3)}, sort_keys=True)
+
+if __name__ == '__main__':
+    main()
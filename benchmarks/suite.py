@@ -0,0 +1,228 @@
+"""
+Benchmarks the repository, Makefile and Jenkins sync paths and the key
+views on a synthetic RIOT-like repository and jobs path.
+
+    python benchmarks/suite.py [--boards N] [--applications M] [--jobs K]
+                               [--output FILE] [--compare FILE]
+
+Every benchmark runs in a forked process on a file-based SQLite data base,
+so its peak memory can be told apart. It reports the wall time, the data
+base queries, the git objects read and the peak resident set size (with
+the size before the benchmark as base). The syncs run in order, each on
+the state the previous one left. The results are printed as JSON and
+optionally written to FILE together with the commit they were taken at.
+--compare prints them next to an earlier FILE.
+"""
+import json
+import optparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from os.path import abspath, dirname, join as path_join
+
+BASE_DIR = dirname(dirname(abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'riot_job_manager.settings')
+
+VIEWS = (
+    ('job-list', ()),
+    ('board-list', ()),
+    ('application-list', ()),
+    ('repository-list', ()),
+    ('job-coverage', ()),
+    ('job-graph', ()),
+)
+
+class Counters(object):
+    """
+    Counts the queries of all data base connections and the objects read
+    from git repositories.
+    """
+    def __init__(self):
+        from django.db.backends import util
+        import pygit2
+        self.queries = self.git_reads = 0
+        for name in ('execute', 'executemany'):
+            setattr(util.CursorWrapper, name,
+                    self._wrap(getattr(util.CursorWrapper, name), 'queries'))
+        pygit2.Repository.get = self._wrap(pygit2.Repository.get,
+                                           'git_reads')
+
+    def _wrap(self, method, counter):
+        def wrapper(*args, **kwargs):
+            setattr(self, counter, getattr(self, counter) + 1)
+            return method(*args, **kwargs)
+        return wrapper
+
+def memory_kb(field):
+    """VmRSS (resident) or VmHWM (peak resident) of this process in kB"""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    return None
+
+def reset_peak():
+    """Resets VmHWM to the current resident set size (Linux 4.0+)"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except IOError:
+        pass
+
+def measure(counters, name, func, setup=None):
+    """
+    Runs setup() and then func() in a child process and returns the
+    measurements of func() as a dict.
+    """
+    from django.db import connection
+    connection.close()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            args = setup() if setup else ()
+            queries, git_reads = counters.queries, counters.git_reads
+            reset_peak()
+            base = memory_kb('VmRSS')
+            start = time.time()
+            extra = func(*args) or {}
+            result = dict(extra, seconds=round(time.time() - start, 3),
+                          queries=counters.queries - queries,
+                          git_reads=counters.git_reads - git_reads,
+                          base_rss_kb=base, peak_rss_kb=memory_kb('VmHWM'))
+        except Exception:
+            result = {'error': traceback.format_exc()}
+        os.write(write_fd, json.dumps(result))
+        os._exit(0)
+    os.close(write_fd)
+    chunks = []
+    while True:
+        chunk = os.read(read_fd, 65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+    result = json.loads(''.join(chunks) or '{"error": "no result"}')
+    result['name'] = name
+    return result
+
+def _repository():
+    from board_app_creator import models
+    repo = models.Repository.objects.get()
+    repo.vcs_repo
+    return (repo,)
+
+def _view(url):
+    from django.core.cache import cache
+    from django.test import Client
+    cache.clear()
+    return {'status': Client().get(url).status_code}
+
+def run(options, base):
+    from django.conf import settings
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['testserver']
+    settings.DATABASES['default']['NAME'] = path_join(base, 'db.sqlite3')
+    settings.RIOT_REPO_BASE_PATH = path_join(base, 'repos')
+    settings.JENKINS_JOBS_PATH = path_join(base, 'jobs')
+    settings.JENKINS_JOBS_BACKEND = 'filesystem'
+
+    from django.core.management import call_command
+    from django.core.urlresolvers import reverse
+    from benchmarks import synthetic
+
+    call_command('syncdb', interactive=False, verbosity=0)
+    from board_app_creator import models
+
+    boards = synthetic.board_names(options.boards)
+    applications = synthetic.application_names(options.applications)
+    url = path_join(base, 'RIOT.git')
+    synthetic.create_repository(url, boards, applications)
+    synthetic.clone(url, path_join(settings.RIOT_REPO_BASE_PATH, 'RIOT'))
+    synthetic.create_jobs(settings.JENKINS_JOBS_PATH, boards, applications,
+                          count=options.jobs, multijobs=True)
+    models.Repository.objects.bulk_create([models.Repository(
+        url=url, path='RIOT', is_default=True, has_boards_tree=True,
+        boards_tree='boards', has_cpu_tree=True, cpu_tree='cpu')])
+    repo = models.Repository.objects.get()
+    models.JobNamespace.objects.create(name='RIOT', repository=repo)
+
+    counters = Counters()
+    results = [
+        measure(counters, 'update_boards', lambda r: r.update_boards(),
+                _repository),
+        measure(counters, 'add_application_trees',
+                lambda r: r.add_application_trees(['examples']), _repository),
+        measure(counters, 'update_applications',
+                lambda r: r.update_applications(), _repository),
+        measure(counters, 'create_from_jenkins_xml',
+                models.Job.create_from_jenkins_xml),
+    ]
+    job = models.Job.objects.order_by('pk').values_list('pk', flat=True)[0]
+    for name, args in VIEWS + (('job-detail', (job,)),):
+        path = reverse(name, args=args)
+        results.append(measure(counters, 'view ' + name,
+                               lambda path=path: _view(path)))
+    return results
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                       cwd=BASE_DIR).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(old, new):
+    """Prints the seconds and queries of new next to the ones of old"""
+    old_results = dict((r['name'], r) for r in old['results'])
+    print '{:<32} {:>9} {:>9} {:>7} {:>9} {:>9}'.format(
+        'benchmark', 'old s', 'new s', 'ratio', 'old q', 'new q')
+    for result in new['results']:
+        before = old_results.get(result['name'], {})
+        seconds = result.get('seconds')
+        ratio = seconds / before['seconds'] \
+                if before.get('seconds') and seconds is not None else None
+        print '{:<32} {:>9} {:>9} {:>7} {:>9} {:>9}'.format(
+            result['name'], before.get('seconds'), seconds,
+            '{:.2f}'.format(ratio) if ratio is not None else '-',
+            before.get('queries'), result.get('queries'))
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--boards', type='int', default=100)
+    parser.add_option('--applications', type='int', default=60)
+    parser.add_option('--jobs', type='int', default=500)
+    parser.add_option('--output', default=None,
+                      help="File to write the results to as JSON.")
+    parser.add_option('--compare', default=None,
+                      help="Results file of an earlier run.")
+    options, _ = parser.parse_args()
+
+    base = tempfile.mkdtemp()
+    try:
+        results = run(options, base)
+    finally:
+        shutil.rmtree(base)
+    data = {'commit': git_commit(), 'time': int(time.time()),
+            'parameters': {'boards': options.boards,
+                           'applications': options.applications,
+                           'jobs': options.jobs},
+            'results': results}
+    for result in results:
+        print json.dumps(result, sort_keys=True)
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+    if options.compare:
+        with open(options.compare) as f:
+            compare(json.load(f), data)
+
+if __name__ == '__main__':
+    main()
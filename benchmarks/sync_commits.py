@@ -0,0 +1,118 @@
+"""
+Counts the transactions committed by each sync path on a file-based SQLite
+data base with a synthetic repository and jobs path.
+
+    python benchmarks/sync_commits.py [--boards N] [--applications N]
+
+Prints one JSON object per sync with its commits, write statements and
+wall time.
+"""
+import json
+import optparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from os.path import abspath, dirname, join as path_join
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'riot_job_manager.settings')
+
+WRITES = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+class CommitCounter(object):
+    """
+    Counts commits of the default connection: write statements executed in
+    autocommit mode and commits of outermost atomic blocks.
+    """
+    def __init__(self, connection):
+        from django.db.backends import util
+        self.connection = connection
+        self.commits = self.writes = 0
+        for name in ('execute', 'executemany'):
+            setattr(util.CursorWrapper, name,
+                    self._wrap(getattr(util.CursorWrapper, name)))
+        commit = connection._commit
+        def _commit():
+            self.commits += 1
+            return commit()
+        connection._commit = _commit
+
+    def _wrap(self, method):
+        def wrapper(cursor, sql, *args, **kwargs):
+            self._statement(sql)
+            return method(cursor, sql, *args, **kwargs)
+        return wrapper
+
+    def _statement(self, sql):
+        if sql.lstrip().upper().startswith(WRITES):
+            self.writes += 1
+            if not self.connection.in_atomic_block:
+                self.commits += 1
+
+    def measure(self, name, func, *args):
+        commits, writes, start = self.commits, self.writes, time.time()
+        func(*args)
+        return {'sync': name, 'commits': self.commits - commits,
+                'writes': self.writes - writes,
+                'seconds': round(time.time() - start, 3)}
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--boards', type='int', default=50)
+    parser.add_option('--applications', type='int', default=40)
+    options, _ = parser.parse_args()
+
+    base = tempfile.mkdtemp()
+    try:
+        from django.conf import settings
+        settings.DEBUG = False
+        settings.DATABASES['default']['NAME'] = path_join(base, 'db.sqlite3')
+        settings.RIOT_REPO_BASE_PATH = path_join(base, 'repos')
+        settings.JENKINS_JOBS_PATH = path_join(base, 'jobs')
+
+        from django.core.management import call_command
+        from django.db import connection
+        from benchmarks import synthetic
+        import usb
+
+        call_command('syncdb', interactive=False, verbosity=0)
+        from board_app_creator import models
+
+        boards = synthetic.board_names(options.boards)
+        applications = synthetic.application_names(options.applications)
+        url = path_join(base, 'RIOT.git')
+        synthetic.create_repository(url, boards, applications)
+        synthetic.clone(url, path_join(settings.RIOT_REPO_BASE_PATH, 'RIOT'))
+        synthetic.create_jobs(settings.JENKINS_JOBS_PATH, boards[:10],
+                              applications)
+        devices = [usb.USBDevice('/dev/bus/usb/001/{:03d}'.format(i), 'Board',
+                                 '0403:{:04x}'.format(i)) for i in range(20)]
+
+        models.Repository.objects.bulk_create([models.Repository(
+            url=url, path='RIOT', is_default=True, has_boards_tree=True,
+            boards_tree='boards')])
+        repo = models.Repository.objects.get()
+        repo.vcs_repo
+        models.JobNamespace.objects.create(name='RIOT', repository=repo)
+
+        counter = CommitCounter(connection)
+        results = [
+            counter.measure('update_boards', repo.update_boards),
+            counter.measure('add_application_trees',
+                            repo.add_application_trees, ['examples']),
+            counter.measure('update_applications', repo.update_applications),
+            counter.measure('create_from_jenkins_xml',
+                            models.Job.create_from_jenkins_xml),
+            counter.measure('update_from_system',
+                            models.USBDevice.objects.update_from_system,
+                            devices),
+        ]
+        for result in results:
+            print json.dumps(result)
+    finally:
+        shutil.rmtree(base)
+
+if __name__ == '__main__':
+    main()
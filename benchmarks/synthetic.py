@@ -0,0 +1,158 @@
+"""
+Synthetic RIOT repositories and Jenkins job configurations for benchmarks.
+"""
+import os
+from os.path import join as path_join
+
+import pygit2
+
+JOB_CONFIG = """<?xml version='1.0' encoding='UTF-8'?>
+<project>
+  <description>{name}</description>
+  <builders>
+    <hudson.tasks.Shell>
+      <command>make -C {path} BOARD={board} all</command>
+    </hudson.tasks.Shell>
+  </builders>
+</project>
+"""
+
+MULTIJOB_CONFIG = """<?xml version='1.0' encoding='UTF-8'?>
+<com.tikal.jenkins.plugins.multijob.MultiJobProject>
+  <builders>
+    <com.tikal.jenkins.plugins.multijob.MultiJobBuilder>
+      <phaseName>{name}</phaseName>
+      <phaseJobs>
+{jobs}      </phaseJobs>
+    </com.tikal.jenkins.plugins.multijob.MultiJobBuilder>
+  </builders>
+</com.tikal.jenkins.plugins.multijob.MultiJobProject>
+"""
+
+PHASE_JOB = """        <com.tikal.jenkins.plugins.multijob.PhaseJobsConfig>
+          <jobName>{}</jobName>
+        </com.tikal.jenkins.plugins.multijob.PhaseJobsConfig>
+"""
+
+CPU_COUNT = 8
+
+def board_names(count):
+    return ['board{:04d}'.format(i) for i in range(count)]
+
+def application_names(count):
+    return ['app{:04d}'.format(i) for i in range(count)]
+
+def _tree(repo, entries):
+    """Writes a tree of entries, a dict of names to blob contents or dicts"""
+    builder = repo.TreeBuilder()
+    for name, content in sorted(entries.items()):
+        if isinstance(content, dict):
+            builder.insert(name, _tree(repo, content),
+                           pygit2.GIT_FILEMODE_TREE)
+        else:
+            builder.insert(name, repo.create_blob(content),
+                           pygit2.GIT_FILEMODE_BLOB)
+    return builder.write()
+
+def _board_list(variable, boards, per_line=4):
+    """A board list assignment continued after every per_line boards"""
+    chunks = [' '.join(boards[i:i + per_line])
+              for i in range(0, len(boards), per_line)]
+    return '{} := {}'.format(variable, ' \\\n    '.join(chunks))
+
+def makefile(application, blacklist=(), whitelist=(), insufficient_ram=()):
+    lines = ['APPLICATION = {}'.format(application),
+             'BOARD ?= native',
+             'RIOTBASE ?= $(CURDIR)/../..']
+    if blacklist:
+        lines.append(_board_list('BOARD_BLACKLIST', list(blacklist)))
+    if insufficient_ram:
+        lines.append(_board_list('BOARD_INSUFFICIENT_RAM',
+                                 list(insufficient_ram)))
+    if whitelist:
+        lines.append(_board_list('BOARD_WHITELIST', list(whitelist)))
+    lines += ['USEMODULE += xtimer', 'QUIET ?= 1',
+              'include $(RIOTBASE)/Makefile.include']
+    return '\n'.join(lines) + '\n'
+
+def application_makefile(i, application, boards):
+    """
+    The Makefile of the i-th application: every third one blacklists six
+    boards, every fourth one has too little RAM on the last three and every
+    fifth one whitelists every seventh board.
+    """
+    return makefile(application,
+                    boards[i % 7:i % 7 + 6] if i % 3 == 0 else (),
+                    boards[::7][:10] if i % 5 == 0 else (),
+                    boards[-3:] if i % 4 == 0 else ())
+
+def create_repository(path, boards, applications, files=None):
+    """
+    Creates a git repository at path, to be used as the URL of a Repository,
+    with a commit of a boards tree with the given boards, a cpu tree and an
+    examples tree with the given applications (see application_makefile()).
+    files maps further paths to contents. Returns the pygit2 repository.
+    """
+    repo = pygit2.init_repository(path)
+    commit(repo, boards, applications, files)
+    return repo
+
+def clone(url, path):
+    """Clones url to path like Repository.vcs_repo expects it"""
+    return pygit2.clone_repository(url, path)
+
+def commit(repo, boards, applications, files=None, message='Synthetic tree'):
+    """Commits a new version of the synthetic tree to master"""
+    entries = {
+        'boards': dict((b, {
+            'Makefile': 'MODULE = board\ninclude $(RIOTBASE)/Makefile.base\n',
+            'Makefile.include': 'export CPU = cpu{}\n'.format(i % CPU_COUNT),
+        }) for i, b in enumerate(boards)),
+        'cpu': dict(('cpu{}'.format(i), {'Makefile': 'MODULE = cpu\n'})
+                    for i in range(CPU_COUNT)),
+        'examples': dict((a, {'Makefile': application_makefile(i, a, boards),
+                              'main.c': 'int main(void) { return 0; }\n'})
+                         for i, a in enumerate(applications)),
+    }
+    for name, content in (files or {}).items():
+        node = entries
+        parts = name.split('/')
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = content
+    signature = pygit2.Signature('Benchmark', 'benchmark@example.org', 0, 0)
+    parents = [] if repo.head_is_unborn else [repo.head.target]
+    return repo.create_commit('refs/heads/master', signature, signature,
+                              message, _tree(repo, entries), parents)
+
+def _write_job(path, name, config):
+    os.makedirs(path_join(path, name))
+    with open(path_join(path, name, 'config.xml'), 'w') as f:
+        f.write(config)
+
+def create_jobs(path, boards, applications, prefix='RIOT', count=None,
+                multijobs=False):
+    """
+    Writes a job configuration for every board and application, or the
+    first count of them, to path and returns the job names. With multijobs
+    a MultiJob per application lists its jobs.
+    """
+    names = []
+    for board in boards:
+        for app in applications:
+            if count is not None and len(names) >= count:
+                break
+            name = '{}-{}-{}'.format(prefix, board, app)
+            _write_job(path, name, JOB_CONFIG.format(
+                name=name, path=path_join('examples', app), board=board))
+            names.append(name)
+    if multijobs:
+        for app in applications:
+            jobs = [n for n in names if n.endswith('-' + app)]
+            if jobs:
+                name = '{}-{}-all'.format(prefix, app)
+                _write_job(path, name, MULTIJOB_CONFIG.format(
+                    name=name, jobs=''.join(PHASE_JOB.format(j)
+                                            for j in jobs)))
+                names.append(name)
+    return names
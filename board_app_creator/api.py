@@ -0,0 +1,206 @@
+"""
+Read-only JSON API for board_app_creator.
+
+Lists are paginated by keyset: the cursor holds the ordering values of the
+last row of a page and the next page continues after them, so deep pages
+cost as much as the first one. Every response carries an ETag derived from
+the change counters of the tables involved; a matching If-None-Match is
+answered with 304 before any row is read.
+"""
+import base64
+import hashlib
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import HttpResponse, HttpResponseBadRequest, \
+                        HttpResponseNotModified
+from django.views.generic import View
+
+from board_app_creator import models
+
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values))
+
+def decode_cursor(cursor, ordering):
+    """
+    Values of the fields in ordering held by cursor; raises ValueError if
+    the cursor does not hold one value per field.
+    """
+    values = json.loads(base64.urlsafe_b64decode(str(cursor)))
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise ValueError("cursor does not match the ordering")
+    return values
+
+def keyset_filter(ordering, values):
+    """
+    Q object for all rows after the row with the given values of the fields
+    in ordering (field names prefixed with '-' are descending).
+    """
+    q = Q()
+    for i, field in enumerate(ordering):
+        descending = field.startswith('-')
+        name = field.lstrip('-')
+        lookup = '{}__{}'.format(name, 'lt' if descending else 'gt')
+        step = Q(**{lookup: values[i]})
+        for prev_field, prev_value in zip(ordering[:i], values[:i]):
+            step &= Q(**{prev_field.lstrip('-'): prev_value})
+        q |= step
+    return q
+
+class APIList(View):
+    """
+    Lists the rows of model as JSON objects.
+
+    fields maps output names to lookups for values(), filters maps query
+    parameters to lookups, tables lists the models whose change counters
+    make up the ETag.
+    """
+    model = None
+    fields = ()
+    filters = {}
+    tables = ()
+
+    def get_ordering(self):
+        ordering = list(self.model._meta.ordering)
+        if 'pk' not in ordering and 'id' not in ordering:
+            ordering.append('pk')
+        return ordering
+
+    def get_queryset(self):
+        qs = self.model._default_manager.all()
+        for param, lookup in self.filters.items():
+            if param in self.request.GET:
+                qs = qs.filter(**{lookup: self.request.GET[param]})
+        return qs
+
+    def get_etag(self):
+        versions = models.ChangeCounter.objects.versions(self.model,
+                                                         *self.tables)
+        key = json.dumps([self.request.path, sorted(self.request.GET.items()),
+                          versions])
+        return '"{}"'.format(hashlib.md5(key).hexdigest())
+
+    def get(self, request):
+        etag = self.get_etag()
+        if etag in request.META.get('HTTP_IF_NONE_MATCH', '').split(', '):
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+
+        try:
+            limit = min(int(request.GET.get('limit',
+                                            settings.RIOT_DEFAULT_PAGINATION)),
+                        MAX_PAGE_SIZE)
+        except ValueError:
+            return HttpResponseBadRequest("limit must be an integer")
+
+        ordering = self.get_ordering()
+        order_fields = [f.lstrip('-') for f in ordering]
+        qs = self.get_queryset().order_by(*ordering)
+        if 'cursor' in request.GET:
+            try:
+                qs = qs.filter(keyset_filter(
+                    ordering, decode_cursor(request.GET['cursor'], ordering)))
+            except (TypeError, ValueError):
+                return HttpResponseBadRequest("invalid cursor")
+
+        lookups = [lookup for _, lookup in self.fields]
+        rows = list(qs.values(*(lookups + order_fields))[:limit + 1])
+        results = [dict((name, row[lookup]) for name, lookup in self.fields)
+                   for row in rows[:limit]]
+
+        next_url = None
+        if len(rows) > limit:
+            params = request.GET.copy()
+            params['cursor'] = encode_cursor([rows[limit - 1][f]
+                                              for f in order_fields])
+            next_url = request.build_absolute_uri(
+                '{}?{}'.format(request.path, params.urlencode()))
+
+        response = HttpResponse(json.dumps({'results': results,
+                                            'next': next_url}),
+                                content_type='application/json')
+        response['ETag'] = etag
+        return response
+
+class JobAPIList(APIList):
+    model = models.Job
+    fields = (
+        ('id', 'pk'),
+        ('name', 'name'),
+        ('namespace', 'namespace__name'),
+        ('upstream_job', 'upstream_job__name'),
+        ('update_behavior', 'update_behavior'),
+        ('board', 'applicationjob__board__riot_name'),
+        ('application', 'applicationjob__application__name'),
+    )
+    filters = {
+        'namespace': 'namespace__name',
+        'board': 'applicationjob__board__riot_name',
+        'application': 'applicationjob__application__name',
+    }
+    tables = (models.ApplicationJob, models.JobNamespace, models.Board,
+              models.Application)
+
+class ApplicationJobAPIList(APIList):
+    model = models.ApplicationJob
+    fields = JobAPIList.fields[:5] + (
+        ('board', 'board__riot_name'),
+        ('application', 'application__name'),
+    )
+    filters = {
+        'namespace': 'namespace__name',
+        'board': 'board__riot_name',
+        'application': 'application__name',
+    }
+    tables = (models.Job, models.JobNamespace, models.Board,
+              models.Application)
+
+class BoardAPIList(APIList):
+    model = models.Board
+    fields = (
+        ('id', 'pk'),
+        ('riot_name', 'riot_name'),
+        ('repository', 'repo__url'),
+        ('cpu_repository', 'cpu_repo__url'),
+        ('usb_device', 'usb_device__usb_id'),
+        ('no_board', 'no_board'),
+    )
+    filters = {
+        'namespace': 'repo__job_namespace__name',
+    }
+    tables = (models.Repository, models.JobNamespace, models.USBDevice)
+
+class ApplicationAPIList(APIList):
+    model = models.Application
+    fields = (
+        ('id', 'pk'),
+        ('name', 'name'),
+        ('path', 'path'),
+        ('no_application', 'no_application'),
+    )
+    filters = {
+        'namespace': 'repository__job_namespace__name',
+    }
+    tables = (models.ApplicationTree, models.JobNamespace)
+
+class RepositoryAPIList(APIList):
+    model = models.Repository
+    fields = (
+        ('id', 'pk'),
+        ('url', 'url'),
+        ('path', 'path'),
+        ('vcs', 'vcs'),
+        ('default_branch', 'default_branch'),
+        ('boards_tree', 'boards_tree'),
+        ('cpu_tree', 'cpu_tree'),
+        ('is_default', 'is_default'),
+        ('namespace', 'job_namespace__name'),
+    )
+    filters = {
+        'namespace': 'job_namespace__name',
+    }
+    tables = (models.JobNamespace,)
@@ -0,0 +1,203 @@
+"""
+In-memory coverage of (board, application) pairs by application jobs.
+"""
+from bisect import bisect_right
+
+from board_app_creator import models
+
+STATES = (
+    ('J', 'job'),
+    ('B', 'blacklisted'),
+    ('W', 'whitelisted'),
+    ('X', 'not whitelisted'),
+    ('M', 'missing'),
+)
+
+class CoverageMatrix(object):
+    """
+    Bitmap of the (board, application) pairs that already have a job.
+
+    Boards and applications are indexed in name order. rows[i] has bit j set
+    if board i has a job for application j, columns[j] is the transposed
+    bitmap of application j. blacklists[i] and whitelists[i] are the
+    bitmaps of the applications that black- or whitelist board i; only
+    states() needs them, so if lists is given they are left to it to load
+    as the (blacklisted, whitelisted) pairs it returns.
+    """
+    def __init__(self, board_names, application_names, pairs,
+                 blacklisted=(), whitelisted=(), hidden_boards=(),
+                 hidden_applications=(), lists=None):
+        self.board_names = sorted(board_names)
+        self.application_names = sorted(application_names)
+        self.board_index = dict((n, i) for i, n in enumerate(self.board_names))
+        self.application_index = dict((n, i) for i, n in
+                                      enumerate(self.application_names))
+        self.rows = self._bitmaps(pairs)
+        self.columns = [0] * len(self.application_names)
+        for i, row in enumerate(self.rows):
+            for j in self._bits(row):
+                self.columns[j] |= 1 << i
+        self.blacklists = self.whitelists = None
+        self._lists = lists
+        if lists is None:
+            self._set_lists(blacklisted, whitelisted)
+        self.hidden_boards = set(hidden_boards)
+        self.hidden_applications = set(hidden_applications)
+        self._states = None
+
+    def _bitmaps(self, pairs):
+        bitmaps = [0] * len(self.board_names)
+        for board_name, application_name in pairs:
+            bitmaps[self.board_index[board_name]] |= \
+                1 << self.application_index[application_name]
+        return bitmaps
+
+    def _set_lists(self, blacklisted, whitelisted):
+        self.blacklists = self._bitmaps(blacklisted)
+        self.whitelists = self._bitmaps(whitelisted)
+        self.whitelisting = 0
+        for whitelist in self.whitelists:
+            self.whitelisting |= whitelist
+
+    @staticmethod
+    def _bits(bits):
+        while bits:
+            lowest = bits & -bits
+            yield lowest.bit_length() - 1
+            bits ^= lowest
+
+    @classmethod
+    def from_db(cls):
+        """
+        Builds the matrix from the boards, applications, the distinct
+        (board, application) pairs of all application jobs; the black-
+        and whitelists of all applications are read on the first states().
+        """
+        boards = {}
+        hidden_boards = []
+        for pk, name, no_board in models.Board.objects.values_list(
+                'pk', 'riot_name', 'no_board'):
+            boards[pk] = name
+            if no_board:
+                hidden_boards.append(name)
+        applications = {}
+        hidden_applications = []
+        for pk, name, no_application in models.Application.objects.values_list(
+                'pk', 'name', 'no_application'):
+            applications[pk] = name
+            if no_application:
+                hidden_applications.append(name)
+        pairs = models.ApplicationJob.objects.filter(
+            board__isnull=False, application__isnull=False).values_list(
+            'board_id', 'application_id').distinct()
+        def lists():
+            # boards and applications added since are not in the matrix
+            return [((boards[b], applications[a]) for b, a in
+                     field.through.objects.values_list('board_id',
+                                                       'application_id')
+                     if b in boards and a in applications)
+                    for field in (models.Application.blacklisted_boards,
+                                  models.Application.whitelisted_boards)]
+        return cls(boards.values(), applications.values(),
+                   ((boards[b], applications[a]) for b, a in pairs),
+                   hidden_boards=hidden_boards,
+                   hidden_applications=hidden_applications, lists=lists)
+
+    def states(self):
+        """
+        Boards, applications and one string of state letters (see STATES)
+        per board for all boards and applications not hidden. Computed
+        once per matrix.
+        """
+        if self._states is None:
+            if self.blacklists is None:
+                self._set_lists(*self._lists())
+            boards = [i for i, n in enumerate(self.board_names)
+                      if n not in self.hidden_boards]
+            applications = [j for j, n in enumerate(self.application_names)
+                            if n not in self.hidden_applications]
+            rows = []
+            for i in boards:
+                jobs = self.rows[i]
+                blacklist = self.blacklists[i]
+                whitelist = self.whitelists[i]
+                excluded = self.whitelisting & ~whitelist
+                row = []
+                for j in applications:
+                    bit = 1 << j
+                    if jobs & bit:
+                        row.append('J')
+                    elif blacklist & bit:
+                        row.append('B')
+                    elif whitelist & bit:
+                        row.append('W')
+                    elif excluded & bit:
+                        row.append('X')
+                    else:
+                        row.append('M')
+                rows.append(''.join(row))
+            self._states = ([self.board_names[i] for i in boards],
+                            [self.application_names[j] for j in applications],
+                            rows)
+        return self._states
+
+    def has_job(self, board_name, application_name):
+        i = self.board_index[board_name]
+        j = self.application_index[application_name]
+        return bool(self.rows[i] >> j & 1)
+
+    @staticmethod
+    def _first_missing(bits, start, length):
+        """Index of the first unset bit in bits at or after start or None"""
+        missing = ~bits & ((1 << length) - 1) & ~((1 << start) - 1)
+        if not missing:
+            return None
+        return (missing & -missing).bit_length() - 1
+
+    def next_missing(self, prev_application_name, prev_board_name):
+        """
+        The next (application, board) pair without a job: first the
+        applications after prev_application_name on prev_board_name, then
+        the boards after prev_board_name for prev_application_name.
+        Returns (None, None) if there is none.
+        """
+        if prev_board_name in self.board_index:
+            row = self.rows[self.board_index[prev_board_name]]
+        else:
+            row = 0
+        j = self._first_missing(row,
+            bisect_right(self.application_names, prev_application_name),
+            len(self.application_names))
+        if j is not None:
+            return self.application_names[j], prev_board_name
+
+        if prev_application_name in self.application_index:
+            column = self.columns[self.application_index[prev_application_name]]
+        else:
+            column = 0
+        i = self._first_missing(column,
+            bisect_right(self.board_names, prev_board_name),
+            len(self.board_names))
+        if i is not None:
+            return prev_application_name, self.board_names[i]
+        return None, None
+
+# the tables the matrix is built from
+TABLES = (models.Board, models.Application, models.ApplicationJob,
+          models.Application.blacklisted_boards.through,
+          models.Application.whitelisted_boards.through)
+
+_matrix = None
+_version = None
+
+def get_matrix():
+    """
+    The cached coverage matrix, rebuilt from the data base if the change
+    counters of its tables changed, in any process.
+    """
+    global _matrix, _version
+    version = models.ChangeCounter.objects.versions(*TABLES)
+    if _matrix is None or version != _version:
+        _matrix = CoverageMatrix.from_db()
+        _version = version
+    return _matrix
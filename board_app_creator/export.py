@@ -0,0 +1,92 @@
+"""
+Streaming exports of jobs and the job coverage as CSV or JSON lines.
+
+Rows are fetched in chunks of CHUNK_SIZE ordered by primary key, each chunk
+continuing after the last key of the previous one, and formatted one line
+at a time. Memory use does not depend on the number of rows and the first
+lines are sent as soon as the first chunk is read.
+"""
+import csv
+import json
+
+from board_app_creator import coverage, models
+
+CHUNK_SIZE = 1000
+
+JOB_FIELDS = (
+    ('id', 'pk'),
+    ('name', 'name'),
+    ('namespace', 'namespace__name'),
+    ('upstream_job', 'upstream_job__name'),
+    ('update_behavior', 'update_behavior'),
+    ('board', 'applicationjob__board__riot_name'),
+    ('application', 'applicationjob__application__name'),
+    ('compiler', 'applicationjob__compiler'),
+)
+
+COVERAGE_FIELDS = ('board', 'application', 'state')
+
+def iter_rows(queryset, lookups, chunk_size=CHUNK_SIZE):
+    """
+    Yields tuples of the values of lookups for all rows of queryset.
+    """
+    last_pk = None
+    while True:
+        qs = queryset.order_by('pk')
+        if last_pk is not None:
+            qs = qs.filter(pk__gt=last_pk)
+        chunk = list(qs.values_list('pk', *lookups)[:chunk_size])
+        for row in chunk:
+            yield row[1:]
+        if len(chunk) < chunk_size:
+            return
+        last_pk = chunk[-1][0]
+
+def iter_jobs(queryset=None, chunk_size=CHUNK_SIZE):
+    if queryset is None:
+        queryset = models.Job.objects.all()
+    behaviors = dict(models.Job._meta.get_field('update_behavior').choices)
+    index = [name for name, _ in JOB_FIELDS].index('update_behavior')
+    for row in iter_rows(queryset, [lookup for _, lookup in JOB_FIELDS],
+                         chunk_size):
+        row = list(row)
+        row[index] = behaviors.get(row[index], row[index])
+        yield row
+
+def iter_coverage():
+    """
+    Yields (board, application, state) for all pairs of the coverage
+    matrix.
+    """
+    states = dict(coverage.STATES)
+    boards, applications, rows = coverage.get_matrix().states()
+    for board, row in zip(boards, rows):
+        for application, state in zip(applications, row):
+            yield board, application, states[state]
+
+class _Line(object):
+    """File-like object whose write() returns what was written"""
+    def write(self, value):
+        return value
+
+def _encode(value):
+    if value is None:
+        return ''
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+def csv_lines(header, rows):
+    writer = csv.writer(_Line())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([_encode(value) for value in row])
+
+def jsonl_lines(header, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(header, row))) + '\n'
+
+FORMATS = {
+    'csv': (csv_lines, 'text/csv'),
+    'jsonl': (jsonl_lines, 'application/x-ndjson'),
+}
@@ -73,6 +73,72 @@ class JobFromPrototypeForm(forms.ModelForm):
                    'namespace': forms.HiddenInput(),
                    'update_behavior': forms.RadioSelect()}
 
+class JobBulkCreateForm(forms.Form):
+    boards = forms.ModelMultipleChoiceField(
+        queryset=models.Board.objects.all_real(), required=False,
+        widget=forms.CheckboxSelectMultiple)
+    applications = forms.ModelMultipleChoiceField(
+        queryset=models.Application.objects.all_real(), required=False,
+        widget=forms.CheckboxSelectMultiple)
+    all_missing = forms.BooleanField(required=False,
+        label="All missing jobs",
+        help_text="Create the missing jobs of all boards and applications")
+
+    def clean(self):
+        cleaned_data = super(JobBulkCreateForm, self).clean()
+        if not cleaned_data.get('all_missing') and \
+           not (cleaned_data.get('boards') and cleaned_data.get('applications')):
+            raise ValidationError("Select boards and applications or all "
+                                  "missing jobs.")
+        return cleaned_data
+
+class JobFilterForm(forms.Form):
+    q = forms.CharField(required=False, label="Name contains")
+    prefix = forms.CharField(required=False, label="Name starts with")
+    namespace = forms.CharField(required=False)
+    board = forms.CharField(required=False)
+    application = forms.CharField(required=False)
+    compiler = forms.CharField(required=False)
+    update_behavior = forms.TypedChoiceField(required=False, coerce=int,
+        empty_value=None,
+        choices=[('', "Any")] + models.Job._meta.get_field(
+            'update_behavior').choices)
+
+    def filter(self, queryset):
+        """
+        Restricts queryset of jobs to the ones matching the form. Selective
+        substrings are looked up in JobNameTrigram, prefixes as a range of
+        the name index.
+        """
+        if not self.is_valid():
+            return queryset
+        data = self.cleaned_data
+        if data['q']:
+            if len(data['q']) >= 3:
+                jobs = models.JobNameTrigram.objects.matching(data['q'])
+                if jobs is not None:
+                    queryset = queryset.filter(pk__in=jobs)
+            queryset = queryset.filter(name__icontains=data['q'])
+        if data['prefix']:
+            prefix = data['prefix']
+            queryset = queryset.filter(name__gte=prefix,
+                name__lt=prefix[:-1] + unichr(ord(prefix[-1]) + 1))
+        if data['namespace']:
+            queryset = queryset.filter(namespace__name=data['namespace'])
+        if data['board']:
+            queryset = queryset.filter(
+                applicationjob__board__riot_name=data['board'])
+        if data['application']:
+            queryset = queryset.filter(
+                applicationjob__application__name=data['application'])
+        if data['compiler']:
+            queryset = queryset.filter(
+                applicationjob__compiler=data['compiler'])
+        if data['update_behavior'] is not None:
+            queryset = queryset.filter(
+                update_behavior=data['update_behavior'])
+        return queryset
+
 class RepositoryForm(forms.ModelForm):
     class Meta:
         model = models.Repository
@@ -0,0 +1,92 @@
+"""
+Generation of application jobs from the prototype jobs of boards and
+applications.
+"""
+from django.db import transaction
+
+from board_app_creator import models
+from board_app_creator.models import job_name_from_prototype
+
+def plan_jobs(boards=None, applications=None):
+    """
+    All (name, board, application, prototype job) tuples of jobs needed for
+    the query sets boards x applications (all real ones if None) that do
+    not exist yet. See ExpectedJobManager.derive().
+    """
+    existing = set(models.Job.objects.values_list('name', flat=True))
+    return [planned for planned in
+            models.ExpectedJob.objects.derive(boards, applications)
+            if planned[0] not in existing]
+
+def generate_jobs(boards=None, applications=None, progress=None):
+    """
+    Creates the jobs planned by plan_jobs(): the data base rows, their
+    config files and their entries in the MultiJob of their prototype.
+
+    progress is called with (done, total, job name) after each job. Returns
+    a tuple of the names of the created jobs and (name, error) tuples of the
+    jobs and MultiJobs that failed. The MultiJobs are saved even if an
+    unexpected error aborts the generation, so they list every job whose
+    config was written.
+    """
+    import jenkins.backends
+    import jenkins.jobs
+    # requests' connection errors are IOErrors
+    errors = (ValueError, IOError, OSError, jenkins.backends.HTTPError)
+    planned = plan_jobs(boards, applications)
+    backend = models.Job.get_backend()
+    prototype_xmls = {}
+    multijobs = {}
+    created = []
+    failed = []
+    try:
+        with transaction.atomic():
+            for done, (name, board, app, prototype) in enumerate(planned, 1):
+                try:
+                    with transaction.atomic():
+                        job = models.ApplicationJob.objects.create(
+                            name=name, namespace_id=prototype.namespace_id,
+                            upstream_job_id=prototype.upstream_job_id,
+                            board=board, application=app)
+                        if prototype.pk not in prototype_xmls:
+                            prototype_xmls[prototype.pk] = \
+                                jenkins.jobs.ApplicationJob(prototype.name,
+                                    prototype.board.riot_name,
+                                    prototype.application.name,
+                                    prototype.application.path, backend)
+                        xml = jenkins.jobs.ApplicationJob(
+                            name, board.riot_name, app.name, app.path,
+                            backend)
+                        xml.create_from_prototype(prototype_xmls[prototype.pk])
+                    created.append(name)
+                except errors as e:
+                    failed.append((name, str(e)))
+                    continue
+                finally:
+                    if progress:
+                        progress(done, len(planned), name)
+
+                if prototype.upstream_job_id:
+                    if prototype.upstream_job_id not in multijobs:
+                        try:
+                            multijobs[prototype.upstream_job_id] = \
+                                jenkins.jobs.MultiJob(
+                                    prototype.upstream_job.name, backend)
+                        except errors:
+                            multijobs[prototype.upstream_job_id] = None
+                    multijob = multijobs[prototype.upstream_job_id]
+                    if multijob is not None:
+                        try:
+                            multijob.update_job_by_prototype(job, prototype,
+                                                             save=False)
+                        except KeyError:
+                            pass
+    finally:
+        for multijob in multijobs.values():
+            if multijob is None:
+                continue
+            try:
+                multijob.save()
+            except errors as e:
+                failed.append((multijob.name, str(e)))
+    return created, failed
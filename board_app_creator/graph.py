@@ -0,0 +1,228 @@
+"""
+In-memory index of the job graph given by upstream jobs.
+"""
+from collections import deque
+
+from board_app_creator import models
+
+class JobGraph(object):
+    """
+    Directed graph of jobs with an edge from every upstream job to each of
+    its downstream jobs.
+
+    Jobs are indexed in name order. depths[i] is the length of the longest
+    path from a root to job i, or None if job i is on or behind a cycle. If
+    every job has at most one upstream job, the jobs are also numbered in
+    depth-first preorder so that everything downstream of a job is a slice
+    of that order.
+    """
+    def __init__(self, names, edges):
+        self.names = sorted(set(names))
+        self.index = dict((n, i) for i, n in enumerate(self.names))
+        self.children = [[] for _ in self.names]
+        self.parents = [[] for _ in self.names]
+        for upstream, downstream in edges:
+            i, j = self.index[upstream], self.index[downstream]
+            self.children[i].append(j)
+            self.parents[j].append(i)
+        self.edge_count = sum(len(c) for c in self.children)
+        self.roots = [i for i, p in enumerate(self.parents) if not p]
+        self._compute_depths()
+        self._compute_preorder()
+        self._cycles = None
+
+    def _compute_depths(self):
+        self.depths = [None] * len(self.names)
+        pending = [len(p) for p in self.parents]
+        queue = deque(self.roots)
+        for i in self.roots:
+            self.depths[i] = 0
+        while queue:
+            i = queue.popleft()
+            for j in self.children[i]:
+                if self.depths[j] is None or self.depths[j] < self.depths[i] + 1:
+                    self.depths[j] = self.depths[i] + 1
+                pending[j] -= 1
+                if not pending[j]:
+                    queue.append(j)
+        for i, count in enumerate(pending):
+            if count:
+                self.depths[i] = None
+
+    def _compute_preorder(self):
+        self.preorder = self.start = self.end = None
+        if any(len(p) > 1 for p in self.parents):
+            return
+        order = []
+        start = [None] * len(self.names)
+        end = [None] * len(self.names)
+        for root in self.roots:
+            stack = [(root, False)]
+            while stack:
+                i, done = stack.pop()
+                if done:
+                    end[i] = len(order)
+                    continue
+                start[i] = len(order)
+                order.append(i)
+                stack.append((i, True))
+                stack.extend((j, False) for j in reversed(self.children[i]))
+        self.preorder, self.start, self.end = order, start, end
+
+    @classmethod
+    def from_db(cls):
+        """Builds the graph of the upstream jobs of all jobs"""
+        names = {}
+        edges = []
+        for pk, name, upstream_id in models.Job.objects.values_list(
+                'pk', 'name', 'upstream_job_id'):
+            names[pk] = name
+            if upstream_id is not None:
+                edges.append((upstream_id, pk))
+        return cls(names.values(), ((names[u], names[d]) for u, d in edges
+                                    if u in names))
+
+    @classmethod
+    def from_multijobs(cls, backend):
+        """
+        Builds the graph of all jobs of backend with an edge from every
+        MultiJob to each job in its phases.
+        """
+        from lxml import etree
+        names = backend.list_jobs()
+        listed = set(names)
+        edges = []
+        for name, config in backend.read_many(names).items():
+            if config is None:
+                continue
+            root = etree.fromstring(config)
+            if root.tag == 'com.tikal.jenkins.plugins.multijob.MultiJobProject':
+                edges.extend((name, downstream) for downstream in
+                             root.xpath('//jobName/text()')
+                             if downstream in listed)
+        return cls(names, edges)
+
+    def _reachable(self, i, neighbours):
+        seen = set([i])
+        queue = deque([i])
+        found = []
+        while queue:
+            for j in neighbours[queue.popleft()]:
+                if j not in seen:
+                    seen.add(j)
+                    found.append(j)
+                    queue.append(j)
+        return found
+
+    def downstream(self, name):
+        """Names of all jobs transitively downstream of job name"""
+        i = self.index[name]
+        if self.preorder is not None and self.start[i] is not None:
+            found = self.preorder[self.start[i] + 1:self.end[i]]
+        else:
+            found = self._reachable(i, self.children)
+        return [self.names[j] for j in found]
+
+    def downstream_count(self, name):
+        i = self.index[name]
+        if self.preorder is not None and self.start[i] is not None:
+            return self.end[i] - self.start[i] - 1
+        return len(self._reachable(i, self.children))
+
+    def upstream(self, name):
+        """Names of all jobs transitively upstream of job name"""
+        return [self.names[j] for j in
+                self._reachable(self.index[name], self.parents)]
+
+    def root_names(self):
+        return [self.names[i] for i in self.roots]
+
+    def depth(self, name):
+        return self.depths[self.index[name]]
+
+    def tree(self, name):
+        """
+        (name, level) tuples of job name and the jobs downstream of it in
+        depth-first order, each job once.
+        """
+        seen = set()
+        stack = [(self.index[name], 0)]
+        while stack:
+            i, level = stack.pop()
+            if i in seen:
+                continue
+            seen.add(i)
+            yield self.names[i], level
+            stack.extend((j, level + 1) for j in reversed(self.children[i]))
+
+    def cycles(self):
+        """
+        Lists of the names of the jobs of each cycle, i.e. each strongly
+        connected component with more than one job or a self-loop.
+        """
+        if self._cycles is None:
+            self._cycles = [sorted(self.names[i] for i in component)
+                            for component in self._components()
+                            if len(component) > 1 or
+                            component[0] in self.children[component[0]]]
+        return self._cycles
+
+    def _components(self):
+        """Strongly connected components (iterative Tarjan)"""
+        index = [None] * len(self.names)
+        low = [0] * len(self.names)
+        on_stack = [False] * len(self.names)
+        stack = []
+        counter = 0
+        for start in range(len(self.names)):
+            if index[start] is not None:
+                continue
+            work = [(start, 0)]
+            while work:
+                i, child = work.pop()
+                if child == 0:
+                    index[i] = low[i] = counter
+                    counter += 1
+                    stack.append(i)
+                    on_stack[i] = True
+                elif child <= len(self.children[i]):
+                    low[i] = min(low[i], low[self.children[i][child - 1]])
+                while child < len(self.children[i]):
+                    j = self.children[i][child]
+                    child += 1
+                    if index[j] is None:
+                        work.append((i, child))
+                        work.append((j, 0))
+                        break
+                    elif on_stack[j]:
+                        low[i] = min(low[i], index[j])
+                else:
+                    if low[i] == index[i]:
+                        component = []
+                        while True:
+                            j = stack.pop()
+                            on_stack[j] = False
+                            component.append(j)
+                            if j == i:
+                                break
+                        yield component
+        return
+
+# the tables the graph is built from, saves of application jobs bump the
+# counter of the latter
+TABLES = (models.Job, models.ApplicationJob)
+
+_graph = None
+_version = None
+
+def get_graph():
+    """
+    The cached job graph, rebuilt from the data base if the change counters
+    of its tables changed, in any process.
+    """
+    global _graph, _version
+    version = models.ChangeCounter.objects.versions(*TABLES)
+    if _graph is None or version != _version:
+        _graph = JobGraph.from_db()
+        _version = version
+    return _graph
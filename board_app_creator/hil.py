@@ -0,0 +1,268 @@
+"""
+Hardware in the loop: executes FlashRequests on the physical boards
+connected to this system.
+
+A board is connected on the ports of its usb_device. The Scheduler assigns
+the queued requests to the free ports of their boards, at most one batch
+per port and RIOT_HIL_HUB_CONCURRENCY batches per USB hub (Port.hub) at a
+time. A batch holds all queued requests of one board and application, so
+the application is flashed once for all of them, and not at all if the
+port still runs it from its previous batch. The requests of a device that
+disappears while they run are queued again, up to RIOT_HIL_MAX_ATTEMPTS
+times. Ports are the USB device nodes of the boards; the default flasher
+passes their serial ports to make (see MakeFlasher).
+
+Only one scheduler may run on a system; it takes over the requests left
+running by its predecessor. Flashing and testing is done by the
+RIOT_HIL_FLASHER class (see Flasher).
+"""
+import subprocess
+import threading
+import time
+import traceback
+from collections import Counter
+from os.path import join as path_join
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_by_path
+
+from board_app_creator import models
+import usb
+
+class FlasherError(Exception):
+    pass
+
+class Flasher(object):
+    """
+    Flashes and tests applications on boards. Both methods return the
+    output and raise FlasherError on failure.
+    """
+    def flash(self, port, board, application):
+        raise NotImplementedError
+
+    def test(self, port, board, application):
+        raise NotImplementedError
+
+class MakeFlasher(Flasher):
+    """
+    Runs `make flash` and `make test` in the application's directory of
+    its repository's checkout.
+
+    RIOT expects the serial port of the board as PORT, not the USB device
+    node of Port.path: it is taken from RIOT_HIL_TTYS, which maps device
+    nodes to serial ports, or else looked up in sysfs (see usb.tty()).
+    """
+    def tty(self, port):
+        tty = settings.RIOT_HIL_TTYS.get(port.path) or usb.tty(port.path)
+        if tty is None:
+            raise FlasherError("{} has no serial port".format(port.path))
+        return tty
+
+    def _make(self, target, port, board, application):
+        tree = application.application_tree.select_related('repo').get()
+        directory = path_join(settings.RIOT_REPO_BASE_PATH, tree.repo.path,
+                              application.path)
+        tty = self.tty(port)
+        try:
+            return subprocess.check_output(
+                ['make', '-C', directory, 'BOARD=' + board.riot_name,
+                 'PORT=' + tty, target], stderr=subprocess.STDOUT)
+        except (OSError, subprocess.CalledProcessError) as e:
+            raise FlasherError(getattr(e, 'output', None) or str(e))
+
+    def flash(self, port, board, application):
+        return self._make('flash', port, board, application)
+
+    def test(self, port, board, application):
+        return self._make('test', port, board, application)
+
+def get_flasher():
+    return import_by_path(settings.RIOT_HIL_FLASHER)()
+
+class Scheduler(object):
+    """
+    Assigns the queued FlashRequests to the connected boards and executes
+    them with flasher, in a thread per batch unless threaded is False.
+    devices returns the connected usb.USBDevices.
+    """
+    def __init__(self, flasher=None, devices=usb.get_device_list,
+                 hub_concurrency=None, max_attempts=None, threaded=True):
+        self.flasher = flasher or get_flasher()
+        self.devices = devices
+        self.hub_concurrency = hub_concurrency or \
+                               settings.RIOT_HIL_HUB_CONCURRENCY
+        self.max_attempts = max_attempts or settings.RIOT_HIL_MAX_ATTEMPTS
+        self.threaded = threaded
+        # hub by the pk of the ports with a running batch and pk of the
+        # application flashed last by port pk, both guarded by _lock
+        self.busy = {}
+        self.flashed = {}
+        self._lock = threading.Lock()
+
+    def present(self, port):
+        return any(device.device == port.path for device in self.devices())
+
+    def claim(self, port, board_id, application_id):
+        """
+        Marks the queued requests of the board and application as running
+        on port and returns them, oldest first.
+        """
+        with transaction.atomic():
+            requests = list(models.FlashRequest.objects.filter(
+                status=models.FlashRequest.QUEUED, board=board_id,
+                application=application_id).select_related(
+                    'board', 'application').order_by('created', 'pk'))
+            started = timezone.now()
+            models.FlashRequest.objects.filter(
+                pk__in=[r.pk for r in requests]).update(
+                    status=models.FlashRequest.RUNNING, port=port,
+                    started=started)
+        for request in requests:
+            request.status = models.FlashRequest.RUNNING
+            request.port = port
+            request.started = started
+        return requests
+
+    def step(self):
+        """
+        Assigns the queued requests to the free ports, oldest first, and
+        executes the batches. Returns them as (port, requests) pairs.
+        """
+        models.USBDevice.objects.update_if_changed(list(self.devices()))
+        ports = {}
+        for port in models.Port.objects.filter(
+                usb_device__board__isnull=False).select_related(
+                    'usb_device__board').order_by('path'):
+            ports.setdefault(port.usb_device.board.pk, []).append(port)
+        with self._lock:
+            busy = dict(self.busy)
+            flashed = dict(self.flashed)
+        hubs = Counter(busy.values())
+        batches = []
+        pairs, wanted = [], set()
+        for pair in models.FlashRequest.objects.filter(
+                status=models.FlashRequest.QUEUED,
+                board__in=ports.keys()).order_by('created', 'pk').\
+                values_list('board', 'application'):
+            if pair not in wanted:
+                pairs.append(pair)
+                wanted.add(pair)
+        for board_id, application_id in pairs:
+            free = [port for port in ports[board_id] if port.pk not in busy
+                    and hubs[port.hub] < self.hub_concurrency]
+            if not free:
+                continue
+            # rather a port already running the application than one whose
+            # application is still wanted
+            def cost(port):
+                application = flashed.get(port.pk)
+                if application == application_id:
+                    return 0
+                return 2 if (board_id, application) in wanted else 1
+            port = min(free, key=cost)
+            busy[port.pk] = port.hub
+            hubs[port.hub] += 1
+            batches.append((port, self.claim(port, board_id,
+                                              application_id)))
+        with self._lock:
+            self.busy.update((port.pk, port.hub) for port, _ in batches)
+        for port, requests in batches:
+            if self.threaded:
+                thread = threading.Thread(target=self._thread_main,
+                                          args=(port, requests),
+                                          name='hil-{}'.format(port.path))
+                thread.daemon = True
+                thread.start()
+            else:
+                self.execute(port, requests)
+        return batches
+
+    def _thread_main(self, port, requests):
+        try:
+            self.execute(port, requests)
+        finally:
+            connection.close()
+
+    def _finish(self, request, status, result):
+        request.status = status
+        request.result = result or ''
+        request.finished = timezone.now()
+        request.save(update_fields=['status', 'result', 'finished'])
+
+    def requeue(self, requests):
+        """
+        Queues requests again, or fails the ones out of attempts.
+        """
+        for request in requests:
+            request.attempts += 1
+            if request.attempts >= self.max_attempts:
+                request.status = models.FlashRequest.FAILED
+                request.result = "The device disappeared {} times.".format(
+                    request.attempts)
+                request.finished = timezone.now()
+            else:
+                request.status = models.FlashRequest.QUEUED
+                request.port = request.started = None
+            request.save(update_fields=['status', 'port', 'started',
+                                        'finished', 'result', 'attempts'])
+
+    def execute(self, port, requests):
+        """
+        Flashes the application of the batch requests onto the board on
+        port, unless it is still flashed there and only tests are
+        requested, and runs the tests.
+        """
+        board, application = requests[0].board, requests[0].application
+        pending = list(requests)
+        try:
+            output = ''
+            with self._lock:
+                flashed = self.flashed.get(port.pk)
+            if flashed != application.pk or any(
+                    r.action == models.FlashRequest.FLASH for r in requests):
+                with self._lock:
+                    self.flashed.pop(port.pk, None)
+                output = self.flasher.flash(port, board, application)
+                with self._lock:
+                    self.flashed[port.pk] = application.pk
+            for request in requests:
+                status, result = models.FlashRequest.DONE, output
+                if request.action == models.FlashRequest.TEST:
+                    try:
+                        result = self.flasher.test(port, board, application)
+                    except FlasherError as e:
+                        if not self.present(port):
+                            raise
+                        status, result = models.FlashRequest.FAILED, str(e)
+                self._finish(request, status, result)
+                pending.remove(request)
+        except Exception:
+            with self._lock:
+                self.flashed.pop(port.pk, None)
+            if self.present(port):
+                for request in pending:
+                    self._finish(request, models.FlashRequest.FAILED,
+                                 traceback.format_exc())
+            else:
+                self.requeue(pending)
+        finally:
+            with self._lock:
+                self.busy.pop(port.pk, None)
+
+    def run(self, once=False, interval=1.0):
+        """
+        Schedules the queued requests. Returns when nothing runs and nothing
+        can be started if once is set, otherwise polls every interval
+        seconds.
+        """
+        models.FlashRequest.objects.filter(
+            status=models.FlashRequest.RUNNING).update(
+                status=models.FlashRequest.QUEUED, port=None, started=None)
+        while True:
+            started = self.step()
+            if once and not started and not self.busy:
+                return
+            if not started:
+                time.sleep(interval)
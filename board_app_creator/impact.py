@@ -0,0 +1,123 @@
+"""
+Impact of the changes between two commits of a repository on its boards,
+applications and application jobs.
+"""
+import re
+from os.path import join as path_join
+
+from django.db.models import Q
+
+from board_app_creator import models
+
+CPU_MAKEFILES = ('Makefile.features', 'Makefile.include')
+CPU_RE = re.compile(r'^\s*(?:export\s+)?CPU\s*[:?]?=\s*(\S+)', re.MULTILINE)
+
+def _child(path, tree):
+    """Name of the entry of tree that path is in, or None"""
+    if not tree:
+        return None
+    tree = tree.strip('/') + '/'
+    if not path.startswith(tree):
+        return None
+    return path[len(tree):].split('/', 1)[0] or None
+
+def board_cpu(commit, board_path):
+    """CPU set in the Makefiles of the board at board_path or None"""
+    for name in CPU_MAKEFILES:
+        try:
+            blob = commit.get_file(path_join(board_path, name))
+        except ValueError:
+            continue
+        match = CPU_RE.search(blob.read())
+        if match:
+            return match.group(1)
+    return None
+
+class Impact(object):
+    """
+    Maps the changed paths of a repository to the boards in its boards tree,
+    the CPUs in its CPU tree and the applications in its application trees.
+    Paths in none of them are kept in unmapped. commit is the new commit
+    of the repository (the head if None).
+    """
+    def __init__(self, repository, paths, commit=None):
+        self.repository = repository
+        self.commit = commit
+        self.paths = sorted(paths)
+        self.board_names = set()
+        self.cpu_names = set()
+        self.application_paths = set()
+        self.unmapped = []
+        boards_tree = repository.boards_tree if repository.has_boards_tree \
+                      else None
+        cpu_tree = repository.cpu_tree if repository.has_cpu_tree else None
+        trees = repository.unique_application_trees()
+        for path in self.paths:
+            board = _child(path, boards_tree)
+            cpu = _child(path, cpu_tree)
+            apps = [path_join(t, app) for t, app in
+                    ((t, _child(path, t)) for t in trees) if app]
+            if board:
+                self.board_names.add(board)
+            if cpu:
+                self.cpu_names.add(cpu)
+            self.application_paths.update(apps)
+            if not (board or cpu or apps):
+                self.unmapped.append(path)
+        self._board_ids = None
+
+    def _cpu_board_ids(self):
+        """
+        Boards on a changed CPU of the repository. A changed directory that
+        is no board's CPU (e.g. common code) affects all boards of the
+        repository's CPUs, as do boards whose CPU is unknown.
+        """
+        if not self.cpu_names:
+            return set()
+        commits = {self.repository.pk: self.commit or
+                   self.repository.vcs_repo.head}
+        cpus = {}
+        for board in models.Board.objects.filter(
+                cpu_repo=self.repository).select_related('repo'):
+            if board.repo is None or not board.repo.boards_tree:
+                cpus[board.pk] = None
+                continue
+            if board.repo_id not in commits:
+                commits[board.repo_id] = board.repo.vcs_repo.head
+            cpus[board.pk] = board_cpu(commits[board.repo_id], path_join(
+                board.repo.boards_tree, board.riot_name))
+        if self.cpu_names - set(cpus.values()):
+            return set(cpus)
+        return set(pk for pk, cpu in cpus.items()
+                   if cpu is None or cpu in self.cpu_names)
+
+    def board_ids(self):
+        if self._board_ids is None:
+            self._board_ids = self._cpu_board_ids()
+            if self.board_names:
+                self._board_ids.update(models.Board.objects.filter(
+                    riot_name__in=self.board_names).values_list('pk',
+                                                                flat=True))
+        return self._board_ids
+
+    def boards(self):
+        return models.Board.objects.filter(pk__in=self.board_ids())
+
+    def applications(self):
+        return models.Application.objects.filter(
+            path__in=self.application_paths,
+            application_tree__repo=self.repository)
+
+    def jobs(self):
+        return models.ApplicationJob.objects.filter(
+            Q(board__in=self.board_ids()) |
+            Q(application__in=self.applications()))
+
+def analyze(repository, old, new=None):
+    """
+    The Impact of the changes from commit old to commit new (the head if
+    None) of repository. Unchanged subtrees are skipped by identifier.
+    """
+    vcs_repo = repository.vcs_repo
+    new = vcs_repo.head if new is None else vcs_repo.get_commit(new)
+    return Impact(repository, vcs_repo.get_commit(old).diff(new), new)
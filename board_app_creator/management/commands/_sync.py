@@ -0,0 +1,113 @@
+"""
+Base of the sync commands: they run the same code as the tasks queued by
+the views, optionally in a transaction that is rolled back (--dry-run), and
+report the time and the changed row counts of every operation. --trace
+writes a Chrome trace of the operations (see tracing).
+"""
+from contextlib import contextmanager
+from optparse import make_option
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from board_app_creator import models, tracing
+
+class DryRun(Exception):
+    pass
+
+@contextmanager
+def rollback(dry_run):
+    """Runs the block in a transaction that is rolled back if dry_run"""
+    if not dry_run:
+        yield
+        return
+    try:
+        with transaction.atomic():
+            yield
+            raise DryRun
+    except DryRun:
+        pass
+
+def get_repositories(names):
+    """Repositories by pk, path or URL, all if names is empty"""
+    if not names:
+        return list(models.Repository.objects.all())
+    repos = []
+    for name in names:
+        q = Q(path=name) | Q(url=name)
+        if name.isdigit():
+            q |= Q(pk=name)
+        try:
+            repos.append(models.Repository.objects.get(q))
+        except models.Repository.DoesNotExist:
+            raise CommandError("Unknown repository {}".format(name))
+    return repos
+
+class SyncCommand(BaseCommand):
+    # models whose row counts are reported
+    counted = ()
+    option_list = BaseCommand.option_list + (
+        make_option('--dry-run', action='store_true', dest='dry_run',
+                    default=False,
+                    help="Roll back all data base changes."),
+        make_option('--json', action='store_true', dest='json',
+                    default=False,
+                    help="Write one JSON object per operation."),
+        make_option('--trace', dest='trace', default=None,
+                    help="File to write a Chrome trace of the operations "
+                         "to."),
+    )
+
+    def execute(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.json = options['json']
+        if not options.get('trace'):
+            return super(SyncCommand, self).execute(*args, **options)
+        trace = tracing.start(self.__module__.rsplit('.', 1)[-1])
+        try:
+            return super(SyncCommand, self).execute(*args, **options)
+        finally:
+            tracing.stop()
+            with open(options['trace'], 'w') as f:
+                json.dump(tracing.merge([trace.to_dict()]), f)
+
+    def report(self, result):
+        if self.json:
+            self.stdout.write(json.dumps(result, sort_keys=True))
+        else:
+            self.stdout.write(' '.join('{}={}'.format(key, result[key])
+                                       for key in sorted(result)))
+
+    def run(self, operation, func, *args, **kwargs):
+        """
+        Calls func(*args, **kwargs), rolled back on a dry run, and reports
+        its time, the changes of the counted row counts and the dict (or
+        other result) func returns; a list is taken for the items that
+        failed and reported as their number. Errors are reported and
+        re-raised.
+        """
+        result = {'operation': operation, 'dry_run': self.dry_run}
+        start = time.time()
+        try:
+            with tracing.span(operation, 'command'), rollback(self.dry_run):
+                before = [model.objects.count() for model in self.counted]
+                summary = func(*args, **kwargs)
+                result['rows'] = dict(
+                    (model._meta.model_name, model.objects.count() - count)
+                    for model, count in zip(self.counted, before))
+        except Exception as e:
+            result['error'] = str(e)
+            raise
+        else:
+            if isinstance(summary, dict):
+                result.update(summary)
+            elif isinstance(summary, list):
+                result['failed'] = len(summary)
+            elif summary:
+                result['result'] = summary
+        finally:
+            result['seconds'] = round(time.time() - start, 3)
+            self.report(result)
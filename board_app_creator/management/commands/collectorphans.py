@@ -0,0 +1,35 @@
+from optparse import make_option
+
+from board_app_creator import models, orphans
+from board_app_creator.management.commands._sync import SyncCommand, \
+                                                        get_repositories
+
+class Command(SyncCommand):
+    args = '[repository ...]'
+    help = "Marks the jobs whose configs are gone and the boards and " \
+           "applications gone from the given repositories (all by default) " \
+           "and deletes the ones missing for longer than the retention " \
+           "time. A dry run reports what would be deleted."
+    counted = (models.Job, models.ApplicationJob, models.Board,
+               models.Application)
+    option_list = SyncCommand.option_list + (
+        make_option('--retention', type='int', dest='retention',
+                    default=None,
+                    help="Seconds orphans are kept, RIOT_ORPHAN_RETENTION "
+                         "by default."),
+    )
+
+    def handle(self, *args, **options):
+        repos = get_repositories(args)
+        deleted = []
+
+        def collect():
+            report = orphans.collect(repos, retention=options['retention'])
+            for kind, counts in report.items():
+                deleted.extend((kind, name) for name in counts['deleted'])
+            return orphans.summary(report)
+
+        self.run('collect', collect)
+        if int(options['verbosity']) >= 2:
+            for kind, name in deleted:
+                self.stdout.write('{} {}'.format(kind, name))
@@ -0,0 +1,37 @@
+from optparse import make_option
+import sys
+
+from django.core.management.base import CommandError, NoArgsCommand
+
+from board_app_creator import export
+
+class Command(NoArgsCommand):
+    help = "Writes all jobs or the job coverage as CSV or JSON lines."
+    option_list = NoArgsCommand.option_list + (
+        make_option('--format', dest='format', default='csv',
+                    help="Output format: csv or jsonl."),
+        make_option('--coverage', action='store_true', dest='coverage',
+                    default=False,
+                    help="Export the board/application coverage instead "
+                         "of the jobs."),
+        make_option('--output', dest='output', default=None,
+                    help="File to write to instead of standard output."),
+    )
+
+    def handle_noargs(self, **options):
+        if options['format'] not in export.FORMATS:
+            raise CommandError("Unknown format {}".format(options['format']))
+        lines, _ = export.FORMATS[options['format']]
+        if options['coverage']:
+            header, rows = export.COVERAGE_FIELDS, export.iter_coverage()
+        else:
+            header = [name for name, _ in export.JOB_FIELDS]
+            rows = export.iter_jobs()
+
+        out = open(options['output'], 'wb') if options['output'] else sys.stdout
+        try:
+            for line in lines(header, rows):
+                out.write(line)
+        finally:
+            if options['output']:
+                out.close()
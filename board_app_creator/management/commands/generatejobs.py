@@ -0,0 +1,31 @@
+from optparse import make_option
+
+from board_app_creator import generation, models, tasks
+from board_app_creator.management.commands._sync import SyncCommand
+
+class Command(SyncCommand):
+    help = "Generates the missing application jobs of the given boards and " \
+           "applications (all by default). A dry run only plans them."
+    counted = (models.ApplicationJob,)
+    option_list = SyncCommand.option_list + (
+        make_option('--board', action='append', dest='boards',
+                    help="RIOT name of a board, may be repeated."),
+        make_option('--application', action='append', dest='applications',
+                    help="Name of an application, may be repeated."),
+    )
+
+    def handle(self, *args, **options):
+        boards = applications = None
+        if options['boards']:
+            boards = models.Board.objects.filter(
+                riot_name__in=options['boards'])
+        if options['applications']:
+            applications = models.Application.objects.filter(
+                name__in=options['applications'])
+        if self.dry_run:
+            self.run('generate', lambda: {'planned': len(
+                generation.plan_jobs(boards, applications))})
+        else:
+            self.run('generate', tasks.job_bulk_create,
+                     boards and [b.pk for b in boards],
+                     applications and [a.pk for a in applications])
@@ -0,0 +1,29 @@
+from optparse import make_option
+
+from django.core.management.base import CommandError
+
+from board_app_creator import models
+from board_app_creator.management.commands._sync import SyncCommand, \
+                                                      get_repositories
+
+class Command(SyncCommand):
+    args = '<repository> <tree> [tree ...]'
+    help = "Adds the applications in the given trees of a repository (by " \
+           "pk, path or URL) and reloads the jobs."
+    counted = (models.Application, models.ApplicationTree, models.Job)
+    option_list = SyncCommand.option_list + (
+        make_option('--jobs', type='int', dest='jobs', default=None,
+                    help="Number of job configurations read in parallel "
+                         "when reloading the jobs (JENKINS_HTTP_POOL_SIZE "
+                         "by default)."),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) < 2:
+            raise CommandError("A repository and at least one tree are "
+                               "needed.")
+        repo, = get_repositories(args[:1])
+        def load():
+            return repo.add_application_trees(args[1:]) + \
+                   models.Job.create_from_jenkins_xml(options['jobs'])
+        self.run('import', load)
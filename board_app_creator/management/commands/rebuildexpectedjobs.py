@@ -0,0 +1,9 @@
+from django.core.management.base import NoArgsCommand
+
+from board_app_creator import models
+
+class Command(NoArgsCommand):
+    help = "Derives the expected jobs of all boards and applications again."
+
+    def handle_noargs(self, **options):
+        models.ExpectedJob.objects.rebuild()
@@ -0,0 +1,9 @@
+from django.core.management.base import NoArgsCommand
+
+from board_app_creator import models
+
+class Command(NoArgsCommand):
+    help = "Rebuilds the name search index of all jobs."
+
+    def handle_noargs(self, **options):
+        models.JobNameTrigram.objects.rebuild()
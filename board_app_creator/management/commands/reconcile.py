@@ -0,0 +1,56 @@
+from optparse import make_option
+
+from django.core.management.base import CommandError
+
+from board_app_creator import models, orphans, reconcile
+from board_app_creator.management.commands._sync import SyncCommand, \
+                                                        get_repositories
+
+class Command(SyncCommand):
+    args = '[repository ...]'
+    help = "Plans the changes of boards, applications, jobs and MultiJob " \
+           "entries the given repositories (all by default) and the job " \
+           "configurations call for and applies them, then collects the " \
+           "orphans (see collectorphans). A dry run only plans them and " \
+           "reports the orphans."
+    counted = (models.Board, models.Application, models.Job,
+               models.ApplicationJob)
+    option_list = SyncCommand.option_list + (
+        make_option('--output', dest='output', default=None,
+                    help="File to write the plan to as JSON."),
+        make_option('--plan', dest='plan', default=None,
+                    help="Plan file to apply instead of planning, refused if "
+                         "its inputs changed."),
+        make_option('--diff', dest='diff', default=None,
+                    help="Plan file to print the differences to."),
+        make_option('--no-cache', action='store_false', dest='cache',
+                    default=True,
+                    help="Plan even if a plan of the same inputs is cached."),
+    )
+
+    def handle(self, *args, **options):
+        repos = get_repositories(args)
+        if options['plan']:
+            with open(options['plan']) as f:
+                plan = reconcile.Plan.loads(f.read())
+            if reconcile.input_key(reconcile.Planner(repos).inputs()) != \
+               plan.key:
+                raise CommandError("The inputs of {} changed, plan "
+                                   "again".format(options['plan']))
+        else:
+            plans = []
+            def make_plan():
+                plans.append(reconcile.plan(repos, use_cache=options['cache']))
+                return dict(plans[0].summary(), key=plans[0].key)
+            self.run('plan', make_plan)
+            plan = plans[0]
+        if options['diff']:
+            with open(options['diff']) as f:
+                for line in plan.diff(reconcile.Plan.loads(f.read())):
+                    self.stdout.write(line)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(plan.dumps())
+        if not self.dry_run:
+            self.run('execute', reconcile.execute, plan)
+        self.run('collect', lambda: orphans.summary(orphans.collect(repos)))
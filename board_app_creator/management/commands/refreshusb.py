@@ -0,0 +1,9 @@
+from board_app_creator import models
+from board_app_creator.management.commands._sync import SyncCommand
+
+class Command(SyncCommand):
+    help = "Updates the USB devices and ports from the connected devices."
+    counted = (models.USBDevice, models.Port)
+
+    def handle(self, *args, **options):
+        self.run('usb', models.USBDevice.objects.update_from_system)
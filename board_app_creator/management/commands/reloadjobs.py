@@ -0,0 +1,18 @@
+from optparse import make_option
+
+from board_app_creator import models
+from board_app_creator.management.commands._sync import SyncCommand
+
+class Command(SyncCommand):
+    help = "Updates the jobs from the Jenkins job configurations."
+    counted = (models.Job, models.ApplicationJob)
+    option_list = SyncCommand.option_list + (
+        make_option('--jobs', type='int', dest='jobs', default=None,
+                    help="Number of job configurations read in parallel "
+                         "(JENKINS_HTTP_POOL_SIZE by default; the "
+                         "filesystem storage reads one at a time)."),
+    )
+
+    def handle(self, *args, **options):
+        self.run('reload', models.Job.create_from_jenkins_xml,
+                 options['jobs'])
@@ -0,0 +1,32 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from board_app_creator import models
+
+class Command(BaseCommand):
+    args = '<board> <application> [application ...]'
+    help = "Queues flashing and testing the applications on a connected " \
+           "board (see runboardscheduler)."
+    option_list = BaseCommand.option_list + (
+        make_option('--flash-only', action='store_const', dest='action',
+                    const=models.FlashRequest.FLASH,
+                    default=models.FlashRequest.TEST,
+                    help="Only flash the applications."),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) < 2:
+            raise CommandError("Give a board and at least one application.")
+        try:
+            board = models.Board.objects.get(riot_name=args[0])
+            applications = [models.Application.objects.get(name=name)
+                            for name in args[1:]]
+        except (models.Board.DoesNotExist,
+                models.Application.DoesNotExist) as e:
+            raise CommandError(str(e))
+        for application in applications:
+            request = models.FlashRequest.objects.enqueue(board, application,
+                                                          options['action'])
+            self.stdout.write("Queued request {}: {}".format(request.pk,
+                                                             request))
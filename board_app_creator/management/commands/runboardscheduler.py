@@ -0,0 +1,18 @@
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from board_app_creator import hil
+
+class Command(NoArgsCommand):
+    help = "Flashes and tests the requested applications on the connected " \
+           "boards."
+    option_list = NoArgsCommand.option_list + (
+        make_option('--once', action='store_true', dest='once', default=False,
+                    help="Exit when no request can be started any more."),
+        make_option('--interval', type='float', dest='interval', default=1.0,
+                    help="Seconds between polls if no request was started."),
+    )
+
+    def handle_noargs(self, **options):
+        hil.Scheduler().run(once=options['once'], interval=options['interval'])
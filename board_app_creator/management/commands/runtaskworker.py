@@ -0,0 +1,17 @@
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from board_app_creator import tasks
+
+class Command(NoArgsCommand):
+    help = "Executes queued tasks."
+    option_list = NoArgsCommand.option_list + (
+        make_option('--once', action='store_true', dest='once', default=False,
+                    help="Exit when the queue is empty."),
+        make_option('--interval', type='float', dest='interval', default=1.0,
+                    help="Seconds between polls of an empty queue."),
+    )
+
+    def handle_noargs(self, **options):
+        tasks.work(once=options['once'], interval=options['interval'])
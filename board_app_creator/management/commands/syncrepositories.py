@@ -0,0 +1,44 @@
+from optparse import make_option
+
+from django.core.management.base import CommandError
+
+from board_app_creator import models, tasks
+from board_app_creator.management.commands._sync import SyncCommand, \
+                                                      get_repositories
+
+class Command(SyncCommand):
+    args = '[repository ...]'
+    help = "Fetches the given repositories (by pk, path or URL, all by " \
+           "default) and updates their boards and applications."
+    counted = (models.Board, models.Application, models.ApplicationTree,
+               models.ApplicationJob)
+    option_list = SyncCommand.option_list + (
+        make_option('--jobs', type='int', dest='jobs', default=1,
+                    help="Number of repositories fetched in parallel."),
+        make_option('--since', dest='since', default=None,
+                    help="Only update the boards and applications changed "
+                         "since this commit and generate their jobs. "
+                         "'synced' stands for the last synced commit of "
+                         "each repository."),
+    )
+
+    def handle(self, *args, **options):
+        repos = get_repositories(args)
+        errors = {}
+        def fetch():
+            errors.update(tasks.fetch_repositories(repos, options['jobs']))
+            return {'repositories': len(repos), 'jobs': options['jobs'],
+                    'failed': len(errors)}
+        self.run('fetch', fetch)
+        for repo in repos:
+            if repo.pk in errors:
+                self.report({'operation': 'sync', 'repository': repo.url,
+                             'error': str(errors[repo.pk])})
+                continue
+            since = options['since']
+            if since == 'synced':
+                since = repo.synced_commit
+            self.run('sync', tasks.sync_repository, repo, since, self.dry_run)
+        if errors:
+            raise CommandError("{} repositories could not be fetched".format(
+                len(errors)))
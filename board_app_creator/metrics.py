@@ -0,0 +1,217 @@
+"""
+Performance counters of requests and background tasks.
+
+install() hooks the data base cursors, git object reads and fetches, the
+XML parses of jenkins.jobs and the lsusb calls of usb, the ones of pygit2,
+vcs.git, jenkins.jobs and usb once these are imported. The hooks
+count into the stats of the current thread while a request (see
+MetricsMiddleware) or a task (see tasks.run()) is recorded and do nothing
+else. Every recorded request and task is logged as one JSON line and
+added to per URL name or per task latency histograms, which render()
+writes in the Prometheus text format. The histograms are kept per process.
+"""
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db.backends import util
+
+from registry import when_imported
+
+logger = logging.getLogger(__name__)
+
+STATS = (
+    ('sql_queries', "SQL queries"),
+    ('sql_seconds', "Seconds spent in SQL queries"),
+    ('git_reads', "Git objects read"),
+    ('vcs_fetches', "Repositories cloned or fetched"),
+    ('xml_parses', "Jenkins job configurations parsed"),
+    ('subprocesses', "Subprocesses started (lsusb)"),
+)
+
+_current = threading.local()
+
+def start():
+    """Starts recording the stats of the current thread"""
+    _current.stats = dict((name, 0) for name, _ in STATS)
+    _current.start = time.time()
+
+def stop():
+    """
+    Stops recording and returns the stats of the current thread and the
+    seconds since start(), or (None, None) if it was not recording.
+    """
+    stats = getattr(_current, 'stats', None)
+    if stats is None:
+        return None, None
+    _current.stats = None
+    return stats, time.time() - _current.start
+
+def add(name, value=1):
+    stats = getattr(_current, 'stats', None)
+    if stats is not None:
+        stats[name] += value
+
+class Histogram(object):
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+class Series(object):
+    """Latency histogram and stat totals of one URL name or task"""
+    def __init__(self):
+        self.seconds = Histogram(settings.RIOT_METRICS_BUCKETS)
+        self.totals = dict((name, 0) for name, _ in STATS)
+
+_series = {'request': {}, 'task': {}}
+_lock = threading.Lock()
+
+def record(kind, label, seconds, stats, **info):
+    """
+    Adds the seconds and stats of a request or task (kind) to the series of
+    label and logs them with info.
+    """
+    with _lock:
+        series = _series[kind].get(label)
+        if series is None:
+            series = _series[kind][label] = Series()
+        series.seconds.observe(seconds)
+        for name, value in stats.items():
+            series.totals[name] += value
+    line = dict(stats, type=kind, name=label, seconds=round(seconds, 6),
+                sql_seconds=round(stats['sql_seconds'], 6), **info)
+    logger.info(json.dumps(line, sort_keys=True))
+
+def _escape(value):
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+def render():
+    """All series in the Prometheus text exposition format"""
+    lines = []
+    with _lock:
+        for kind, label_name in (('request', 'view'), ('task', 'task')):
+            series = sorted(_series[kind].items())
+            metric = 'riot_{}_seconds'.format(kind)
+            lines += ['# HELP {} Duration of {}s.'.format(metric, kind),
+                      '# TYPE {} histogram'.format(metric)]
+            for label, s in series:
+                label = '{}="{}"'.format(label_name, _escape(label))
+                for bound, count in zip(s.seconds.buckets, s.seconds.counts):
+                    lines.append('{}_bucket{{{},le="{}"}} {}'.format(
+                        metric, label, bound, count))
+                lines += ['{}_bucket{{{},le="+Inf"}} {}'.format(
+                              metric, label, s.seconds.count),
+                          '{}_sum{{{}}} {}'.format(metric, label,
+                                                   s.seconds.sum),
+                          '{}_count{{{}}} {}'.format(metric, label,
+                                                     s.seconds.count)]
+            for name, description in STATS:
+                metric = 'riot_{}_{}_total'.format(kind, name)
+                lines += ['# HELP {} {} by {}s.'.format(metric, description,
+                                                        kind),
+                          '# TYPE {} counter'.format(metric)]
+                lines += ['{}{{{}="{}"}} {}'.format(metric, label_name,
+                                                    _escape(label),
+                                                    s.totals[name])
+                          for label, s in series]
+    return '\n'.join(lines) + '\n'
+
+def reset():
+    with _lock:
+        for series in _series.values():
+            series.clear()
+
+class MetricsMiddleware(object):
+    """
+    Records every request. Adds X-Metrics-* headers with the stats in debug
+    mode.
+    """
+    def process_request(self, request):
+        start()
+
+    def process_response(self, request, response):
+        stats, seconds = stop()
+        if stats is None:
+            return response
+        match = getattr(request, 'resolver_match', None)
+        label = match.url_name if match and match.url_name else 'unresolved'
+        record('request', label, seconds, stats, method=request.method,
+               path=request.path, status=response.status_code)
+        if settings.DEBUG:
+            response['X-Metrics-Seconds'] = '{:.6f}'.format(seconds)
+            for name, _ in STATS:
+                response['X-Metrics-{}'.format(
+                    name.replace('_', '-').title())] = str(stats[name])
+        return response
+
+def _counting(func, name):
+    def wrapper(*args, **kwargs):
+        add(name)
+        return func(*args, **kwargs)
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+def _timing(func):
+    def wrapper(*args, **kwargs):
+        if getattr(_current, 'stats', None) is None:
+            return func(*args, **kwargs)
+        start = time.time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            add('sql_queries')
+            add('sql_seconds', time.time() - start)
+    wrapper.__name__ = func.__name__
+    return wrapper
+
+def _counting_parses(load):
+    def wrapper(self, config):
+        if config is not None:
+            add('xml_parses')
+        return load(self, config)
+    wrapper.__doc__ = load.__doc__
+    return wrapper
+
+_installed = False
+
+def install():
+    """Installs the hooks once"""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    util.CursorWrapper.execute = _timing(util.CursorWrapper.execute)
+    util.CursorWrapper.executemany = _timing(util.CursorWrapper.executemany)
+    when_imported('pygit2', _install_pygit2)
+    when_imported('vcs.git', _install_vcs)
+    when_imported('jenkins.jobs', _install_jenkins)
+    when_imported('usb', _install_usb)
+
+def _install_pygit2(pygit2):
+    pygit2.Repository.get = _counting(pygit2.Repository.get, 'git_reads')
+
+def _install_vcs(git):
+    git.GitRepository.clone = _counting(git.GitRepository.clone,
+                                        'vcs_fetches')
+    git.GitRepository.fetch = _counting(git.GitRepository.fetch,
+                                        'vcs_fetches')
+
+def _install_jenkins(jobs):
+    jobs.Job.load = _counting_parses(jobs.Job.load)
+
+def _install_usb(usb):
+    usb.lsusb = _counting(usb.lsusb, 'subprocesses')
+
+install()
@@ -1,21 +1,38 @@
 """
 Models for board_app_creator application.
 """
+import hashlib
+import json
+import logging
 import re
-from os import listdir
-from os.path import join as path_join, relpath
+from collections import defaultdict
+from os.path import dirname, join as path_join, relpath
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models.signals import pre_save, post_save
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (pre_save, post_save, post_delete,
+                                      m2m_changed)
+from django.utils import timezone
 
 from model_utils.managers import InheritanceManager
 
+import board_app_creator.progress as progress
+import board_app_creator.tracing as tracing
 import board_app_creator.validators as validators
 import vcs
 import usb
-import jenkins.jobs
+# jenkins.jobs (lxml) is imported where job configurations are parsed
+import jenkins.backends
+
+logger = logging.getLogger(__name__)
+
+# errors of single boards, applications or jobs that a sync logs and skips
+SYNC_ERRORS = (IntegrityError, ValidationError, ValueError, IOError, OSError)
+# number of job configs Job.create_from_jenkins_xml() reads at once
+READ_BATCH = 100
 
 class RepositoryManager(models.Manager):
     """
@@ -46,20 +63,66 @@ class USBDeviceManager(models.Manager):
     """
     Model manager for USBDevice
     """
-    def update_from_system(self):
+    def update_from_system(self, devices=None):
+        """
+        Get all currently connected USB devices (or use the given ones) and
+        update data base accordingly
+        """
+        if devices is None:
+            devices = usb.get_device_list()
+        with transaction.atomic():
+            # update() sends no signals, and with no devices nothing else
+            # bumps the counter
+            if Port.objects.update(usb_device=None):
+                ChangeCounter.objects.bump(Port._meta.db_table)
+            for dev in devices:
+                device, _ = self.get_or_create(usb_id=dev.usb_id, tag=dev.tag)
+                try:
+                    port = Port.objects.get(path=dev.device)
+                    port.usb_device = device
+                except Port.DoesNotExist:
+                    port = Port(path=dev.device, usb_device=device)
+                port.save()
+
+    def get_snapshot(self):
+        """
+        The process-wide snapshot of the connected USB devices, refreshed
+        after RIOT_USB_SNAPSHOT_TTL seconds.
+        """
+        if not hasattr(USBDeviceManager, '_snapshot'):
+            USBDeviceManager._snapshot = usb.Snapshot(
+                settings.RIOT_USB_SNAPSHOT_TTL)
+        return USBDeviceManager._snapshot
+
+    def update_from_snapshot(self):
+        """
+        Updates the data base from the USB snapshot if the devices in the
+        snapshot differ from the ones in the data base. The comparison is
+        skipped while neither the snapshot nor the change counters of the
+        ports and devices, which other processes bump as well, changed
+        since the last one.
+        """
+        devices = self.get_snapshot().devices()
+        # read before the comparison, so that writes of other processes
+        # during it are compared next time
+        version = ChangeCounter.objects.versions(Port, USBDevice)
+        synced = getattr(USBDeviceManager, '_synced', None)
+        if synced is not None and synced[0] is devices and \
+           synced[1] == version:
+            return
+        self.update_if_changed(devices)
+        USBDeviceManager._synced = (devices, version)
+
+    def update_if_changed(self, devices):
         """
-        Get all currently connected USB devices and update data base
-        accordingly
+        Updates the data base from devices if they differ from the ones in
+        the data base.
         """
-        Port.objects.update(usb_device=None)
-        for dev in usb.get_device_list():
-            device, _ = self.get_or_create(usb_id=dev.usb_id, tag=dev.tag)
-            try:
-                port = Port.objects.get(path=dev.device)
-                port.usb_device = device
-            except Port.DoesNotExist:
-                port = Port(path=dev.device)
-            port.save()
+        inventory = sorted((dev.device, dev.usb_id) for dev in devices)
+        connected = sorted(Port.objects.filter(usb_device__isnull=False).
+                           values_list('path', 'usb_device__usb_id'))
+        if inventory != connected:
+            self.update_from_system(devices)
 
 class BoardManager(models.Manager):
     """
@@ -87,6 +150,46 @@ class ApplicationManager(models.Manager):
     def hidden_shown(self):
         return self.filter(no_application=True).exists()
 
+class ChangeCounterManager(models.Manager):
+    """
+    Model manager for ChangeCounter
+    """
+    def bump(self, table):
+        """
+        Counts a change to table.
+        """
+        if self.filter(table=table).update(counter=F('counter') + 1):
+            return
+        try:
+            with transaction.atomic():
+                self.create(table=table, counter=1)
+        except IntegrityError:
+            self.filter(table=table).update(counter=F('counter') + 1)
+
+    def versions(self, *models):
+        """
+        The change counters of the tables of models as a sorted list of
+        (table, counter) tuples.
+        """
+        tables = set(m._meta.db_table for m in models)
+        counters = dict((t, 0) for t in tables)
+        counters.update(self.filter(table__in=tables).values_list('table',
+                                                                  'counter'))
+        return sorted(counters.items())
+
+class ChangeCounter(models.Model):
+    """
+    Number of changes to a table, so data derived from the table can be
+    checked for staleness with a single query.
+    """
+    table = models.CharField(max_length=64, unique=True)
+    counter = models.PositiveIntegerField(default=0)
+
+    objects = ChangeCounterManager()
+
+    def __str__(self):
+        return "{}: {}".format(self.table, self.counter)
+
 class Repository(models.Model):
     """
     A RIOT related repository
@@ -108,6 +211,8 @@ class Repository(models.Model):
     cpu_tree = models.CharField(max_length=256, default=None, null=True,
                                 blank=True, verbose_name="CPU tree")
     is_default = models.BooleanField(default=False, null=False)
+    synced_commit = models.CharField(max_length=40, default=None, null=True,
+                                     blank=True, editable=False)
 
     objects = RepositoryManager()
 
@@ -164,43 +269,122 @@ class Repository(models.Model):
         return self.application_trees.exists()
 
     def unique_application_trees(self):
-        return sorted(list(set(self.application_trees.values_list('tree_name', flat=True))))
+        return sorted(set(t.tree_name for t in self.application_trees.all()))
 
-    def update_boards(self):
-        for tree in self.vcs_repo.head.get_file(self.boards_tree).trees:
-            board, created = Board.objects.get_or_create(riot_name=tree.name)
-
-            if not board.no_board:
-                path = path_join(self.boards_tree, tree.name)
-                board.path = path
-                board.repo = self
-                try:
-                    board.cpu_repo = Repository.objects.get(is_default=True)
-                except Repository.DoesNotExist:
-                    pass
-                board.save()
-
-    def update_applications(self):
-        for tree_name in self.unique_application_trees():
-            for app in self.vcs_repo.head.get_file(tree_name).trees:
-                abs_path = path_join(tree_name, app.name)
-                makefile = path_join(abs_path, 'Makefile')
+    def add_application_trees(self, trees):
+        """
+        Adds the applications in the given trees of the repository. Returns
+        the Makefiles of the applications that failed.
+        """
+        failed = []
+        with tracing.span('add_application_trees', repository=self.url), \
+             transaction.atomic():
+            for tree in trees:
+                with tracing.span('list applications', tree=tree):
+                    apps = list(self.vcs_repo.head.get_file(tree).trees)
+                for done, app in enumerate(apps, 1):
+                    abs_path = path_join(tree, app.name)
+                    makefile = path_join(abs_path, 'Makefile')
+                    progress.report('parse', makefile, done, len(apps))
+                    try:
+                        with tracing.span('parse makefile', path=makefile):
+                            app_name, blacklist, whitelist = Application.get_name_and_lists_from_makefile(self, makefile)
+                    except Application.DoesNotExist:
+                        continue
+                    except AssertionError:
+                        continue
+                    try:
+                        with tracing.span('save application', path=abs_path), \
+                             transaction.atomic():
+                            appobj = Application(name=app_name, path=abs_path)
+                            appobj.save()
+                            ApplicationTree.objects.get_or_create(
+                                tree_name=tree, repo=self, application=appobj)
+                            appobj.add_board_lists(blacklist, whitelist)
+                    except SYNC_ERRORS as e:
+                        logger.exception("Adding %s failed", makefile)
+                        progress.report('parse', "{}: {}".format(makefile, e))
+                        failed.append(makefile)
+        return failed
+
+    def update_boards(self, names=None):
+        """
+        Updates the boards in the boards tree, only the ones named in names
+        unless it is None. Returns the names of the boards that failed.
+        """
+        with tracing.span('list boards', tree=self.boards_tree):
+            trees = [tree for tree in
+                     self.vcs_repo.head.get_file(self.boards_tree).trees
+                     if names is None or tree.name in names]
+        try:
+            cpu_repo = Repository.objects.get(is_default=True)
+        except Repository.DoesNotExist:
+            cpu_repo = None
+        failed = []
+        with tracing.span('save boards', repository=self.url), \
+             transaction.atomic():
+            for done, tree in enumerate(trees, 1):
+                progress.report('boards', tree.name, done, len(trees))
                 try:
-                    app_name, blacklist, whitelist = Application.get_name_and_lists_from_makefile(self, makefile)
-                except Application.DoesNotExist:
-                    continue
-                except AssertionError:
-                    continue
-                appobj, created = Application.objects.get_or_create(name=app_name,
-                                                                    path=abs_path)
-                if created or not appobj.no_application:
-                    app_tree, created = ApplicationTree.objects.get_or_create(
-                        tree_name=tree_name, repo=self, application=appobj)
-                    for board in Board.objects.all():
-                        if board.riot_name in blacklist and board not in appobj.blacklisted_boards.all():
-                            appobj.blacklisted_boards.add(board)
-                        if board.riot_name in whitelist and board not in appobj.blacklisted_boards.all():
-                            appobj.whitelisted_boards.add(board)
+                    with tracing.span('save board', board=tree.name), \
+                         transaction.atomic():
+                        board, created = Board.objects.get_or_create(
+                            riot_name=tree.name)
+
+                        if not board.no_board:
+                            path = path_join(self.boards_tree, tree.name)
+                            board.path = path
+                            board.repo = self
+                            if cpu_repo is not None:
+                                board.cpu_repo = cpu_repo
+                            board.save()
+                except SYNC_ERRORS as e:
+                    logger.exception("Updating board %s failed", tree.name)
+                    progress.report('boards', "{}: {}".format(tree.name, e))
+                    failed.append(tree.name)
+        return failed
+
+    def update_applications(self, paths=None):
+        """
+        Updates the applications in the application trees, only the ones at
+        paths unless it is None. Returns the Makefiles of the applications
+        that failed.
+        """
+        failed = []
+        with tracing.span('update_applications', repository=self.url), \
+             transaction.atomic():
+            for tree_name in self.unique_application_trees():
+                with tracing.span('list applications', tree=tree_name):
+                    apps = [app for app in
+                            self.vcs_repo.head.get_file(tree_name).trees
+                            if paths is None or
+                            path_join(tree_name, app.name) in paths]
+                for done, app in enumerate(apps, 1):
+                    abs_path = path_join(tree_name, app.name)
+                    makefile = path_join(abs_path, 'Makefile')
+                    progress.report('parse', makefile, done, len(apps))
+                    try:
+                        with tracing.span('parse makefile', path=makefile):
+                            app_name, blacklist, whitelist = Application.get_name_and_lists_from_makefile(self, makefile)
+                    except Application.DoesNotExist:
+                        continue
+                    except AssertionError:
+                        continue
+                    try:
+                        with tracing.span('save application', path=abs_path), \
+                             transaction.atomic():
+                            appobj, created = Application.objects.get_or_create(
+                                name=app_name, path=abs_path)
+                            if created or not appobj.no_application:
+                                ApplicationTree.objects.get_or_create(
+                                    tree_name=tree_name, repo=self,
+                                    application=appobj)
+                                appobj.add_board_lists(blacklist, whitelist)
+                    except SYNC_ERRORS as e:
+                        logger.exception("Updating %s failed", makefile)
+                        progress.report('parse', "{}: {}".format(makefile, e))
+                        failed.append(makefile)
+        return failed
 
 class USBDevice(models.Model):
     """
@@ -232,6 +416,14 @@ class Port(models.Model):
     def __str__(self):
         return self.path
 
+    @property
+    def hub(self):
+        """
+        The bus of the port (/dev/bus/usb/<bus>), as lsusb shows no deeper
+        hub topology
+        """
+        return dirname(self.path)
+
 class Board(models.Model):
     """
     A board in one of the RIOT repositories.
@@ -254,6 +446,8 @@ class Board(models.Model):
                                             blank=True)
     no_board = models.BooleanField(default=False, blank=False, null=False,
                                    editable=False)
+    missing_since = models.DateTimeField(blank=True, null=True,
+                                         editable=False)
 
     objects = BoardManager()
 
@@ -283,6 +477,8 @@ class Application(models.Model):
         related_name='whitelisted_applications')
     no_application = models.BooleanField(default=False, blank=False, null=False,
                                          editable=False)
+    missing_since = models.DateTimeField(blank=True, null=True,
+                                         editable=False)
     prototype_jobs = models.ManyToManyField('ApplicationJob', 
                                             related_name='app_prototype_for', 
                                             blank=True)
@@ -348,12 +544,25 @@ class Application(models.Model):
             makefile_path = path_join(self.path, 'Makefile')
             app_name, blacklist, whitelist = Application.get_name_and_lists_from_makefile(self.repository, makefile_path)
             self.name = app_name
-            for board in models.Board.objects.all():
-                if board.riot_name in blacklist and board not in self.blacklisted_boards.all():
-                    self.blacklisted_boards.add(board)
-                if board.riot_name in whitelist and board not in self.blacklisted_boards.all():
-                    self.whitelisted_boards.add(board)
-            self.save()
+            with transaction.atomic():
+                self.add_board_lists(blacklist, whitelist)
+                self.save()
+
+    def add_board_lists(self, blacklist, whitelist):
+        """
+        Adds the boards named in blacklist to the blacklisted boards and the
+        ones named in whitelist, unless blacklisted, to the whitelisted
+        boards.
+        """
+        blacklisted = Board.objects.filter(riot_name__in=blacklist).exclude(
+            pk__in=self.blacklisted_boards.all())
+        if blacklisted:
+            self.blacklisted_boards.add(*blacklisted)
+        whitelisted = Board.objects.filter(riot_name__in=whitelist).exclude(
+            pk__in=self.blacklisted_boards.all()).exclude(
+            pk__in=self.whitelisted_boards.all())
+        if whitelisted:
+            self.whitelisted_boards.add(*whitelisted)
 
 class ApplicationTree(models.Model):
     """
@@ -370,10 +579,57 @@ class ApplicationTree(models.Model):
     def __str__(self):
         return self.tree_name
 
+class NamespaceTrie(object):
+    """
+    Prefix trie of job namespaces by name.
+    """
+    def __init__(self, namespaces):
+        self.root = {}
+        for namespace in namespaces:
+            node = self.root
+            for char in namespace.name:
+                node = node.setdefault(char, {})
+            node[None] = namespace
+
+    def longest_prefix(self, name):
+        """The namespace with the longest name that name starts with"""
+        node = self.root
+        found = node.get(None)
+        for char in name:
+            node = node.get(char)
+            if node is None:
+                break
+            found = node.get(None, found)
+        return found
+
+class JobNamespaceManager(models.Manager):
+    """
+    Model manager for JobNamespace
+    """
+    def get_trie(self):
+        """
+        The trie of all namespaces, cached in the process until a namespace
+        is saved or deleted.
+        """
+        if getattr(JobNamespaceManager, '_trie', None) is None:
+            JobNamespaceManager._trie = NamespaceTrie(self.all())
+        return JobNamespaceManager._trie
+
+    def invalidate_trie(self):
+        JobNamespaceManager._trie = None
+
+    def resolve(self, job_name):
+        """
+        The namespace with the longest name job_name starts with or None.
+        """
+        return self.get_trie().longest_prefix(job_name)
+
 class JobNamespace(models.Model):
     name = models.CharField(max_length=64, unique=True)
     repository = models.OneToOneField('Repository', related_name='job_namespace')
 
+    objects = JobNamespaceManager()
+
     def __str__(self):
         return self.name
 
@@ -392,11 +648,15 @@ class Job(models.Model):
                                           choices=[(0, 'Always ask'),
                                                    (1, 'Always update'),
                                                    (2, 'Manual')])
+    # set while the job's config is missing from the storage, see orphans
+    missing_since = models.DateTimeField(blank=True, null=True,
+                                         editable=False)
 
     objects = InheritanceManager()
 
     class Meta:
         ordering = ['update_behavior', 'name']
+        index_together = [['update_behavior', 'name']]
 
     def __str__(self):
         return self.name
@@ -418,13 +678,21 @@ class Job(models.Model):
         XML representation of the application
         """
         if not hasattr(self, '_xml'):
-            try:
-                self._xml = jenkins.jobs.MultiJob(self.path)
-            except ValueError:
-                self._xml = jenkins.jobs.Job(self.path)
+            self.load_xml()
 
         return self._xml
 
+    def load_xml(self, config=None):
+        """
+        Parses config, or the job's config in the job storage if None.
+        """
+        import jenkins.jobs
+        try:
+            self._xml = jenkins.jobs.MultiJob(self.path, Job.get_backend(),
+                                              config)
+        except ValueError:
+            self._xml = jenkins.jobs.Job(self.path, Job.get_backend(), config)
+
     def is_application_job(self):
         return isinstance(self, ApplicationJob)
 
@@ -435,17 +703,16 @@ class Job(models.Model):
             return self._default_manager.get(pk=self.pk)
 
     def update_from_jenkins_xml(self):
+        import jenkins.jobs
         if not self.update_behavior == 2:
             if isinstance(self.xml, jenkins.jobs.MultiJob):
                 for jobname in self.xml:
                     if not self.downstream_jobs.filter(name=jobname).exists():
                         self.downstream_jobs.add(*Job.objects.filter(name=jobname))
 
-            for namespace in JobNamespace.objects.all().extra(
-                    select={'length': 'LENGTH(`name`)'}).order_by('-length'):
-                if self.name.startswith(namespace.name):
-                    self.namespace = namespace
-                    break
+            namespace = JobNamespace.objects.resolve(self.name)
+            if namespace is not None:
+                self.namespace = namespace
 
             for multijob in Job.get_multijobs():
                 if self.name in multijob.xml:
@@ -461,35 +728,99 @@ class Job(models.Model):
                         self.__class__ = ApplicationJob
                         self.board = board
                         self.application = app
-                        self.namespace = board.repo.job_namespace
+                        # boards may lack a repository, repositories a
+                        # namespace
+                        try:
+                            if board.repo_id is not None:
+                                self.namespace = board.repo.job_namespace
+                        except JobNamespace.DoesNotExist:
+                            pass
 
     @staticmethod
-    def create_from_jenkins_xml():
-        for job in listdir(settings.JENKINS_JOBS_PATH):
-            if Job.objects.filter(name=job).exists():
-                continue
-            obj, created = Job.objects.get_or_create(name=job)
+    def get_backend():
+        """
+        The storage of the Jenkins job configurations as configured by
+        JENKINS_JOBS_BACKEND.
+        """
+        if not hasattr(Job, '_backend'):
+            if settings.JENKINS_JOBS_BACKEND == 'http':
+                Job._backend = jenkins.backends.get_backend('http',
+                    settings.JENKINS_URL, settings.JENKINS_USER,
+                    settings.JENKINS_API_TOKEN,
+                    pool_size=settings.JENKINS_HTTP_POOL_SIZE,
+                    max_retries=settings.JENKINS_HTTP_RETRIES,
+                    backoff=settings.JENKINS_HTTP_BACKOFF)
+            else:
+                Job._backend = jenkins.backends.get_backend('filesystem',
+                    settings.JENKINS_JOBS_PATH)
+        return Job._backend
 
-            if created:
+    @staticmethod
+    def create_from_jenkins_xml(workers=None):
+        """
+        Adds the jobs of the Jenkins job configurations that have no row yet.
+        Their configs are read READ_BATCH at a time, in up to workers
+        threads if the job storage reads in parallel. Returns the names of
+        the jobs that failed.
+        """
+        from lxml import etree
+        errors = SYNC_ERRORS + (etree.LxmlError, jenkins.backends.HTTPError)
+        failed = []
+        # namespaces may have been changed by another process
+        JobNamespace.objects.invalidate_trie()
+        backend = Job.get_backend()
+        with tracing.span('list jobs'):
+            existing = set(Job.objects.values_list('name', flat=True))
+            jobs = [job for job in backend.list_jobs() if job not in existing]
+        try:
+            default_namespace = Repository.objects.get(
+                is_default=True).job_namespace
+        except (Repository.DoesNotExist, JobNamespace.DoesNotExist):
+            default_namespace = None
+        with tracing.span('classify jobs'), transaction.atomic():
+            for start in range(0, len(jobs), READ_BATCH):
+                batch = jobs[start:start + READ_BATCH]
                 try:
-                    obj.namespace = Repository.objects.get(is_default=True).job_namespace
-                except Repository.DoesNotExist:
-                    pass
+                    configs = backend.read_many(batch, workers)
+                except errors:
+                    # each job reads and reports its own config
+                    configs = {}
+                for done, job in enumerate(batch, start + 1):
+                    progress.report('classify', job, done, len(jobs))
+                    try:
+                        with tracing.span('classify job', job=job), \
+                             transaction.atomic():
+                            Job._create_from_jenkins_xml(job,
+                                default_namespace, configs.get(job))
+                    except errors as e:
+                        logger.exception("Adding job %s failed", job)
+                        progress.report('classify', "{}: {}".format(job, e))
+                        failed.append(job)
+        return failed
 
-            obj.update_from_jenkins_xml()
+    @staticmethod
+    def _create_from_jenkins_xml(job, default_namespace, config=None):
+        obj, created = Job.objects.get_or_create(name=job)
+        if config is not None:
+            obj.load_xml(config)
 
-            obj.save()
+        if created and default_namespace is not None:
+            obj.namespace = default_namespace
 
-            if created and obj.is_application_job():
-                if (obj.application.name in settings.RIOT_DEFAULT_APPLICATIONS) and \
-                   (obj.board.riot_name in settings.RIOT_DEFAULT_BOARDS):
-                    obj.app_prototype_for.add(*Application.objects.exclude(name=obj.application.name))
-                    obj.board_prototype_for.add(*Board.objects.exclude(riot_name=obj.board.riot_name))
-                obj.save()
+        obj.update_from_jenkins_xml()
 
+        obj.save()
+
+        if created and obj.is_application_job():
+            if (obj.application.name in settings.RIOT_DEFAULT_APPLICATIONS) and \
+               (obj.board.riot_name in settings.RIOT_DEFAULT_BOARDS):
+                obj.app_prototype_for.add(*Application.objects.exclude(name=obj.application.name))
+                obj.board_prototype_for.add(*Board.objects.exclude(riot_name=obj.board.riot_name))
+            obj.save()
 
     @staticmethod
     def get_multijobs():
+        import jenkins.jobs
         return [j for j in Job.objects.all() if isinstance(j, jenkins.jobs.MultiJob)]
 
 class ApplicationJob(Job):
@@ -500,13 +831,27 @@ class ApplicationJob(Job):
                               blank=True)
     application = models.ForeignKey('application', related_name='jobs',
                                     null=True, blank=True)
+    compiler = models.CharField(max_length=32, blank=True, default='',
+                                db_index=True, editable=False)
+
+    def compiler_from_name(self):
+        """
+        The compiler suffix of the job name
+        <repository_tag>-<board>-<application>[-<cc>] or ''.
+        """
+        if self.board_id is None or self.application_id is None:
+            return ''
+        return compiler_from_name(self.name, self.board.riot_name,
+                                  self.application.name)
 
     @property
     def xml(self):
+        import jenkins.jobs
         if not hasattr(self, '_xml') or isinstance(self._xml, jenkins.jobs.ApplicationJob):
             self._xml = jenkins.jobs.ApplicationJob(self.path, self.board.riot_name,
                                                     self.application.name,
-                                                    self.application.path)
+                                                    self.application.path,
+                                                    Job.get_backend())
         return super(ApplicationJob, self).xml
 
 
@@ -523,6 +868,402 @@ class ApplicationJobDeletionProxy(models.Model):
         db_table = ApplicationJob._meta.db_table
         managed = False
 
+def compiler_from_name(name, board_name, application_name):
+    """
+    The compiler suffix of the application job name
+    <repository_tag>-<board>-<application>[-<cc>] or ''.
+    """
+    match = re.search(r'-{}-{}-(?P<cc>[^-]+)$'.format(
+        re.escape(board_name), re.escape(application_name)), name)
+    return match.group('cc') if match else ''
+
+def job_name_from_prototype(prototype_job, board, application):
+    """
+    Name of the job for board and application derived from prototype_job.
+    """
+    return prototype_job.name.replace(
+        prototype_job.board.riot_name, board.riot_name).replace(
+        prototype_job.application.name, application.name)
+
+class ExpectedJobManager(models.Manager):
+    """
+    Model manager for ExpectedJob
+    """
+    def derive(self, boards=None, applications=None):
+        """
+        All (name, board, application, prototype job) tuples of the jobs
+        needed for the query sets boards x applications (all real ones if
+        None).
+
+        A board gets a job for an application if the application does not
+        blacklist it and, if the application has a whitelist, whitelists it.
+        The jobs needed for a pair are derived from the prototype jobs of
+        both the board and the application.
+        """
+        if boards is None:
+            boards = Board.objects.all_real()
+        if applications is None:
+            applications = Application.objects.all_real()
+
+        blacklisted = set(Application.blacklisted_boards.through.objects.
+            filter(application__in=applications, board__in=boards).
+            values_list('application_id', 'board_id'))
+        whitelists = defaultdict(set)
+        for app_id, board_id in Application.whitelisted_boards.through.\
+                objects.filter(application__in=applications).values_list(
+                    'application_id', 'board_id'):
+            whitelists[app_id].add(board_id)
+
+        board_prototypes = defaultdict(set)
+        for board_id, job_id in Board.prototype_jobs.through.objects.\
+                filter(board__in=boards).values_list('board_id',
+                                                     'applicationjob_id'):
+            board_prototypes[board_id].add(job_id)
+        app_prototypes = defaultdict(set)
+        for app_id, job_id in Application.prototype_jobs.through.objects.\
+                filter(application__in=applications).values_list(
+                    'application_id', 'applicationjob_id'):
+            app_prototypes[app_id].add(job_id)
+        prototype_ids = set()
+        for ids in board_prototypes.values() + app_prototypes.values():
+            prototype_ids |= ids
+        prototypes = ApplicationJob.objects.filter(
+            pk__in=prototype_ids, board__isnull=False,
+            application__isnull=False).select_related('board', 'application',
+                                                      'upstream_job')
+        prototypes = dict((p.pk, p) for p in prototypes)
+
+        applications = list(applications)
+        derived = []
+        names = set()
+        for board in boards:
+            for app in applications:
+                if (app.pk, board.pk) in blacklisted:
+                    continue
+                if whitelists[app.pk] and board.pk not in whitelists[app.pk]:
+                    continue
+                for prototype_id in sorted(board_prototypes[board.pk] |
+                                           app_prototypes[app.pk]):
+                    if prototype_id not in prototypes:
+                        continue
+                    prototype = prototypes[prototype_id]
+                    name = job_name_from_prototype(prototype, board, app)
+                    if name in names:
+                        continue
+                    names.add(name)
+                    derived.append((name, board, app, prototype))
+        return derived
+
+    def _insert(self, derived):
+        names = [name for name, _, _, _ in derived]
+        jobs = {}
+        for i in range(0, len(names), 500):
+            jobs.update(Job.objects.filter(name__in=names[i:i + 500]).
+                        values_list('name', 'pk'))
+        self.bulk_create([ExpectedJob(name=name, board=board, application=app,
+                                      prototype=prototype,
+                                      upstream_job_id=prototype.upstream_job_id,
+                                      job_id=jobs.get(name))
+                          for name, board, app, prototype in derived],
+                         batch_size=500)
+
+    def rebuild(self):
+        """
+        Derives all expected jobs from scratch.
+        """
+        with transaction.atomic():
+            self.all().delete()
+            self._insert(self.derive())
+
+    def update_for(self, boards=(), applications=()):
+        """
+        Derives the expected jobs of all pairs with one of boards or
+        applications again.
+        """
+        board_ids = [b.pk for b in boards]
+        app_ids = [a.pk for a in applications]
+        with transaction.atomic():
+            self.filter(Q(board__in=board_ids) |
+                        Q(application__in=app_ids)).delete()
+            derived = []
+            if board_ids:
+                derived += self.derive(
+                    Board.objects.all_real().filter(pk__in=board_ids))
+            if app_ids:
+                names = set(name for name, _, _, _ in derived)
+                derived += [d for d in self.derive(None,
+                                Application.objects.all_real().filter(
+                                    pk__in=app_ids))
+                            if d[0] not in names]
+            self._insert(derived)
+
+    def update_pairs(self, board_ids, application_ids):
+        """
+        Derives the expected jobs of only the pairs board_ids x
+        application_ids again.
+        """
+        with transaction.atomic():
+            self.filter(board__in=board_ids,
+                        application__in=application_ids).delete()
+            self._insert(self.derive(
+                Board.objects.all_real().filter(pk__in=board_ids),
+                Application.objects.all_real().filter(
+                    pk__in=application_ids)))
+
+    def missing(self):
+        """Expected jobs that do not exist"""
+        return self.filter(job__isnull=True)
+
+    def surplus(self):
+        """Application jobs that are not expected"""
+        return ApplicationJob.objects.filter(board__isnull=False,
+                                             application__isnull=False,
+                                             expected__isnull=True)
+
+    def drifted(self):
+        """
+        Expected jobs that exist with another board, application or
+        upstream job than expected
+        """
+        return self.filter(job__isnull=False).filter(
+            Q(job__applicationjob__isnull=True) |
+            ~Q(job__applicationjob__board=F('board')) |
+            ~Q(job__applicationjob__application=F('application')) |
+            Q(upstream_job__isnull=False) &
+            ~Q(job__upstream_job=F('upstream_job')))
+
+class ExpectedJob(models.Model):
+    """
+    A job that should exist according to the boards, applications, their
+    black- and whitelists and their prototype jobs. job is the existing job
+    of that name, if any.
+    """
+    name = models.CharField(max_length=64, db_index=True)
+    board = models.ForeignKey('Board', related_name='expected_jobs')
+    application = models.ForeignKey('Application',
+                                    related_name='expected_jobs')
+    prototype = models.ForeignKey('ApplicationJob',
+                                  related_name='expected_from_prototype')
+    upstream_job = models.ForeignKey('Job', null=True,
+                                     related_name='expected_downstream_jobs',
+                                     on_delete=models.SET_NULL)
+    job = models.ForeignKey('Job', null=True, related_name='expected',
+                            on_delete=models.SET_NULL)
+
+    objects = ExpectedJobManager()
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+class JobNameTrigramManager(models.Manager):
+    """
+    Model manager for JobNameTrigram
+    """
+    @staticmethod
+    def trigrams(text):
+        text = text.lower()
+        return set(text[i:i + 3] for i in range(len(text) - 2))
+
+    def index(self, job):
+        """
+        (Re-)indexes the name of job.
+        """
+        self.filter(job=job).delete()
+        self.bulk_create([JobNameTrigram(job_id=job.pk, trigram=trigram)
+                          for trigram in self.trigrams(job.name)])
+
+    def rebuild(self):
+        """
+        Indexes the names of all jobs from scratch.
+        """
+        with transaction.atomic():
+            self.all().delete()
+            for pk, name in Job.objects.values_list('pk', 'name').iterator():
+                self.bulk_create([JobNameTrigram(job_id=pk, trigram=trigram)
+                                  for trigram in self.trigrams(name)])
+
+    def matching(self, text, selective=2, cap=200):
+        """
+        Values query set of the ids of the jobs whose names contain the
+        `selective` rarest trigrams of text (at least three characters
+        long), or None if even the rarest one is in cap or more names and
+        scanning the names is cheaper. The names still need to be checked
+        for text itself.
+        """
+        counts = sorted((len(self.filter(trigram=trigram).values_list(
+                             'job_id')[:cap]), trigram)
+                        for trigram in self.trigrams(text))
+        if counts[0][0] >= cap:
+            return None
+        jobs = None
+        for _, trigram in counts[:selective]:
+            qs = self.filter(trigram=trigram)
+            if jobs is not None:
+                qs = qs.filter(job__in=jobs)
+            jobs = qs.values('job')
+        return jobs
+
+class JobNameTrigram(models.Model):
+    """
+    A three-character substring of a lower-cased job name, to search job
+    names for substrings without scanning all jobs.
+    """
+    job = models.ForeignKey('Job', related_name='name_trigrams')
+    trigram = models.CharField(max_length=3)
+
+    objects = JobNameTrigramManager()
+
+    class Meta:
+        unique_together = [['trigram', 'job']]
+
+class TaskManager(models.Manager):
+    """
+    Model manager for Task
+    """
+    def enqueue(self, name, *args, **kwargs):
+        """
+        Queues the task name with args unless an identical task is still
+        queued, and returns the queued task. Pass trace=True to record a
+        trace of the task (see tracing).
+        """
+        trace = kwargs.get('trace', False)
+        arguments = json.dumps(args)
+        # the arguments may be long lists of ids
+        key = hashlib.sha1("{}({})".format(name, arguments)).hexdigest()
+        with transaction.atomic():
+            task = self.filter(key=key, status=Task.QUEUED).first()
+            if task is None:
+                task = self.create(name=name, arguments=arguments, key=key,
+                                   trace=trace)
+            elif trace and not task.trace:
+                task.trace = True
+                task.save(update_fields=['trace'])
+        return task
+
+    def claim(self, worker=''):
+        """
+        Marks the oldest queued task as running by worker and returns it, or
+        None if there is none. Safe against concurrent workers without row
+        locks.
+        """
+        while True:
+            task = self.filter(status=Task.QUEUED).order_by('created',
+                                                            'pk').first()
+            if task is None:
+                return None
+            started = timezone.now()
+            if self.filter(pk=task.pk, status=Task.QUEUED).update(
+                    status=Task.RUNNING, started=started, worker=worker):
+                task.status = Task.RUNNING
+                task.started = started
+                task.worker = worker
+                return task
+
+class Task(models.Model):
+    """
+    A long-running operation executed by the task worker.
+    """
+    QUEUED = 0
+    RUNNING = 1
+    DONE = 2
+    FAILED = 3
+
+    name = models.CharField(max_length=64)
+    arguments = models.TextField(default='[]')
+    key = models.CharField(max_length=255, db_index=True)
+    status = models.IntegerField(default=QUEUED, db_index=True,
+                                 choices=[(QUEUED, 'Queued'),
+                                          (RUNNING, 'Running'),
+                                          (DONE, 'Done'),
+                                          (FAILED, 'Failed')])
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(blank=True, null=True)
+    finished = models.DateTimeField(blank=True, null=True)
+    result = models.TextField(blank=True, default='')
+    trace = models.BooleanField(default=False)
+    # host:pid of the process running the task
+    worker = models.CharField(max_length=64, blank=True, default='')
+
+    objects = TaskManager()
+
+    class Meta:
+        ordering = ['-created', '-pk']
+
+    def __str__(self):
+        return "{}({})".format(self.name, self.arguments)
+
+    @models.permalink
+    def get_absolute_url(self):
+        return ('task-detail', (self.pk,))
+
+    @property
+    def args(self):
+        return json.loads(self.arguments)
+
+    def is_finished(self):
+        return self.status in (Task.DONE, Task.FAILED)
+
+class FlashRequestManager(models.Manager):
+    """
+    Model manager for FlashRequest
+    """
+    def enqueue(self, board, application, action=None):
+        """
+        Queues flashing application onto a connected board and, unless
+        action is FlashRequest.FLASH, testing it.
+        """
+        return self.create(board=board, application=application,
+                           action=action or FlashRequest.TEST)
+
+class FlashRequest(models.Model):
+    """
+    A request to flash an application onto a physical board and optionally
+    test it, executed by the board scheduler (see hil).
+    """
+    FLASH = 'flash'
+    TEST = 'test'
+
+    QUEUED = Task.QUEUED
+    RUNNING = Task.RUNNING
+    DONE = Task.DONE
+    FAILED = Task.FAILED
+
+    board = models.ForeignKey('Board', related_name='flash_requests')
+    application = models.ForeignKey('Application',
+                                    related_name='flash_requests')
+    action = models.CharField(max_length=8, default=TEST,
+                              choices=[(FLASH, 'Flash'), (TEST, 'Test')])
+    status = models.IntegerField(default=QUEUED, db_index=True,
+                                 choices=[(QUEUED, 'Queued'),
+                                          (RUNNING, 'Running'),
+                                          (DONE, 'Done'),
+                                          (FAILED, 'Failed')])
+    port = models.ForeignKey('Port', related_name='flash_requests',
+                             blank=True, null=True,
+                             on_delete=models.SET_NULL)
+    # number of times the request was queued again because its device
+    # disappeared
+    attempts = models.IntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(blank=True, null=True)
+    finished = models.DateTimeField(blank=True, null=True)
+    result = models.TextField(blank=True, default='')
+
+    objects = FlashRequestManager()
+
+    class Meta:
+        ordering = ['-created', '-pk']
+
+    def __str__(self):
+        return "{} {} on {}".format(self.action, self.application,
+                                    self.board)
+
+    def is_finished(self):
+        return self.status in (FlashRequest.DONE, FlashRequest.FAILED)
+
 def repository_pre_save(sender, instance, raw, using, update_fields, **kwargs):
     if instance.has_boards_tree:
         error = ValidationError("{} is no tree in the repository.".format(
@@ -551,10 +1292,114 @@ def repository_post_save(sender, instance, created, raw, using, update_fields,
 
         JobNamespace.objects.create(name=input_name, repository=instance)
 
+def application_job_pre_save(sender, instance, raw, **kwargs):
+    if not raw:
+        instance.compiler = instance.compiler_from_name()
+
+def job_post_save(sender, instance, created, raw, **kwargs):
+    if created:
+        JobNameTrigram.objects.index(instance)
+        ExpectedJob.objects.filter(name=instance.name).update(job=instance.pk)
+
+def sqlite_connection_created(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        cursor = connection.connection.cursor()
+        for pragma, value in settings.RIOT_SQLITE_PRAGMAS:
+            cursor.execute('PRAGMA {} = {}'.format(pragma, value))
+        cursor.close()
+
+def job_namespace_changed(sender, **kwargs):
+    JobNamespace.objects.invalidate_trie()
+
+def expected_job_board_post_save(sender, instance, raw, **kwargs):
+    if not raw:
+        ExpectedJob.objects.update_for(boards=[instance])
+
+def expected_job_application_post_save(sender, instance, raw, **kwargs):
+    if not raw:
+        ExpectedJob.objects.update_for(applications=[instance])
+
+def expected_job_prototype_post_save(sender, instance, created, raw,
+                                     **kwargs):
+    if not created and not raw and \
+       ExpectedJob.objects.filter(prototype=instance).exists():
+        ExpectedJob.objects.update_for(instance.board_prototype_for.all(),
+                                       instance.app_prototype_for.all())
+
+def expected_job_m2m_changed(sender, instance, action, model, pk_set,
+                             **kwargs):
+    if not action.startswith('post_') or \
+       (action != 'post_clear' and not pk_set):
+        return
+    if sender is Application.blacklisted_boards.through and pk_set:
+        # only the pairs of instance and pk_set changed
+        if isinstance(instance, Application):
+            ExpectedJob.objects.update_pairs(pk_set, [instance.pk])
+        else:
+            ExpectedJob.objects.update_pairs([instance.pk], pk_set)
+        return
+    if sender is Application.whitelisted_boards.through and pk_set:
+        # whether an application has a whitelist at all changes its other
+        # boards too
+        ExpectedJob.objects.update_for(applications=
+            [instance] if isinstance(instance, Application) else
+            Application.objects.filter(pk__in=pk_set))
+        return
+    affected = {Board: set(), Application: set()}
+    if type(instance) in affected:
+        affected[type(instance)].add(instance.pk)
+    if model in affected and pk_set:
+        affected[model] |= pk_set
+    if isinstance(instance, ApplicationJob):
+        # a cleared prototype only shows up in its expected jobs
+        for board_id, app_id in ExpectedJob.objects.filter(
+                prototype=instance).values_list('board_id', 'application_id'):
+            affected[Board].add(board_id)
+    ExpectedJob.objects.update_for(
+        Board.objects.filter(pk__in=affected[Board]),
+        Application.objects.filter(pk__in=affected[Application]))
+
 def application_job_post_save(sender, instance, created, *args, **kwargs):
     if instance.board == None and instance.application == None:
         ApplicationJobDeletionProxy.objects.filter(pk=instance.pk).delete()
 
+def change_counter_bump(sender, **kwargs):
+    ChangeCounter.objects.bump(sender._meta.db_table)
+
+def change_counter_bump_m2m(sender, instance, action, model, **kwargs):
+    if action.startswith('post_'):
+        ChangeCounter.objects.bump(sender._meta.db_table)
+        ChangeCounter.objects.bump(instance._meta.db_table)
+        ChangeCounter.objects.bump(model._meta.db_table)
+
+connection_created.connect(sqlite_connection_created)
 pre_save.connect(repository_pre_save, sender=Repository)
 post_save.connect(repository_post_save, sender=Repository)
+pre_save.connect(application_job_pre_save, sender=ApplicationJob)
 post_save.connect(application_job_post_save, sender=ApplicationJob)
+post_save.connect(job_post_save, sender=Job)
+post_save.connect(job_post_save, sender=ApplicationJob)
+post_save.connect(job_namespace_changed, sender=JobNamespace)
+post_delete.connect(job_namespace_changed, sender=JobNamespace)
+post_save.connect(expected_job_board_post_save, sender=Board)
+post_save.connect(expected_job_application_post_save, sender=Application)
+post_save.connect(expected_job_prototype_post_save, sender=ApplicationJob)
+for through in (Board.prototype_jobs.through,
+                Application.blacklisted_boards.through,
+                Application.whitelisted_boards.through,
+                Application.prototype_jobs.through):
+    m2m_changed.connect(expected_job_m2m_changed, sender=through)
+
+# Models whose changes are counted by ChangeCounter
+COUNTED_MODELS = (Repository, USBDevice, Port, Board, Application,
+                  ApplicationTree, JobNamespace, Job, ApplicationJob,
+                  ApplicationJobDeletionProxy)
+
+for model in COUNTED_MODELS:
+    post_save.connect(change_counter_bump, sender=model)
+    post_delete.connect(change_counter_bump, sender=model)
+for through in (Board.prototype_jobs.through,
+                Application.blacklisted_boards.through,
+                Application.whitelisted_boards.through,
+                Application.prototype_jobs.through):
+    m2m_changed.connect(change_counter_bump_m2m, sender=through)
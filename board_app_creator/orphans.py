@@ -0,0 +1,172 @@
+"""
+Garbage collection of jobs, boards and applications that vanished
+upstream: jobs whose configs are gone from the job storage and boards and
+applications gone from the trees of their repositories.
+
+Orphans are found by set differences of the names in the data base and
+the names listed by the storage and the git trees. They are marked with
+missing_since first and only deleted once they have been missing for the
+retention time, so that a storage or repository that is briefly
+incomplete does not wipe the data base. Rows that show up again are
+unmarked.
+
+bulk_delete() deletes rows with a few queries per batch instead of
+Django's per object collection and signals: it nulls or deletes the rows
+referring to them itself. Application jobs of deleted boards and
+applications are turned into plain jobs (the child rows are deleted, the
+jobs stay), since their configs are still in the storage.
+"""
+from datetime import timedelta
+from os.path import join as path_join
+
+from django.conf import settings
+from django.db import connection, models as db_models, transaction
+from django.utils import timezone
+
+from board_app_creator import models
+
+BATCH_SIZE = 500
+
+def _chunks(items, size=BATCH_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def bulk_delete(model, pks, tables=None):
+    """
+    Deletes the rows of model (only the rows of its own table for
+    inherited models) with the given primary keys and handles the rows
+    referring to them as their on_delete says. Returns the set of the
+    changed tables.
+    """
+    tables = set() if tables is None else tables
+    pks = list(pks)
+    if not pks:
+        return tables
+    opts = model._meta
+    for related in opts.get_all_related_objects(include_hidden=True):
+        if related.parent_model is not model:
+            # relations to a parent model, whose rows stay
+            continue
+        field = related.field
+        on_delete = field.rel.on_delete
+        manager = related.model._base_manager
+        for chunk in _chunks(pks):
+            refs = manager.filter(**{field.name + '__in': chunk})
+            if on_delete is db_models.CASCADE:
+                bulk_delete(related.model, refs.values_list('pk', flat=True),
+                            tables)
+            elif on_delete is db_models.SET_NULL:
+                if refs.update(**{field.name: None}):
+                    tables.add(related.model._meta.db_table)
+            elif on_delete is db_models.PROTECT:
+                if refs.exists():
+                    raise db_models.ProtectedError(
+                        "{} rows refer to the deleted rows".format(
+                            related.model.__name__), list(refs[:10]))
+            elif on_delete is not db_models.DO_NOTHING:
+                raise ValueError("on_delete of {}.{} is not supported".format(
+                    related.model.__name__, field.name))
+    cursor = connection.cursor()
+    for chunk in _chunks(pks):
+        cursor.execute('DELETE FROM {} WHERE {} IN ({})'.format(
+            connection.ops.quote_name(opts.db_table),
+            connection.ops.quote_name(opts.pk.column),
+            ', '.join(['%s'] * len(chunk))), chunk)
+    tables.add(opts.db_table)
+    return tables
+
+def find(repositories=None, backend=None):
+    """
+    The jobs, boards and applications that were checked as dicts of their
+    ids to whether they are orphaned, by 'job', 'board' and
+    'application'. Storages and trees that list nothing are not checked,
+    nor are the boards and applications of repositories not in
+    repositories (all if None).
+    """
+    if repositories is None:
+        repositories = models.Repository.objects.all()
+    backend = backend or models.Job.get_backend()
+    checked = {'job': {}, 'board': {}, 'application': {}}
+
+    listed = set(backend.list_jobs())
+    if listed:
+        checked['job'] = dict((pk, name not in listed) for pk, name in
+                              models.Job.objects.values_list('pk', 'name'))
+    for repo in repositories:
+        head = repo.vcs_repo.head
+        if repo.has_boards_tree:
+            names = set(t.name for t in head.get_file(repo.boards_tree).trees)
+            if names:
+                checked['board'].update(
+                    (pk, name not in names) for pk, name in
+                    models.Board.objects.filter(repo=repo, no_board=False).
+                    values_list('pk', 'riot_name'))
+        for tree in repo.unique_application_trees():
+            paths = set(path_join(tree, t.name)
+                        for t in head.get_file(tree).trees)
+            if paths:
+                checked['application'].update(
+                    (pk, path not in paths) for pk, path in
+                    models.Application.objects.filter(
+                        application_tree__repo=repo,
+                        application_tree__tree_name=tree,
+                        no_application=False).values_list('pk', 'path'))
+    return checked
+
+KINDS = (('job', models.Job, 'name'),
+         ('application', models.Application, 'name'),
+         ('board', models.Board, 'riot_name'))
+
+def collect(repositories=None, backend=None, retention=None, now=None):
+    """
+    Marks the orphans found by find(), unmarks the rows that are no orphans
+    any more and deletes the orphans missing for longer than retention
+    seconds (RIOT_ORPHAN_RETENTION if None). Returns a report of the
+    counts and the names of the deleted rows by kind.
+    """
+    if retention is None:
+        retention = settings.RIOT_ORPHAN_RETENTION
+    now = now or timezone.now()
+    deadline = now - timedelta(seconds=retention)
+    checked = find(repositories, backend)
+    report = {}
+    tables = set()
+    with transaction.atomic():
+        for kind, model, name_field in KINDS:
+            missing = set(pk for pk, orphan in checked[kind].items()
+                          if orphan)
+            marked = dict(model._base_manager.filter(
+                missing_since__isnull=False).values_list('pk',
+                                                         'missing_since'))
+            restored = set(pk for pk in marked
+                           if checked[kind].get(pk) is False)
+            new = missing - set(marked)
+            if restored or new:
+                tables.add(model._meta.db_table)
+            for chunk in _chunks(restored):
+                model._base_manager.filter(pk__in=chunk).update(
+                    missing_since=None)
+            for chunk in _chunks(new):
+                model._base_manager.filter(pk__in=chunk).update(
+                    missing_since=now)
+            expired = [pk for pk in missing
+                       if marked.get(pk, now) <= deadline]
+            names = []
+            for chunk in _chunks(expired):
+                names += model._base_manager.filter(pk__in=chunk).\
+                         values_list(name_field, flat=True)
+            bulk_delete(model, expired, tables)
+            report[kind] = {'missing': len(missing), 'marked': len(new),
+                            'restored': len(restored),
+                            'deleted': sorted(names)}
+        for table in sorted(tables):
+            models.ChangeCounter.objects.bump(table)
+    return report
+
+def summary(report):
+    """The counts of a report of collect() by '<kind>_<key>'"""
+    return dict(('{}_{}'.format(kind, key),
+                 len(value) if key == 'deleted' else value)
+                for kind, counts in report.items()
+                for key, value in counts.items())
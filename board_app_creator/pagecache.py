@@ -0,0 +1,64 @@
+"""
+Caching of rendered pages keyed by the change counters of the tables they
+show.
+
+Every save and delete bumps the counter of its table (see ChangeCounter), so
+edits show up on the next request without explicit invalidation. Writes
+that send no signals (queryset update(), bulk_create() and raw SQL) must
+bump the counters of their tables themselves, otherwise the pages showing
+them stay stale until they expire.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+
+from board_app_creator import models
+
+def version(*models_):
+    """
+    Version string of the change counters of models_ (all counted models if
+    none are given) for use in cache keys.
+    """
+    versions = models.ChangeCounter.objects.versions(
+        *(models_ or models.COUNTED_MODELS))
+    return '-'.join(str(counter) for _, counter in versions)
+
+class VersionedCacheMixin(object):
+    """
+    Serves GET requests of a view from the cache. The key consists of the
+    URL, the user and the change counters of cache_models (all counted
+    models if None).
+
+    Pages with pending messages are neither served from nor stored in the
+    cache.
+    """
+    cache_models = None
+    cache_timeout = None
+
+    def get_cache_key(self, request):
+        key = json.dumps([request.path, sorted(request.GET.lists()),
+                          request.user.pk, version(*(self.cache_models or ()))])
+        return 'page:{}'.format(hashlib.md5(key).hexdigest())
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or \
+                len(messages.get_messages(request)):
+            return super(VersionedCacheMixin, self).dispatch(request, *args,
+                                                             **kwargs)
+        key = self.get_cache_key(request)
+        response = cache.get(key)
+        if response is not None:
+            return response
+        response = super(VersionedCacheMixin, self).dispatch(request, *args,
+                                                             **kwargs)
+        if response.status_code == 200:
+            if hasattr(response, 'render'):
+                response.render()
+            timeout = self.cache_timeout
+            if timeout is None:
+                timeout = settings.RIOT_PAGE_CACHE_TIMEOUT
+            cache.set(key, response, timeout)
+        return response
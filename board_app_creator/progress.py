@@ -0,0 +1,106 @@
+"""
+Progress events of long-running operations.
+
+Code running inside a task calls report(); the events go to a bounded ring
+buffer of that task, which is written to the RIOT_PROGRESS_CACHE cache at
+most every FLUSH_INTERVAL seconds and when the task ends. That cache is
+shared by the web and worker processes, so any of them can stream the
+events of a task running in another one. Readers poll the ring for events
+newer than the last one they saw, so late subscribers catch up on the
+buffered events and a slow reader never blocks the task.
+
+The events are not written to the data base since tasks report from within
+the transactions of their syncs.
+"""
+import collections
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import get_cache
+
+RING_SIZE = 256
+# seconds between writes of a ring to the cache
+FLUSH_INTERVAL = 0.5
+# seconds between reads of a waiting reader
+POLL_INTERVAL = 0.25
+# seconds a ring is kept after its last write
+TIMEOUT = 24 * 3600
+
+def _cache():
+    return get_cache(settings.RIOT_PROGRESS_CACHE)
+
+def _key(task_id):
+    return 'progress:{}'.format(task_id)
+
+class EventRing(object):
+    """
+    The last RING_SIZE events of task_id, numbered from 1.
+    """
+    def __init__(self, task_id, size=RING_SIZE):
+        self.key = _key(task_id)
+        self.events = collections.deque(maxlen=size)
+        self.last_id = 0
+        self.closed = False
+        self._flushed = 0
+
+    def append(self, event):
+        self.last_id += 1
+        event['id'] = self.last_id
+        self.events.append(event)
+        if time.time() - self._flushed >= FLUSH_INTERVAL:
+            self.flush()
+
+    def close(self):
+        self.closed = True
+        self.flush()
+
+    def flush(self):
+        _cache().set(self.key, (list(self.events), self.closed), TIMEOUT)
+        self._flushed = time.time()
+
+def since(task_id, last_id, timeout=None):
+    """
+    Events of task_id after last_id and whether the task ended, or None if
+    it has not started in any process. Waits up to timeout seconds if there
+    are no such events yet.
+    """
+    cache = _cache()
+    deadline = None if timeout is None else time.time() + timeout
+    while True:
+        ring = cache.get(_key(task_id))
+        if ring is None:
+            return None
+        events, closed = ring
+        events = [e for e in events if e['id'] > last_id]
+        if events or closed or \
+           (deadline is not None and time.time() >= deadline):
+            return events, closed
+        time.sleep(POLL_INTERVAL)
+
+_current = threading.local()
+
+def start(task_id):
+    """
+    Directs report() calls of the current thread to a new ring of task_id.
+    """
+    ring = EventRing(task_id)
+    ring.flush()
+    _current.ring = ring
+    return ring
+
+def finish():
+    ring = getattr(_current, 'ring', None)
+    if ring is not None:
+        ring.close()
+        _current.ring = None
+
+def report(phase, message='', done=None, total=None):
+    """
+    Reports progress of the task running in the current thread. Does
+    nothing outside of tasks.
+    """
+    ring = getattr(_current, 'ring', None)
+    if ring is not None:
+        ring.append({'phase': phase, 'message': message, 'done': done,
+                     'total': total, 'time': time.time()})
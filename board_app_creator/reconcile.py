@@ -0,0 +1,670 @@
+"""
+Reconciliation of the data base and the job configurations with the
+repositories and the job storage, split into a planner and an executor.
+
+plan() reads the boards and application trees of the repositories, the job
+names and MultiJob configs of the storage and the data base and returns a
+Plan of the changes needed. It writes nothing. A Plan is plain data: it
+can be stored as JSON, compared with another one (Plan.diff()) and is
+cached under the hash of its inputs, so an unchanged world is planned only
+once.
+
+execute() applies a plan in dependency order: boards, applications, new
+jobs (configs written in parallel, rows inserted in batches) and relinked
+upstream jobs and MultiJob entries. The derived tables (expected jobs, the job name
+index and the change counters) are updated once per step instead of once
+per row.
+
+Jobs expected for boards and applications that a plan creates are planned
+by the next plan, since they are derived from the data base.
+
+Plans delete nothing: rows that vanished upstream are left to
+orphans.collect(), which keeps them for the retention time and ignores
+storages and trees that list nothing.
+"""
+import hashlib
+import json
+from collections import defaultdict, namedtuple
+from multiprocessing.pool import ThreadPool
+from os.path import join as path_join
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from board_app_creator import models, tracing
+
+MULTIJOB_TAG = 'com.tikal.jenkins.plugins.multijob.MultiJobProject'
+CACHE_PREFIX = 'reconcile-plan:'
+BATCH_SIZE = 500
+
+# the order in which execute() applies the changes
+ORDER = (
+    ('board', 'create'), ('board', 'update'),
+    ('application', 'create'), ('application', 'update'),
+    ('job', 'create'), ('job', 'relink'), ('multijob', 'relink'),
+)
+
+class Change(object):
+    """
+    One action ('create', 'update' or 'relink') on the board,
+    application, job or MultiJob named key. values are JSON types.
+    """
+    def __init__(self, kind, action, key, values=None):
+        if (kind, action) not in ORDER:
+            raise ValueError("Unknown change {} {}".format(action, kind))
+        self.kind = kind
+        self.action = action
+        self.key = key
+        self.values = values or {}
+
+    def __eq__(self, other):
+        return isinstance(other, Change) and \
+               self.to_dict() == other.to_dict()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __str__(self):
+        return '{} {} {}'.format(self.action, self.kind, self.key)
+
+    def __repr__(self):
+        return '<Change: {} {}>'.format(self, json.dumps(self.values,
+                                                         sort_keys=True))
+
+    def sort_key(self):
+        return ORDER.index((self.kind, self.action)), self.key
+
+    def to_dict(self):
+        return {'kind': self.kind, 'action': self.action, 'key': self.key,
+                'values': self.values}
+
+class Plan(object):
+    """The changes in execution order and the inputs they were planned of"""
+    def __init__(self, changes=(), inputs=None):
+        self.changes = sorted(changes, key=Change.sort_key)
+        self.inputs = inputs or {}
+
+    def __iter__(self):
+        return iter(self.changes)
+
+    def __len__(self):
+        return len(self.changes)
+
+    @property
+    def key(self):
+        return input_key(self.inputs)
+
+    def filter(self, kind, action):
+        return [c for c in self.changes
+                if c.kind == kind and c.action == action]
+
+    def summary(self):
+        """Number of changes by '<kind>_<action>'"""
+        counts = defaultdict(int)
+        for change in self.changes:
+            counts['{}_{}'.format(change.kind, change.action)] += 1
+        return dict(counts)
+
+    def diff(self, other):
+        """
+        Lines '- <change>' for the changes only other has and '+ <change>'
+        for the ones only this plan has, in execution order.
+        """
+        mine = dict((json.dumps(c.to_dict(), sort_keys=True), c)
+                    for c in self.changes)
+        theirs = dict((json.dumps(c.to_dict(), sort_keys=True), c)
+                      for c in other.changes)
+        lines = [('-', c) for key, c in theirs.items() if key not in mine] + \
+                [('+', c) for key, c in mine.items() if key not in theirs]
+        lines.sort(key=lambda line: (line[1].sort_key(), line[0]))
+        return ['{} {} {}'.format(sign, c, json.dumps(c.values,
+                                                      sort_keys=True))
+                for sign, c in lines]
+
+    def to_dict(self):
+        return {'inputs': self.inputs,
+                'changes': [c.to_dict() for c in self.changes]}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls([Change(**c) for c in data['changes']], data['inputs'])
+
+    def dumps(self):
+        return json.dumps(self.to_dict(), indent=1, sort_keys=True)
+
+    @classmethod
+    def loads(cls, text):
+        return cls.from_dict(json.loads(text))
+
+def input_key(inputs):
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True)).hexdigest()
+
+def _digest(items):
+    sha = hashlib.sha1()
+    for item in items:
+        sha.update(item or '')
+        sha.update('\0')
+    return sha.hexdigest()
+
+def _versions():
+    """The change counters of the tables the planner reads"""
+    return [list(v) for v in models.ChangeCounter.objects.versions(
+        *(models.COUNTED_MODELS + (
+            models.Board.prototype_jobs.through,
+            models.Application.blacklisted_boards.through,
+            models.Application.whitelisted_boards.through,
+            models.Application.prototype_jobs.through)))]
+
+def _chunks(items, size=BATCH_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+class Planner(object):
+    """
+    Plans the reconciliation of repositories (all if None) and the jobs in
+    backend (Job.get_backend() if None).
+    """
+    def __init__(self, repositories=None, backend=None):
+        if repositories is None:
+            repositories = models.Repository.objects.all()
+        self.repositories = list(repositories)
+        self.backend = backend or models.Job.get_backend()
+        self._inputs = None
+
+    def inputs(self):
+        """
+        The repository heads, the job names, the configs of the possible
+        MultiJobs and the data base versions the plan depends on.
+        """
+        if self._inputs is not None:
+            return self._inputs
+        with tracing.span('plan inputs'):
+            self.heads = dict((repo.path, repo.vcs_repo.head)
+                              for repo in self.repositories)
+            self.job_names = sorted(self.backend.list_jobs())
+            self.existing_jobs = set(models.Job.objects.values_list(
+                'name', flat=True))
+            # only new jobs and jobs that are upstream of another one can
+            # be MultiJobs this plan needs to read
+            candidates = set(n for n in self.job_names
+                             if n not in self.existing_jobs)
+            candidates.update(models.Job.objects.filter(
+                downstream_jobs__isnull=False).values_list('name', flat=True))
+            candidates.update(models.ExpectedJob.objects.filter(
+                upstream_job__isnull=False).values_list('upstream_job__name',
+                                                        flat=True))
+            listed = set(self.job_names)
+            configs = self.backend.read_many(sorted(candidates & listed))
+            self.multijob_configs = dict(
+                (name, config) for name, config in configs.items()
+                if config is not None and MULTIJOB_TAG in config)
+            self._inputs = {
+                'repositories': dict((path, head.identifier) for path, head
+                                     in self.heads.items()),
+                'jobs': _digest(self.job_names),
+                'multijobs': _digest(self.multijob_configs[name] for name in
+                                     sorted(self.multijob_configs)),
+                'data': _versions(),
+            }
+        return self._inputs
+
+    def plan(self):
+        inputs = self.inputs()
+        self.changes = []
+        with tracing.span('plan boards'):
+            self._plan_boards()
+        with tracing.span('plan applications'):
+            self._plan_applications()
+        with tracing.span('plan jobs'):
+            self._plan_jobs()
+        return Plan(self.changes, inputs)
+
+    def _add(self, kind, action, key, values=None):
+        self.changes.append(Change(kind, action, key, values))
+
+    def _plan_boards(self):
+        try:
+            default = models.Repository.objects.get(is_default=True).path
+        except models.Repository.DoesNotExist:
+            default = None
+        existing = dict((b['riot_name'], b) for b in models.Board.objects.
+                        values('riot_name', 'repo__path', 'cpu_repo__path',
+                               'no_board'))
+        self.board_names = set(existing)
+        listed = {}
+        for repo in self.repositories:
+            if repo.has_boards_tree:
+                listed[repo.path] = set(tree.name for tree in self.heads[
+                    repo.path].get_file(repo.boards_tree).trees)
+        for repo in self.repositories:
+            if repo.path not in listed:
+                continue
+            for name in sorted(listed[repo.path]):
+                values = {'repository': repo.path, 'cpu_repository': default}
+                board = existing.get(name)
+                if board is None:
+                    self._add('board', 'create', name, values)
+                    self.board_names.add(name)
+                elif not board['no_board'] and \
+                     (board['repo__path'], board['cpu_repo__path']) != \
+                     (repo.path, default):
+                    self._add('board', 'update', name, values)
+
+    def _board_lists(self):
+        lists = defaultdict(lambda: ([], []))
+        for i, through in enumerate((
+                models.Application.blacklisted_boards.through,
+                models.Application.whitelisted_boards.through)):
+            for app, board in through.objects.values_list(
+                    'application__name', 'board__riot_name'):
+                lists[app][i].append(board)
+        return lists
+
+    def _plan_applications(self):
+        existing = dict((a['name'], a) for a in models.Application.objects.
+                        values('name', 'path', 'no_application'))
+        trees = dict((app, (repo, tree)) for app, repo, tree in
+                     models.ApplicationTree.objects.filter(
+                         application__isnull=False).values_list(
+                         'application__name', 'repo__path', 'tree_name'))
+        lists = self._board_lists()
+        self.application_names = set(existing)
+        for repo in self.repositories:
+            head = self.heads[repo.path]
+            for tree in repo.unique_application_trees():
+                for app in head.get_file(tree).trees:
+                    path = path_join(tree, app.name)
+                    try:
+                        name, blacklist, whitelist = \
+                            models.Application.get_name_and_lists_from_makefile(
+                                repo, path_join(path, 'Makefile'))
+                    except (models.Application.DoesNotExist, AssertionError,
+                            ValueError):
+                        continue
+                    blacklist = sorted(set(blacklist) & self.board_names)
+                    whitelist = sorted((set(whitelist) & self.board_names) -
+                                       set(blacklist))
+                    values = {'path': path, 'repository': repo.path,
+                              'tree': tree, 'blacklist': blacklist,
+                              'whitelist': whitelist}
+                    app = existing.get(name)
+                    if app is None:
+                        self._add('application', 'create', name, values)
+                        self.application_names.add(name)
+                    elif not app['no_application'] and (
+                            app['path'] != path or
+                            trees.get(name) != (repo.path, tree) or
+                            map(sorted, lists[name]) != [blacklist,
+                                                         whitelist]):
+                        self._add('application', 'update', name, values)
+
+    def _classify(self, name):
+        """The board and application job name is for, or (None, None)"""
+        found = None, None
+        for board in self.sorted_boards:
+            if board in name:
+                for app in self.sorted_applications:
+                    if app in name:
+                        found = board, app
+        return found
+
+    def _plan_jobs(self):
+        from lxml import etree
+        multijobs = {}
+        upstreams = {}
+        for name, config in sorted(self.multijob_configs.items()):
+            root = etree.fromstring(config)
+            if root.tag != MULTIJOB_TAG:
+                continue
+            multijobs[name] = set(root.xpath('//jobName/text()'))
+            for job in multijobs[name]:
+                upstreams.setdefault(job, name)
+
+        self.sorted_boards = sorted(self.board_names)
+        self.sorted_applications = sorted(self.application_names)
+        board_namespaces = dict(models.Board.objects.filter(
+            repo__job_namespace__isnull=False).values_list(
+            'riot_name', 'repo__job_namespace__name'))
+        repo_namespaces = dict(models.JobNamespace.objects.values_list(
+            'repository__path', 'name'))
+        for change in self.changes:
+            if change.kind == 'board':
+                board_namespaces[change.key] = repo_namespaces.get(
+                    change.values['repository'])
+        try:
+            default_namespace = models.Repository.objects.get(
+                is_default=True).job_namespace.name
+        except (models.Repository.DoesNotExist,
+                models.JobNamespace.DoesNotExist):
+            default_namespace = None
+        trie = models.JobNamespace.objects.get_trie()
+
+        listed = set(self.job_names)
+        # expected jobs belong to the MultiJob of their prototype, which
+        # gets an entry for them if it lacks one
+        generated = []
+        entries = defaultdict(list)
+        for expected in models.ExpectedJob.objects.select_related(
+                'board', 'application', 'prototype__namespace',
+                'upstream_job'):
+            upstream = expected.upstream_job.name \
+                       if expected.upstream_job_id else None
+            if expected.job_id is None and expected.name not in listed:
+                generated.append(expected)
+            if upstream not in multijobs:
+                continue
+            if expected.name not in multijobs[upstream]:
+                if expected.prototype.name not in multijobs[upstream]:
+                    continue
+                entries[upstream].append([expected.name,
+                                          expected.prototype.name])
+            upstreams[expected.name] = upstream
+
+        for name in self.job_names:
+            if name in self.existing_jobs:
+                continue
+            namespace = trie.longest_prefix(name)
+            board, app = self._classify(name)
+            values = {'namespace': namespace.name if namespace else
+                                   default_namespace,
+                      'board': board, 'application': app,
+                      'upstream': upstreams.get(name)}
+            if board is not None:
+                values['namespace'] = board_namespaces.get(board)
+                values['default_prototype'] = \
+                    app in settings.RIOT_DEFAULT_APPLICATIONS and \
+                    board in settings.RIOT_DEFAULT_BOARDS
+            self._add('job', 'create', name, values)
+
+        names = set()
+        for expected in generated:
+            if expected.name in names:
+                continue
+            names.add(expected.name)
+            prototype = expected.prototype
+            self._add('job', 'create', expected.name, {
+                'namespace': prototype.namespace.name
+                             if prototype.namespace_id else None,
+                'board': expected.board.riot_name,
+                'application': expected.application.name,
+                'upstream': upstreams.get(expected.name,
+                                          expected.upstream_job.name
+                                          if expected.upstream_job_id
+                                          else None),
+                'prototype': prototype.name})
+        for upstream, add in sorted(entries.items()):
+            self._add('multijob', 'relink', upstream, {'add': sorted(add)})
+
+        for name, upstream in models.Job.objects.filter(
+                name__in=listed).values_list('name', 'upstream_job__name'):
+            wanted = upstreams.get(name)
+            if wanted is None and upstream is not None and \
+               upstream not in multijobs:
+                # only unlink from MultiJobs that were read
+                continue
+            if wanted != upstream:
+                self._add('job', 'relink', name, {'upstream': wanted})
+
+def plan(repositories=None, backend=None, use_cache=True):
+    """
+    The Plan for repositories and backend (see Planner), from the cache if
+    its inputs did not change.
+    """
+    planner = Planner(repositories, backend)
+    key = CACHE_PREFIX + input_key(planner.inputs())
+    if use_cache:
+        data = cache.get(key)
+        if data is not None:
+            return Plan.from_dict(data)
+    result = planner.plan()
+    cache.set(key, result.to_dict(), settings.RIOT_RECONCILE_PLAN_TIMEOUT)
+    return result
+
+_Named = namedtuple('_Named', 'name')
+
+class Executor(object):
+    """
+    Applies plans to the data base and to backend (Job.get_backend() if
+    None), writing up to writers configs at once.
+    """
+    def __init__(self, backend=None, writers=None, progress=None):
+        self.backend = backend or models.Job.get_backend()
+        self.writers = writers or settings.RIOT_RECONCILE_WRITERS
+        self.progress = progress
+
+    def execute(self, plan):
+        """
+        Applies plan and returns a summary of the applied changes and the
+        ones that failed as (change, error) tuples.
+        """
+        self.failed = []
+        self.changed = set()
+        steps = (
+            ('board', self._boards),
+            ('application', self._applications),
+            ('job create', self._create_jobs),
+            ('job relink', self._relink_jobs),
+            ('multijob relink', self._relink_multijobs),
+        )
+        for done, (name, step) in enumerate(steps, 1):
+            if self.progress:
+                self.progress(done, len(steps), name)
+            with tracing.span('execute ' + name), transaction.atomic():
+                step(plan)
+                for table in sorted(self.changed):
+                    models.ChangeCounter.objects.bump(table)
+                self.changed.clear()
+        summary = plan.summary()
+        summary['failed'] = len(self.failed)
+        return summary
+
+    def _touch(self, *models_):
+        self.changed.update(m._meta.db_table for m in models_)
+
+    def _ids(self, model, field, names):
+        ids = {}
+        for chunk in _chunks(set(n for n in names if n is not None)):
+            ids.update(model.objects.filter(**{field + '__in': chunk}).
+                       values_list(field, 'pk'))
+        return ids
+
+    def _boards(self, plan):
+        changes = plan.filter('board', 'create') + \
+                  plan.filter('board', 'update')
+        if not changes:
+            return
+        repos = self._ids(models.Repository, 'path',
+                          [c.values['repository'] for c in changes] +
+                          [c.values['cpu_repository'] for c in changes])
+        models.Board.objects.bulk_create([models.Board(
+            riot_name=c.key, repo_id=repos.get(c.values['repository']),
+            cpu_repo_id=repos.get(c.values['cpu_repository']))
+            for c in plan.filter('board', 'create')], batch_size=BATCH_SIZE)
+        for c in plan.filter('board', 'update'):
+            models.Board.objects.filter(riot_name=c.key).update(
+                repo=repos.get(c.values['repository']),
+                cpu_repo=repos.get(c.values['cpu_repository']))
+        models.ExpectedJob.objects.update_for(boards=models.Board.objects.
+            filter(riot_name__in=[c.key for c in changes]))
+        self._touch(models.Board)
+
+    def _applications(self, plan):
+        changes = plan.filter('application', 'create') + \
+                  plan.filter('application', 'update')
+        if not changes:
+            return
+        models.Application.objects.bulk_create([models.Application(
+            name=c.key, path=c.values['path'])
+            for c in plan.filter('application', 'create')],
+            batch_size=BATCH_SIZE)
+        for c in plan.filter('application', 'update'):
+            models.Application.objects.filter(name=c.key).update(
+                path=c.values['path'])
+        apps = self._ids(models.Application, 'name', [c.key for c in changes])
+        repos = self._ids(models.Repository, 'path',
+                          [c.values['repository'] for c in changes])
+        boards = self._ids(models.Board, 'riot_name', set(
+            b for c in changes for b in c.values['blacklist'] +
+            c.values['whitelist']))
+        models.ApplicationTree.objects.filter(
+            application__in=apps.values()).delete()
+        models.ApplicationTree.objects.bulk_create([models.ApplicationTree(
+            repo_id=repos[c.values['repository']], tree_name=c.values['tree'],
+            application_id=apps[c.key]) for c in changes],
+            batch_size=BATCH_SIZE)
+        for field in ('blacklist', 'whitelist'):
+            through = getattr(models.Application,
+                              field + 'ed_boards').through
+            through.objects.filter(application__in=apps.values()).delete()
+            through.objects.bulk_create([
+                through(application_id=apps[c.key], board_id=boards[b])
+                for c in changes for b in c.values[field] if b in boards],
+                batch_size=BATCH_SIZE)
+            self._touch(through)
+        models.ExpectedJob.objects.update_for(applications=models.Application.
+            objects.filter(pk__in=apps.values()))
+        self._touch(models.Application, models.ApplicationTree)
+
+    def _write_configs(self, changes):
+        """
+        Writes the configs of the jobs created from prototypes in parallel
+        and returns the changes that succeeded.
+        """
+        import jenkins.jobs
+        apps = dict((a.name, a) for a in models.Application.objects.filter(
+            name__in=set(c.values['application'] for c in changes)))
+        prototypes = {}
+        for prototype in models.ApplicationJob.objects.filter(
+                name__in=set(c.values['prototype'] for c in changes)).\
+                select_related('board', 'application'):
+            try:
+                prototypes[prototype.name] = jenkins.jobs.ApplicationJob(
+                    prototype.name, prototype.board.riot_name,
+                    prototype.application.name, prototype.application.path,
+                    self.backend)
+            except ValueError:
+                pass
+
+        def write(change):
+            values = change.values
+            try:
+                prototype = prototypes[values['prototype']]
+                app = apps[values['application']]
+                jenkins.jobs.ApplicationJob(
+                    change.key, values['board'], app.name, app.path,
+                    self.backend).create_from_prototype(prototype)
+            except (KeyError, ValueError, IOError, OSError) as e:
+                return change, str(e)
+            return change, None
+
+        pool = ThreadPool(self.writers)
+        try:
+            results = pool.map(tracing.inherit(write), changes)
+        finally:
+            pool.close()
+        self.failed += [(c, e) for c, e in results if e is not None]
+        return [c for c, e in results if e is None]
+
+    def _create_jobs(self, plan):
+        changes = plan.filter('job', 'create')
+        generated = [c for c in changes if c.values.get('prototype')]
+        written = set(c.key for c in self._write_configs(generated)) \
+                  if generated else set()
+        changes = [c for c in changes
+                   if not c.values.get('prototype') or c.key in written]
+        if not changes:
+            return
+        namespaces = self._ids(models.JobNamespace, 'name',
+                               [c.values['namespace'] for c in changes])
+        models.Job.objects.bulk_create([models.Job(
+            name=c.key, namespace_id=namespaces.get(c.values['namespace']))
+            for c in changes], batch_size=BATCH_SIZE)
+        jobs = self._ids(models.Job, 'name', [c.key for c in changes])
+
+        app_jobs = [c for c in changes if c.values['board'] is not None]
+        boards = self._ids(models.Board, 'riot_name',
+                           [c.values['board'] for c in app_jobs])
+        apps = self._ids(models.Application, 'name',
+                         [c.values['application'] for c in app_jobs])
+        table = models.ApplicationJob._meta
+        columns = [table.get_field(f).column for f in
+                   ('job_ptr', 'board', 'application', 'compiler')]
+        cursor = connection.cursor()
+        for chunk in _chunks(app_jobs):
+            cursor.executemany('INSERT INTO {} ({}) VALUES ({})'.format(
+                connection.ops.quote_name(table.db_table),
+                ', '.join(connection.ops.quote_name(c) for c in columns),
+                ', '.join(['%s'] * len(columns))),
+                [(jobs[c.key], boards.get(c.values['board']),
+                  apps.get(c.values['application']),
+                  models.compiler_from_name(c.key, c.values['board'],
+                                            c.values['application']))
+                 for c in chunk])
+
+        by_upstream = defaultdict(list)
+        for c in changes:
+            if c.values['upstream'] is not None:
+                by_upstream[c.values['upstream']].append(jobs[c.key])
+        upstreams = self._ids(models.Job, 'name', by_upstream)
+        for upstream, pks in by_upstream.items():
+            for chunk in _chunks(pks):
+                models.Job.objects.filter(pk__in=chunk).update(
+                    upstream_job=upstreams.get(upstream))
+
+        models.JobNameTrigram.objects.bulk_create([
+            models.JobNameTrigram(job_id=jobs[c.key], trigram=trigram)
+            for c in changes
+            for trigram in models.JobNameTrigram.objects.trigrams(c.key)],
+            batch_size=BATCH_SIZE)
+        for name in set(models.ExpectedJob.objects.filter(
+                name__in=jobs).values_list('name', flat=True)):
+            models.ExpectedJob.objects.filter(name=name).update(job=jobs[name])
+
+        defaults = [c for c in app_jobs if c.values.get('default_prototype')]
+        for c in defaults:
+            job = models.ApplicationJob.objects.get(pk=jobs[c.key])
+            job.app_prototype_for.add(*models.Application.objects.exclude(
+                name=c.values['application']))
+            job.board_prototype_for.add(*models.Board.objects.exclude(
+                riot_name=c.values['board']))
+        self._touch(models.Job, models.ApplicationJob)
+
+    def _relink_jobs(self, plan):
+        by_upstream = defaultdict(list)
+        for c in plan.filter('job', 'relink'):
+            by_upstream[c.values['upstream']].append(c.key)
+        upstreams = self._ids(models.Job, 'name', by_upstream)
+        for upstream, names in by_upstream.items():
+            for chunk in _chunks(names):
+                models.Job.objects.filter(name__in=chunk).update(
+                    upstream_job=upstreams.get(upstream))
+        if by_upstream:
+            self._touch(models.Job)
+
+    def _relink_multijobs(self, plan):
+        import jenkins.jobs
+
+        def relink(change):
+            try:
+                jenkins.jobs.MultiJob(change.key, self.backend).\
+                    update_jobs_by_prototype([(_Named(job), _Named(prototype))
+                        for job, prototype in change.values['add']])
+            except (KeyError, ValueError, IOError, OSError) as e:
+                return change, str(e)
+            return change, None
+
+        changes = plan.filter('multijob', 'relink')
+        if not changes:
+            return
+        pool = ThreadPool(self.writers)
+        try:
+            results = pool.map(tracing.inherit(relink), changes)
+        finally:
+            pool.close()
+        self.failed += [(c, e) for c, e in results if e is not None]
+
+def execute(plan, backend=None, writers=None, progress=None):
+    """Applies plan, see Executor"""
+    return Executor(backend, writers, progress).execute(plan)
@@ -0,0 +1,251 @@
+"""
+Background execution of long-running operations.
+
+Operations are queued as Task rows and executed by a worker: either the
+threads started in the web process (RIOT_TASK_WORKER_THREADS) or a separate
+`manage.py runtaskworker` process. No broker is needed; the data base is the
+queue.
+"""
+import errno
+import os
+import Queue
+import socket
+import threading
+import traceback
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from board_app_creator import generation, impact, metrics, models, progress, \
+                              tracing
+
+_registry = {}
+
+def task(func):
+    """
+    Registers func as a task that can be queued by its name.
+    """
+    _registry[func.__name__] = func
+    return func
+
+def _fetch_repository(pk):
+    repo = models.Repository.objects.get(pk=pk)
+    progress.report('fetch', "Fetching {}".format(repo.url))
+    repo.vcs_repo
+    progress.report('fetch', "Fetched {}".format(repo.url), 1, 1)
+    return repo
+
+def _generate(boards=None, applications=None):
+    return generation.generate_jobs(boards, applications,
+        lambda done, total, name: progress.report('write', name, done, total))
+
+def fetch_repositories(repos, jobs=1):
+    """
+    Clones or pulls repos in up to jobs threads. Returns a dict of the
+    errors by repository pk.
+    """
+    pending = Queue.Queue()
+    for repo in repos:
+        pending.put(repo)
+    errors = {}
+    def fetch():
+        while True:
+            try:
+                repo = pending.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                repo.vcs_repo
+            except Exception as e:
+                errors[repo.pk] = e
+    threads = [threading.Thread(target=tracing.inherit(fetch))
+               for _ in range(max(1, min(jobs, len(repos))))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+def sync_repository(repo, since=None, dry_run=False):
+    """
+    Updates the boards and applications of the fetched repo and records the
+    synced commit. If since is set, only the ones changed since that commit
+    are updated and get their jobs generated (planned only on a dry run).
+    Returns a summary dict, with the number of boards and applications that
+    failed to update as failed.
+    """
+    head = repo.vcs_repo.head.identifier
+    summary = {'repository': repo.url, 'commit': head}
+    failed = []
+    if since is None:
+        if repo.has_boards_tree:
+            failed += repo.update_boards()
+        failed += repo.update_applications()
+    else:
+        changes = impact.analyze(repo, since)
+        if repo.has_boards_tree:
+            failed += repo.update_boards(changes.board_names)
+        failed += repo.update_applications(changes.application_paths)
+        generate = generation.plan_jobs if dry_run else \
+                   lambda *args: _generate(*args)[0]
+        jobs = []
+        if changes.board_ids():
+            jobs += generate(changes.boards(), None)
+        if changes.application_paths:
+            jobs += generate(None, changes.applications())
+        summary.update(since=since, paths=len(changes.paths),
+                       boards=len(changes.board_ids()),
+                       applications=len(changes.application_paths),
+                       jobs=len(jobs))
+    # update() instead of save() skips the tree walk of the save signals,
+    # so the page cache needs the bump
+    models.Repository.objects.filter(pk=repo.pk).update(synced_commit=head)
+    models.ChangeCounter.objects.bump(models.Repository._meta.db_table)
+    summary['failed'] = len(failed)
+    return summary
+
+def _failures(failed):
+    return '\n'.join("Failed: {}".format(item) for item in failed)
+
+@task
+def repository_update_applications_and_boards(pk):
+    sync_repository(_fetch_repository(pk))
+
+@task
+def repository_sync_changes(pk, old=None):
+    """
+    Updates and generates jobs for only the boards and applications touched
+    since commit old (the last synced commit if None). Syncs everything if
+    there is no such commit.
+    """
+    repo = _fetch_repository(pk)
+    summary = sync_repository(repo, old or repo.synced_commit)
+    if 'paths' in summary:
+        return "{paths} changed paths, {boards} boards, {applications} " \
+               "applications.\nCreated {jobs} jobs.".format(**summary)
+
+@task
+def repository_add_application_trees(pk, trees):
+    repo = _fetch_repository(pk)
+    return _failures(repo.add_application_trees(trees) +
+                     models.Job.create_from_jenkins_xml())
+
+@task
+def job_update_all():
+    return _failures(models.Job.create_from_jenkins_xml())
+
+@task
+def job_bulk_create(board_ids=None, application_ids=None):
+    boards = applications = None
+    if board_ids is not None:
+        boards = models.Board.objects.filter(pk__in=board_ids)
+    if application_ids is not None:
+        applications = models.Application.objects.filter(
+            pk__in=application_ids)
+    created, failed = _generate(boards, applications)
+    return "Created {} jobs.\n{}".format(len(created), '\n'.join(
+        "{}: {}".format(name, error) for name, error in failed))
+
+def run(task):
+    """
+    Executes a claimed task and records its outcome.
+    """
+    progress.start(task.pk)
+    metrics.start()
+    if task.trace:
+        tracing.start('task-{}'.format(task.pk))
+    try:
+        with tracing.span(task.name, 'task', args=task.arguments):
+            result = _registry[task.name](*task.args)
+        task.status = models.Task.DONE
+        task.result = result or ''
+    except Exception:
+        task.status = models.Task.FAILED
+        task.result = traceback.format_exc()
+    finally:
+        task.finished = timezone.now()
+        task.save(update_fields=['status', 'result', 'finished'])
+        progress.finish()
+        trace = tracing.stop()
+        if trace is not None:
+            tracing.write_part(trace)
+        stats, seconds = metrics.stop()
+        metrics.record('task', task.name, seconds, stats, id=task.pk,
+                       status=task.get_status_display())
+
+def worker_name():
+    """host:pid of this process"""
+    return '{}:{}'.format(socket.gethostname(), os.getpid())
+
+def _dead(worker):
+    """Whether worker is a process of this host that no longer runs"""
+    host, _, pid = worker.rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except OSError as e:
+        return e.errno != errno.EPERM
+    return False
+
+def recover():
+    """
+    Fails the tasks left running by worker processes of this host that died,
+    e.g. in a restart. Returns their number.
+    """
+    running = models.Task.objects.filter(status=models.Task.RUNNING)
+    dead = [pk for pk, worker in running.values_list('pk', 'worker')
+            if _dead(worker)]
+    return running.filter(pk__in=dead).update(
+        status=models.Task.FAILED, finished=timezone.now(),
+        result="The worker process running the task died.")
+
+def work(once=False, interval=1.0):
+    """
+    Executes queued tasks. Returns when the queue is empty if once is set,
+    otherwise polls every interval seconds.
+    """
+    recover()
+    worker = worker_name()
+    while True:
+        task = models.Task.objects.claim(worker)
+        if task is not None:
+            run(task)
+            continue
+        if once:
+            return
+        _wakeup.wait(interval)
+        _wakeup.clear()
+
+_wakeup = threading.Event()
+_threads = []
+_threads_lock = threading.Lock()
+
+def _thread_main():
+    try:
+        work()
+    finally:
+        connection.close()
+
+def start_threads():
+    """
+    Starts RIOT_TASK_WORKER_THREADS worker threads in this process once.
+    """
+    with _threads_lock:
+        while len(_threads) < settings.RIOT_TASK_WORKER_THREADS:
+            thread = threading.Thread(target=_thread_main,
+                                      name='task-worker-{}'.format(len(_threads)))
+            thread.daemon = True
+            thread.start()
+            _threads.append(thread)
+
+def enqueue(name, *args, **kwargs):
+    """
+    Queues task name with args (see TaskManager.enqueue()) and wakes the
+    worker threads of this process.
+    """
+    task = models.Task.objects.enqueue(name, *args, **kwargs)
+    start_threads()
+    _wakeup.set()
+    return task
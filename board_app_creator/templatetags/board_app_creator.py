@@ -1,4 +1,11 @@
+from __future__ import absolute_import
+
 from django import template
+from django.db.models import get_model
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from board_app_creator import pagecache
 
 register = template.Library()
 
@@ -9,3 +16,25 @@ def update_behavior_letter(value):
         return letter[value]
     except Exception:
         return ''
+
+@register.filter
+def coverage_cells(row):
+    """Renders a row of coverage state letters as table cells"""
+    return mark_safe(''.join('<td class=c{}></td>'.format(state)
+                             for state in row))
+
+@register.simple_tag(takes_context=True)
+def page_url(context, number):
+    """Query string of the current request with page set to number"""
+    params = context['request'].GET.copy()
+    params['page'] = number
+    return escape('?' + params.urlencode())
+
+@register.assignment_tag
+def change_version(*model_names):
+    """
+    Version of the given board_app_creator models for {% cache %} keys, e.g.
+    {% change_version "Job" "ApplicationJob" as version %}
+    """
+    return pagecache.version(*(get_model('board_app_creator', name)
+                               for name in model_names))
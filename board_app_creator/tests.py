@@ -1,3 +1,1330 @@
-from django.test import TestCase
+import json
+import os
+from StringIO import StringIO
+import logging
+import shutil
+import socket
+import subprocess
+import tempfile
+from datetime import timedelta
+import threading
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from urlparse import parse_qs, urlparse
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from board_app_creator import api, coverage, export, forms, generation, \
+                              graph, hil, impact, metrics, models, orphans, \
+                              pagecache, progress, reconcile, tasks, \
+                              tracing
+from benchmarks import startup, synthetic
+import jenkins.backends
+import jenkins.jobs
+import registry
+import usb
+
+# keep the per request log lines out of the test output
+logging.getLogger('board_app_creator.metrics').setLevel(logging.WARNING)
+
+MULTIJOB_CONFIG = """<?xml version='1.0' encoding='UTF-8'?>
+<com.tikal.jenkins.plugins.multijob.MultiJobProject>
+  <builders>
+    <com.tikal.jenkins.plugins.multijob.MultiJobBuilder>
+      <phaseJobs>
+        <com.tikal.jenkins.plugins.multijob.PhaseJobsConfig>
+          <jobName>RIOT-msba2-default</jobName>
+        </com.tikal.jenkins.plugins.multijob.PhaseJobsConfig>
+      </phaseJobs>
+    </com.tikal.jenkins.plugins.multijob.MultiJobBuilder>
+  </builders>
+</com.tikal.jenkins.plugins.multijob.MultiJobProject>
+"""
+
+class StubJenkinsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body='', content_type='application/xml'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _job_name(self, path):
+        parts = path.split('/')
+        if len(parts) >= 3 and parts[1] == 'job':
+            return parts[2]
+        return None
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(('GET', self.path))
+        server.connections.add(self.client_address)
+        if server.failures > 0:
+            server.failures -= 1
+            return self._reply(503)
+        url = urlparse(self.path)
+        name = self._job_name(url.path)
+        if url.path == '/api/json':
+            jobs = [{'name': n} for n in sorted(server.configs)]
+            return self._reply(200, json.dumps({'jobs': jobs}),
+                               'application/json')
+        if url.path == '/crumbIssuer/api/json':
+            return self._reply(404)
+        if name not in server.configs:
+            return self._reply(404)
+        if url.path.endswith('/config.xml'):
+            return self._reply(200, server.configs[name])
+        return self._reply(200, json.dumps({'name': name}),
+                           'application/json')
+
+    def do_POST(self):
+        server = self.server
+        server.requests.append(('POST', self.path))
+        server.connections.add(self.client_address)
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.getheader('Content-Length')))
+        if url.path == '/createItem':
+            name = parse_qs(url.query)['name'][0]
+            if name in server.configs:
+                return self._reply(400)
+        else:
+            name = self._job_name(url.path)
+            if name not in server.configs:
+                return self._reply(404)
+        if name in server.broken:
+            return self._reply(500)
+        server.configs[name] = body
+        return self._reply(200)
+
+class StubJenkinsServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+class StubJenkinsMixin(object):
+    """
+    Serves configs from a stub Jenkins; writes of the jobs in broken are
+    answered with 500.
+    """
+    def start_jenkins(self, configs, broken=()):
+        self.server = StubJenkinsServer(('127.0.0.1', 0), StubJenkinsHandler)
+        self.server.configs = dict(configs)
+        self.server.broken = set(broken)
+        self.server.requests = []
+        self.server.connections = set()
+        self.server.failures = 0
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.backend = jenkins.backends.get_backend('http',
+            'http://127.0.0.1:{}/'.format(self.server.server_port),
+            pool_size=2, backoff=0)
+
+    def stop_jenkins(self):
+        self.backend.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+class HTTPBackendTest(StubJenkinsMixin, SimpleTestCase):
+    def setUp(self):
+        self.start_jenkins({'RIOT-tests': MULTIJOB_CONFIG})
+
+    def tearDown(self):
+        self.stop_jenkins()
+
+    def test_list_and_read(self):
+        self.assertEqual(self.backend.list_jobs(), ['RIOT-tests'])
+        self.assertEqual(self.backend.read('RIOT-tests'), MULTIJOB_CONFIG)
+        self.assertEqual(self.backend.read('RIOT-missing'), None)
+        self.assertEqual(self.backend.read_many(['RIOT-tests', 'RIOT-missing']),
+                         {'RIOT-tests': MULTIJOB_CONFIG, 'RIOT-missing': None})
+
+    def test_create_and_update(self):
+        self.backend.write('RIOT-new', '<project/>')
+        self.assertIn(('POST', '/createItem?name=RIOT-new'),
+                      self.server.requests)
+        self.assertEqual(self.server.configs['RIOT-new'], '<project/>')
+        self.backend.write('RIOT-new', '<project><a/></project>')
+        self.assertIn(('POST', '/job/RIOT-new/config.xml'),
+                      self.server.requests)
+        self.assertEqual(self.server.configs['RIOT-new'],
+                         '<project><a/></project>')
+
+    def test_traced_pool(self):
+        trace = tracing.start('read_many')
+        self.backend.read_many(['RIOT-tests', 'RIOT-missing'])
+        tracing.stop()
+        self.assertEqual([e['name'] for e in trace.events].count(
+            'HTTPBackend.read'), 2)
+
+    def test_keep_alive(self):
+        for _ in range(5):
+            self.backend.read('RIOT-tests')
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_retry(self):
+        self.server.failures = 2
+        self.assertEqual(self.backend.read('RIOT-tests'), MULTIJOB_CONFIG)
+        self.server.failures = 10
+        with self.assertRaises(jenkins.backends.HTTPError):
+            self.backend.read('RIOT-tests')
+
+    def test_multijob(self):
+        job = jenkins.jobs.MultiJob('RIOT-tests', self.backend)
+        self.assertEqual(list(job), ['RIOT-msba2-default'])
+        job.filetree.find('.//jobName').text = 'RIOT-msba2-hello-world'
+        job.save()
+        job = jenkins.jobs.MultiJob('RIOT-tests', self.backend)
+        self.assertEqual(list(job), ['RIOT-msba2-hello-world'])
+
+        # a job may be its own prototype
+        named = lambda name: jenkins.jobs.Job(name, self.backend)
+        job.update_jobs_by_prototype([
+            (named('RIOT-msba2-hello-world'), named('RIOT-msba2-hello-world')),
+            (named('RIOT-iotlab-m3-hello-world'),
+             named('RIOT-msba2-hello-world'))])
+        self.assertEqual(list(jenkins.jobs.MultiJob('RIOT-tests',
+                                                    self.backend)),
+                         ['RIOT-iotlab-m3-hello-world',
+                          'RIOT-msba2-hello-world'])
+
+class CoverageMatrixTest(TestCase):
+    def setUp(self):
+        self.boards = [models.Board.objects.create(riot_name=name)
+                       for name in ('msba2', 'native', 'samr21-xpro')]
+        self.apps = [models.Application.objects.create(name=name)
+                     for name in ('default', 'hello-world', 'shell')]
+
+    def add_job(self, board, app):
+        return models.ApplicationJob.objects.create(
+            name='RIOT-{}-{}'.format(board, app), namespace=None,
+            board=board, application=app)
+
+    def test_next_missing(self):
+        msba2, native, samr21 = self.boards
+        default, hello_world, shell = self.apps
+        self.add_job(msba2, hello_world)
+        matrix = coverage.get_matrix()
+        self.assertTrue(matrix.has_job('msba2', 'hello-world'))
+        self.assertEqual(matrix.next_missing('default', 'msba2'),
+                         ('shell', 'msba2'))
+        self.add_job(msba2, shell)
+        self.assertIsNot(coverage.get_matrix(), matrix)
+        self.assertEqual(coverage.get_matrix().next_missing('default', 'msba2'),
+                         ('default', 'native'))
+        self.add_job(native, default)
+        self.add_job(samr21, default)
+        coverage.get_matrix()
+        # only the change counters are read
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                coverage.get_matrix().next_missing('default', 'msba2'),
+                (None, None))
+        # writes without signals, as by other processes, bump the counters
+        models.ApplicationJob.objects.filter(board=native).update(
+            application=shell)
+        models.ChangeCounter.objects.bump(
+            models.ApplicationJob._meta.db_table)
+        self.assertEqual(coverage.get_matrix().next_missing('default',
+                                                            'msba2'),
+                         ('default', 'native'))
+
+    def test_states(self):
+        msba2, native, samr21 = self.boards
+        default, hello_world, shell = self.apps
+        self.add_job(msba2, default)
+        coverage.get_matrix()
+        hello_world.blacklisted_boards.add(native)
+        shell.whitelisted_boards.add(samr21)
+        self.assertEqual(coverage.get_matrix().states(),
+                         (['msba2', 'native', 'samr21-xpro'],
+                          ['default', 'hello-world', 'shell'],
+                          ['JMX', 'MBX', 'MMW']))
+        response = self.client.get(reverse('job-coverage-json'))
+        self.assertEqual(json.loads(response.content)['rows'],
+                         ['JMX', 'MBX', 'MMW'])
+        response = self.client.get(reverse('job-coverage'))
+        self.assertContains(response, '<td class=cB></td>', 2)
+
+    def test_lists_of_later_rows(self):
+        # the lists are read on the first states(), after a new board
+        matrix = coverage.CoverageMatrix.from_db()
+        board = models.Board.objects.create(riot_name='z1')
+        self.apps[0].blacklisted_boards.add(board)
+        self.assertEqual(matrix.states()[0], ['msba2', 'native',
+                                              'samr21-xpro'])
+
+class APITest(TestCase):
+    def setUp(self):
+        self.board = models.Board.objects.create(riot_name='msba2')
+        self.app = models.Application.objects.create(name='default')
+        for i in range(5):
+            models.Job.objects.create(name='RIOT-job{}'.format(i),
+                                      namespace=None, update_behavior=i % 2)
+        models.ApplicationJob.objects.create(name='RIOT-msba2-default',
+                                             namespace=None, board=self.board,
+                                             application=self.app)
+
+    def test_cursor_pagination(self):
+        names = []
+        url = reverse('api-job-list') + '?limit=2'
+        while url:
+            with self.assertNumQueries(2):
+                data = json.loads(self.client.get(url).content)
+            self.assertLessEqual(len(data['results']), 2)
+            names.extend(job['name'] for job in data['results'])
+            url = data['next']
+        self.assertEqual(names, list(models.Job.objects.values_list('name',
+                                                                    flat=True)))
+
+    def test_invalid_cursor(self):
+        url = reverse('api-job-list')
+        for values in ({'name': 'RIOT-job0'}, ['RIOT-job0'], 'RIOT-job0'):
+            response = self.client.get(url,
+                                       {'cursor': api.encode_cursor(values)})
+            self.assertEqual(response.status_code, 400)
+        response = self.client.get(url, {'cursor': 'not base64'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_filter(self):
+        response = self.client.get(reverse('api-job-list'), {'board': 'msba2'})
+        results = json.loads(response.content)['results']
+        self.assertEqual([(j['name'], j['board'], j['application'])
+                          for j in results],
+                         [('RIOT-msba2-default', 'msba2', 'default')])
+
+    def test_conditional_get(self):
+        url = reverse('api-board-list')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        models.Board.objects.create(riot_name='native')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+class JobsPathTestCase(TestCase):
+    """
+    Runs with a temporary JENKINS_JOBS_PATH that contains the given configs.
+    """
+    configs = {}
+
+    def setUp(self):
+        self.jobs_path = tempfile.mkdtemp()
+        self.backend = jenkins.backends.FilesystemBackend(self.jobs_path)
+        for name, config in self.configs.items():
+            self.backend.write(name, config)
+        models.Job._backend = self.backend
+
+    def tearDown(self):
+        del models.Job._backend
+        shutil.rmtree(self.jobs_path)
+
+class JobGenerationTest(StubJenkinsMixin, JobsPathTestCase):
+    configs = {
+        'RIOT-tests': MULTIJOB_CONFIG,
+        'RIOT-msba2-default': '<project><board>msba2</board>'
+                              '<app>examples/default</app></project>\n',
+    }
+
+    def setUp(self):
+        super(JobGenerationTest, self).setUp()
+        self.boards = [models.Board.objects.create(riot_name=name)
+                       for name in ('msba2', 'native', 'samr21-xpro')]
+        self.apps = [models.Application.objects.create(name=name,
+                                                       path='examples/' + name)
+                     for name in ('default', 'hello-world', 'shell')]
+        multijob = models.Job.objects.create(name='RIOT-tests', namespace=None)
+        self.prototype = models.ApplicationJob.objects.create(
+            name='RIOT-msba2-default', namespace=None, upstream_job=multijob,
+            board=self.boards[0], application=self.apps[0])
+        for board in self.boards:
+            board.prototype_jobs.add(self.prototype)
+        self.apps[1].blacklisted_boards.add(self.boards[1])
+        self.apps[2].whitelisted_boards.add(self.boards[2])
+
+    def test_generate_jobs(self):
+        progress = []
+        created, failed = generation.generate_jobs(
+            progress=lambda done, total, name: progress.append((done, total)))
+        self.assertEqual(failed, [])
+        self.assertEqual(sorted(created), ['RIOT-msba2-hello-world',
+                                           'RIOT-native-default',
+                                           'RIOT-samr21-xpro-default',
+                                           'RIOT-samr21-xpro-hello-world',
+                                           'RIOT-samr21-xpro-shell'])
+        self.assertEqual(progress[-1], (5, 5))
+        self.assertEqual(self.backend.read('RIOT-samr21-xpro-shell'),
+                         '<project><board>samr21-xpro</board>'
+                         '<app>examples/shell</app></project>\n')
+        job = models.ApplicationJob.objects.get(name='RIOT-native-default')
+        self.assertEqual(job.upstream_job.name, 'RIOT-tests')
+        self.assertEqual(sorted(jenkins.jobs.MultiJob('RIOT-tests', self.backend)),
+                         ['RIOT-msba2-default', 'RIOT-msba2-hello-world',
+                          'RIOT-native-default', 'RIOT-samr21-xpro-default',
+                          'RIOT-samr21-xpro-hello-world',
+                          'RIOT-samr21-xpro-shell'])
+        self.assertEqual(generation.plan_jobs(), [])
+
+    def test_generate_jobs_with_failing_jenkins(self):
+        self.start_jenkins(self.configs, broken=['RIOT-native-default'])
+        self.addCleanup(self.stop_jenkins)
+        models.Job._backend = self.backend
+        created, failed = generation.generate_jobs()
+        self.assertEqual([name for name, _ in failed], ['RIOT-native-default'])
+        self.assertEqual(len(created), 4)
+        self.assertFalse(models.Job.objects.filter(
+            name='RIOT-native-default').exists())
+        multijob = jenkins.jobs.MultiJob('RIOT-tests', self.backend)
+        self.assertEqual(sorted(multijob), ['RIOT-msba2-default'] + created)
+
+    def test_reload_command(self):
+        configs = dict(self.configs, **{'RIOT-nightly': '<project/>'})
+        self.start_jenkins(configs)
+        self.addCleanup(self.stop_jenkins)
+        models.Job._backend = self.backend
+        out = StringIO()
+        call_command('reloadjobs', jobs=2, json=True, stdout=out)
+        self.assertEqual(json.loads(out.getvalue())['failed'], 0)
+        self.assertTrue(models.Job.objects.filter(name='RIOT-nightly').exists())
+        # the config read in the batch is parsed, not read again
+        self.assertEqual(self.server.requests.count(
+            ('GET', '/job/RIOT-nightly/config.xml')), 1)
+
+    def test_import_skips_broken_configs(self):
+        # a malformed config and a board without a repository
+        self.backend.write('RIOT-broken', '<project')
+        self.backend.write('RIOT-native-shell', '<project/>')
+        self.backend.write('RIOT-nightly', '<project/>')
+        logger = logging.getLogger('board_app_creator')
+        log = StringIO()
+        handlers = logger.handlers
+        logger.handlers = [logging.StreamHandler(log)]
+        try:
+            failed = models.Job.create_from_jenkins_xml()
+        finally:
+            logger.handlers = handlers
+        self.assertEqual(failed, ['RIOT-broken'])
+        self.assertIn('Adding job RIOT-broken failed', log.getvalue())
+        self.assertEqual(sorted(models.Job.objects.values_list('name',
+                                                               flat=True)),
+                         ['RIOT-msba2-default', 'RIOT-native-shell',
+                          'RIOT-nightly', 'RIOT-tests'])
+
+    def expected(self):
+        return sorted(models.ExpectedJob.objects.values_list('name',
+                                                             flat=True))
+
+    def test_expected_jobs(self):
+        expected = self.expected()
+        self.assertEqual(len(expected), 6)
+        models.ExpectedJob.objects.rebuild()
+        self.assertEqual(self.expected(), expected)
+        self.assertEqual(len(models.ExpectedJob.objects.missing()), 5)
+
+        generation.generate_jobs()
+        self.assertFalse(models.ExpectedJob.objects.missing().exists())
+        self.assertFalse(models.ExpectedJob.objects.surplus().exists())
+        self.assertFalse(models.ExpectedJob.objects.drifted().exists())
+        models.ExpectedJob.objects.update(upstream_job=None)
+        self.assertFalse(models.ExpectedJob.objects.drifted().exists())
+        models.ExpectedJob.objects.rebuild()
+
+        self.apps[0].blacklisted_boards.add(self.boards[2])
+        self.assertEqual([j.name for j in models.ExpectedJob.objects.surplus()],
+                         ['RIOT-samr21-xpro-default'])
+        # list changes re-derive only what they affect, like a rebuild
+        expected = self.expected()
+        self.boards[0].whitelisted_applications.add(self.apps[1])
+        self.boards[2].blacklisted_applications.remove(self.apps[0])
+        changed = self.expected()
+        self.assertNotEqual(changed, expected)
+        models.ExpectedJob.objects.rebuild()
+        self.assertEqual(self.expected(), changed)
+        self.boards[2].blacklisted_applications.add(self.apps[0])
+        self.boards[0].whitelisted_applications.remove(self.apps[1])
+        self.assertEqual(self.expected(), expected)
+        models.Job.objects.filter(name='RIOT-native-default').update(
+            upstream_job=None)
+        self.assertEqual([j.name for j in models.ExpectedJob.objects.drifted()],
+                         ['RIOT-native-default'])
+        self.prototype.board_prototype_for.clear()
+        self.assertEqual(self.expected(), [])
+
+class JobSearchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        board = models.Board.objects.create(riot_name='msba2')
+        app = models.Application.objects.create(name='default',
+                                                path='examples/default')
+        models.ApplicationJob.objects.create(name='RIOT-msba2-default-clang',
+                                             board=board, application=app)
+        models.ApplicationJob.objects.create(name='RIOT-msba2-default',
+                                             board=board, application=app)
+        models.Job.objects.create(name='RIOT-tests', update_behavior=2)
+        models.Job.objects.create(name='RIOTtools')
+
+    def search(self, **params):
+        form = forms.JobFilterForm(params)
+        return sorted(form.filter(models.Job.objects.all()).values_list(
+            'name', flat=True))
+
+    def test_filters(self):
+        self.assertEqual(models.ApplicationJob.objects.get(
+            name='RIOT-msba2-default-clang').compiler, 'clang')
+        self.assertEqual(self.search(q='DEFAULT'), ['RIOT-msba2-default',
+                                                    'RIOT-msba2-default-clang'])
+        self.assertEqual(self.search(q='t-t'), ['RIOT-tests'])
+        self.assertEqual(self.search(q='ts'), ['RIOT-tests'])
+        self.assertEqual(self.search(prefix='RIOT-'),
+                         ['RIOT-msba2-default', 'RIOT-msba2-default-clang',
+                          'RIOT-tests'])
+        self.assertEqual(self.search(board='msba2', application='default'),
+                         ['RIOT-msba2-default', 'RIOT-msba2-default-clang'])
+        self.assertEqual(self.search(compiler='clang'),
+                         ['RIOT-msba2-default-clang'])
+        self.assertEqual(self.search(update_behavior='2'), ['RIOT-tests'])
+        self.assertEqual(self.search(update_behavior=''), self.search())
+
+    def test_view(self):
+        response = self.client.get(reverse('job-list'), {'q': 'tools'})
+        self.assertEqual([j.name for j in response.context['object_list']],
+                         ['RIOTtools'])
+
+class NamespaceTrieTest(TestCase):
+    def test_resolve(self):
+        models.Repository.objects.bulk_create([
+            models.Repository(url='https://example.org/{}.git'.format(i),
+                              path='repo{}'.format(i)) for i in range(3)])
+        repos = list(models.Repository.objects.all())
+        models.JobNamespace.objects.create(name='RIOT', repository=repos[0])
+        models.JobNamespace.objects.create(name='RIOT-apps',
+                                           repository=repos[1])
+        models.JobNamespace.objects.resolve('')
+        with self.assertNumQueries(0):
+            self.assertEqual(models.JobNamespace.objects.resolve(
+                'RIOT-apps-msba2').name, 'RIOT-apps')
+            self.assertEqual(models.JobNamespace.objects.resolve(
+                'RIOT-app').name, 'RIOT')
+            self.assertIsNone(models.JobNamespace.objects.resolve('RIO'))
+        models.JobNamespace.objects.create(name='RIOT-app',
+                                           repository=repos[2])
+        self.assertEqual(models.JobNamespace.objects.resolve(
+            'RIOT-app-msba2').name, 'RIOT-app')
+
+class SQLitePragmaTest(SimpleTestCase):
+    def test_pragmas(self):
+        cursor = connection.cursor()
+        cursor.execute('PRAGMA synchronous')
+        self.assertEqual(cursor.fetchone()[0], 1)
+        cursor.execute('PRAGMA cache_size')
+        self.assertEqual(cursor.fetchone()[0], -16000)
+
+class JobGraphTest(SimpleTestCase):
+    edges = [('all', 'tests'), ('tests', 'msba2'), ('tests', 'native'),
+             ('all', 'docs'), ('loop-a', 'loop-b'), ('loop-b', 'loop-a')]
+
+    def test_forest(self):
+        index = graph.JobGraph(['single'] + [n for e in self.edges for n in e],
+                               self.edges)
+        self.assertIsNotNone(index.preorder)
+        self.assertEqual(sorted(index.downstream('all')),
+                         ['docs', 'msba2', 'native', 'tests'])
+        self.assertEqual(index.downstream_count('tests'), 2)
+        self.assertEqual(index.upstream('native'), ['tests', 'all'])
+        self.assertEqual(index.root_names(), ['all', 'single'])
+        self.assertEqual(index.depth('msba2'), 2)
+        self.assertIsNone(index.depth('loop-a'))
+        self.assertEqual(index.downstream('loop-a'), ['loop-b'])
+        self.assertEqual(index.cycles(), [['loop-a', 'loop-b']])
+        self.assertEqual(list(index.tree('tests')),
+                         [('tests', 0), ('msba2', 1), ('native', 1)])
+
+    def test_dag(self):
+        index = graph.JobGraph(['a', 'b', 'c', 'd'], [('a', 'b'), ('a', 'c'),
+                                                      ('b', 'd'), ('c', 'd')])
+        self.assertIsNone(index.preorder)
+        self.assertEqual(sorted(index.downstream('a')), ['b', 'c', 'd'])
+        self.assertEqual(index.depth('d'), 2)
+        self.assertEqual(index.cycles(), [])
+
+class JobGraphViewTest(JobsPathTestCase):
+    configs = {'RIOT-tests': MULTIJOB_CONFIG,
+               'RIOT-msba2-default': '<project/>'}
+
+    def test_views(self):
+        multijob = models.Job.objects.create(name='RIOT-tests')
+        models.Job.objects.create(name='RIOT-msba2-default',
+                                  upstream_job=multijob)
+        self.assertEqual(
+            graph.JobGraph.from_multijobs(self.backend).downstream(
+                'RIOT-tests'), ['RIOT-msba2-default'])
+        data = json.loads(self.client.get(reverse('job-graph-json'),
+                                          {'job': 'RIOT-tests'}).content)
+        self.assertEqual(data['downstream'], ['RIOT-msba2-default'])
+        response = self.client.get(reverse('job-graph'))
+        self.assertEqual(response.context['roots'], [('RIOT-tests', 1)])
+        response = self.client.get(reverse('job-graph'),
+                                   {'job': 'RIOT-msba2-default'})
+        self.assertEqual(response.context['upstream'], ['RIOT-tests'])
+
+        # writes without signals, as by other processes, bump the counters
+        models.Job.objects.filter(name='RIOT-msba2-default').update(
+            upstream_job=None)
+        models.ChangeCounter.objects.bump(models.Job._meta.db_table)
+        self.assertEqual(graph.get_graph().downstream('RIOT-tests'), [])
+
+class ImpactTest(JobsPathTestCase):
+    files = {'boards/board0/Makefile.include': 'export CPU = lpc2387\n',
+             'boards/board1/Makefile.include': 'export CPU = native\n',
+             'cpu/lpc2387/cpu.c': '', 'core/kernel.c': ''}
+
+    def setUp(self):
+        super(ImpactTest, self).setUp()
+        self.base = tempfile.mkdtemp()
+        self.settings = override_settings(
+            RIOT_REPO_BASE_PATH=os.path.join(self.base, 'repos'))
+        self.settings.enable()
+        url = os.path.join(self.base, 'RIOT.git')
+        self.boards = ['board0', 'board1']
+        self.source = synthetic.create_repository(
+            url, self.boards, ['app0', 'app1'], self.files)
+        synthetic.clone(url, os.path.join(self.base, 'repos', 'RIOT'))
+        models.Repository.objects.bulk_create([models.Repository(
+            url=url, path='RIOT', is_default=True, has_boards_tree=True,
+            boards_tree='boards', has_cpu_tree=True, cpu_tree='cpu')])
+        self.repo = models.Repository.objects.get()
+        self.repo.update_boards()
+        self.repo.add_application_trees(['examples'])
+        self.old = self.repo.vcs_repo.head.identifier
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.base)
+        super(ImpactTest, self).tearDown()
+
+    def test_analyze(self):
+        files = dict(self.files, **{'cpu/lpc2387/cpu.c': 'changed',
+                                    'core/kernel.c': 'changed',
+                                    'examples/app1/main.c': ''})
+        synthetic.commit(self.source, self.boards, ['app0', 'app1'], files)
+        repo = models.Repository.objects.get()
+        changes = impact.analyze(repo, self.old)
+        self.assertEqual(changes.paths, ['core/kernel.c', 'cpu/lpc2387/cpu.c',
+                                         'examples/app1/main.c'])
+        self.assertEqual(changes.unmapped, ['core/kernel.c'])
+        self.assertEqual([b.riot_name for b in changes.boards()], ['board0'])
+        self.assertEqual([a.name for a in changes.applications()], ['app1'])
+        self.assertEqual(self.client.get(reverse('repository-impact-json',
+            kwargs={'pk': repo.pk}), {'old': self.old}).status_code, 200)
+
+        version = pagecache.version(models.Repository)
+        tasks.repository_sync_changes(repo.pk, self.old)
+        self.assertEqual(models.Repository.objects.get().synced_commit,
+                         changes.commit.identifier)
+        self.assertNotEqual(pagecache.version(models.Repository), version)
+
+    def test_commands(self):
+        models.Board.objects.filter(riot_name='board1').delete()
+        out = StringIO()
+        call_command('syncrepositories', 'RIOT', dry_run=True, json=True,
+                     jobs=2, stdout=out)
+        fetch, sync = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(fetch['failed'], 0)
+        self.assertEqual(sync['rows']['board'], 1)
+        self.assertEqual(sync['failed'], 0)
+        self.assertFalse(models.Board.objects.filter(
+            riot_name='board1').exists())
+        self.assertIsNone(models.Repository.objects.get().synced_commit)
+
+        trace = os.path.join(self.base, 'trace.json')
+        call_command('syncrepositories', since=self.old, trace=trace,
+                     stdout=out)
+        self.assertEqual(models.Repository.objects.get().synced_commit,
+                         self.old)
+        with open(trace) as f:
+            names = set(e['name'] for e in json.load(f)['traceEvents'])
+        self.assertTrue(set(['sync', 'fetch', 'GitRepository.pull',
+                             'GitRepository.get_commit']) <= names)
+
+@override_settings(RIOT_DEFAULT_BOARDS=['board0'],
+                   RIOT_DEFAULT_APPLICATIONS=['app0'])
+class SyntheticTreeTestCase(JobsPathTestCase):
+    """
+    Runs with a synthetic repository of the boards board0 and board1 and
+    the applications app0 and app1 and jobs of the first three pairs.
+    """
+    def setUp(self):
+        super(SyntheticTreeTestCase, self).setUp()
+        cache.clear()
+        self.base = tempfile.mkdtemp()
+        self.settings = override_settings(
+            RIOT_REPO_BASE_PATH=os.path.join(self.base, 'repos'))
+        self.settings.enable()
+        url = os.path.join(self.base, 'RIOT.git')
+        # app0 blacklists both boards, app1 none
+        self.source = synthetic.create_repository(url, ['board0', 'board1'],
+                                                  ['app0', 'app1'])
+        synthetic.clone(url, os.path.join(self.base, 'repos', 'RIOT'))
+        synthetic.create_jobs(self.jobs_path, ['board0', 'board1'],
+                              ['app0', 'app1'], count=3, multijobs=True)
+        models.Repository.objects.bulk_create([models.Repository(
+            url=url, path='RIOT', is_default=True, has_boards_tree=True,
+            boards_tree='boards')])
+        self.repo = models.Repository.objects.get()
+        models.JobNamespace.objects.create(name='RIOT', repository=self.repo)
+        models.ApplicationTree.objects.create(repo=self.repo,
+                                              tree_name='examples')
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.base)
+        super(SyntheticTreeTestCase, self).tearDown()
+
+class ReconcileTest(SyntheticTreeTestCase):
+    def test_plan_and_execute(self):
+        plan = reconcile.plan()
+        self.assertEqual(plan.summary(), {'board_create': 2,
+                                          'application_create': 2,
+                                          'job_create': 5})
+        self.assertFalse(models.Board.objects.exists())
+        self.assertEqual(reconcile.Plan.loads(plan.dumps()).to_dict(),
+                         plan.to_dict())
+        self.assertEqual(reconcile.execute(plan)['failed'], 0)
+        job = models.ApplicationJob.objects.get(name='RIOT-board1-app0')
+        self.assertEqual((job.board.riot_name, job.application.name,
+                          job.upstream_job.name, job.namespace.name),
+                         ('board1', 'app0', 'RIOT-app0-all', 'RIOT'))
+        self.assertEqual(models.Application.objects.get(
+            name='app0').blacklisted_boards.count(), 2)
+        self.assertEqual(models.ApplicationJob.objects.get(
+            name='RIOT-board0-app0').app_prototype_for.count(), 1)
+
+        # the default prototype now calls for RIOT-board1-app1
+        second = reconcile.plan()
+        self.assertEqual([str(c) for c in second], [
+            'create job RIOT-board1-app1', 'relink job RIOT-board0-app1',
+            'relink multijob RIOT-app0-all'])
+        self.assertIn('+ create job RIOT-board1-app1 {"application": "app1", '
+                      '"board": "board1", "namespace": "RIOT", "prototype": '
+                      '"RIOT-board0-app0", "upstream": "RIOT-app0-all"}',
+                      second.diff(plan))
+        self.assertEqual(reconcile.execute(second)['failed'], 0)
+        self.assertIn('make -C examples/app1 BOARD=board1',
+                      self.backend.read('RIOT-board1-app1'))
+        self.assertEqual(sorted(jenkins.jobs.MultiJob('RIOT-app0-all',
+                                                      self.backend)),
+                         ['RIOT-board0-app0', 'RIOT-board0-app1',
+                          'RIOT-board1-app0', 'RIOT-board1-app1'])
+        self.assertFalse(models.ExpectedJob.objects.missing().exists())
+        self.assertFalse(models.ExpectedJob.objects.drifted().exists())
+        third = reconcile.plan()
+        self.assertEqual(len(third), 0)
+        self.assertIsNotNone(cache.get(reconcile.CACHE_PREFIX + third.key))
+
+        # vanished rows are left to orphans.collect(), only the blacklist
+        # of app0 lost board1
+        shutil.rmtree(os.path.join(self.jobs_path, 'RIOT-board0-app1'))
+        synthetic.commit(self.source, ['board0'], ['app0', 'app1'])
+        self.assertEqual([str(c) for c in reconcile.plan()],
+                         ['update application app0'])
+
+    def test_command(self):
+        path = os.path.join(self.base, 'plan.json')
+        out = StringIO()
+        call_command('reconcile', dry_run=True, json=True, output=path,
+                     stdout=out)
+        self.assertEqual(json.loads(out.getvalue().splitlines()[0])[
+            'job_create'], 5)
+        self.assertFalse(models.Job.objects.exists())
+        call_command('reconcile', plan=path, stdout=out)
+        self.assertEqual(models.Job.objects.count(), 5)
+
+        # the orphans are only marked, an empty storage is not checked
+        shutil.rmtree(os.path.join(self.jobs_path, 'RIOT-board1-app0'))
+        out = StringIO()
+        call_command('reconcile', json=True, stdout=out)
+        self.assertEqual(json.loads(out.getvalue().splitlines()[-1])[
+            'job_marked'], 1)
+        for name in os.listdir(self.jobs_path):
+            shutil.rmtree(os.path.join(self.jobs_path, name))
+        count = models.Job.objects.count()
+        call_command('collectorphans', retention=0, stdout=out)
+        self.assertEqual(models.Job.objects.count(), count)
+        with self.assertRaises(CommandError):
+            call_command('reconcile', plan=path, stdout=out)
+
+class OrphansTest(SyntheticTreeTestCase):
+    def test_collect(self):
+        reconcile.execute(reconcile.plan())
+        shutil.rmtree(os.path.join(self.jobs_path, 'RIOT-board1-app0'))
+        synthetic.commit(self.source, ['board0'], ['app0'])
+        out = StringIO()
+        call_command('collectorphans', dry_run=True, retention=0, json=True,
+                     stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual((report['job_deleted'], report['board_deleted'],
+                          report['application_deleted']), (1, 1, 1))
+        self.assertEqual(models.Job.objects.count(), 5)
+
+        version = pagecache.version()
+        report = orphans.collect()
+        self.assertNotEqual(pagecache.version(), version)
+        self.assertEqual([report[kind]['marked'] for kind in
+                          ('job', 'board', 'application')], [1, 1, 1])
+        self.assertEqual(report['job']['deleted'], [])
+        self.assertIsNotNone(models.Board.objects.get(
+            riot_name='board1').missing_since)
+
+        report = orphans.collect(now=timezone.now() + timedelta(days=8))
+        self.assertEqual(report['job']['deleted'], ['RIOT-board1-app0'])
+        self.assertEqual(report['application']['deleted'], ['app1'])
+        self.assertEqual(report['board']['deleted'], ['board1'])
+        # the job of app1 stays as a plain job
+        self.assertEqual(sorted(models.Job.objects.values_list('name',
+                                                               flat=True)),
+                         ['RIOT-app0-all', 'RIOT-app1-all',
+                          'RIOT-board0-app0', 'RIOT-board0-app1'])
+        self.assertEqual(list(models.ApplicationJob.objects.values_list(
+            'name', flat=True)), ['RIOT-board0-app0'])
+        self.assertFalse(models.ExpectedJob.objects.filter(
+            board__riot_name='board1').exists())
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    @override_settings(DEBUG=True)
+    def test_request(self):
+        response = self.client.get(reverse('repository-list'))
+        self.assertGreater(int(response['X-Metrics-Sql-Queries']), 0)
+        text = self.client.get(reverse('metrics')).content
+        self.assertIn('riot_request_seconds_count{view="repository-list"} 1',
+                      text)
+        self.assertIn('riot_request_sql_queries_total{{view="{}"}} {}'.format(
+            'repository-list', response['X-Metrics-Sql-Queries']), text)
+
+    def test_hooks(self):
+        metrics.start()
+        jenkins.jobs.Job('job', jenkins.backends.FilesystemBackend(
+            tempfile.gettempdir())).load('<project/>')
+        # only the subprocesses of usb are counted; lsusb itself is stubbed
+        # since it may not be installed
+        subprocess.call(['true'])
+        check_output = subprocess.check_output
+        subprocess.check_output = lambda *args, **kwargs: ''
+        try:
+            usb.lsusb()
+        finally:
+            subprocess.check_output = check_output
+        stats, seconds = metrics.stop()
+        self.assertEqual((stats['xml_parses'], stats['subprocesses']), (1, 1))
+        metrics.record('task', 'job_update_all', seconds, stats)
+        self.assertIn('riot_task_xml_parses_total{task="job_update_all"} 1',
+                      metrics.render())
+
+class TracingTest(JobsPathTestCase):
+    configs = {'RIOT-tests': MULTIJOB_CONFIG,
+               'RIOT-msba2-default': '<project/>'}
+
+    def setUp(self):
+        super(TracingTest, self).setUp()
+        self.trace_dir = tempfile.mkdtemp()
+        self.settings = override_settings(RIOT_TRACE_DIR=self.trace_dir)
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.trace_dir)
+        super(TracingTest, self).tearDown()
+
+    def test_threads(self):
+        trace = tracing.start('threads')
+        with tracing.span('outer'):
+            thread = threading.Thread(target=tracing.inherit(
+                self.backend.read), args=('RIOT-tests',))
+            thread.start()
+            thread.join()
+        tracing.stop()
+        with tracing.span('untraced'):
+            pass
+        events = tracing.merge([trace.to_dict()])['traceEvents']
+        spans = dict((e['name'], e) for e in events if e['ph'] == 'X')
+        self.assertEqual(sorted(spans), ['FilesystemBackend.read', 'outer'])
+        self.assertNotEqual(spans['outer']['tid'],
+                            spans['FilesystemBackend.read']['tid'])
+        # threads started without inherit() are not traced
+        tracing.start('threads')
+        thread = threading.Thread(target=self.backend.read,
+                                  args=('RIOT-tests',))
+        thread.start()
+        thread.join()
+        self.assertEqual(tracing.stop().events, [])
+
+    def test_task(self):
+        task = models.Task.objects.enqueue('job_update_all', trace=True)
+        tasks.run(models.Task.objects.claim())
+        response = self.client.get(reverse('task-trace',
+                                           kwargs={'pk': task.pk}))
+        names = set(e['name'] for e in json.loads(response.content)[
+            'traceEvents'])
+        self.assertTrue(set(['job_update_all', 'classify jobs',
+                             'classify job', 'Job.load']) <= names)
+
+class ExportTest(TestCase):
+    def setUp(self):
+        board = models.Board.objects.create(riot_name='msba2')
+        app = models.Application.objects.create(name='default',
+                                                path='examples/default')
+        self.multijob = models.Job.objects.create(name='RIOT-tests')
+        for i in range(5):
+            models.ApplicationJob.objects.create(
+                name='RIOT-msba2-default-cc{}'.format(i),
+                upstream_job=self.multijob, board=board, application=app)
+
+    def test_chunked_rows(self):
+        with self.assertNumQueries(3):
+            rows = list(export.iter_jobs(chunk_size=3))
+        self.assertEqual([row[1] for row in rows],
+                         ['RIOT-tests'] + ['RIOT-msba2-default-cc{}'.format(i)
+                                           for i in range(5)])
+        self.assertEqual(rows[1][3:], ['RIOT-tests', 'Always ask', 'msba2',
+                                       'default', 'cc0'])
+
+    def test_views(self):
+        response = self.client.get(reverse('job-export', args=('csv',)),
+                                   {'compiler': 'cc4'})
+        self.assertEqual(''.join(response.streaming_content).splitlines(),
+            ['id,name,namespace,upstream_job,update_behavior,board,'
+             'application,compiler',
+             '{},RIOT-msba2-default-cc4,,RIOT-tests,Always ask,msba2,'
+             'default,cc4'.format(models.Job.objects.get(
+                 name='RIOT-msba2-default-cc4').pk)])
+        response = self.client.get(reverse('job-coverage-export',
+                                           args=('jsonl',)))
+        self.assertEqual([json.loads(line) for line in
+                          ''.join(response.streaming_content).splitlines()],
+                         [{'board': 'msba2', 'application': 'default',
+                           'state': 'job'}])
+
+@tasks.task
+def add_numbers(a, b):
+    if b is None:
+        raise ValueError("b is None")
+    return str(a + b)
+
+@tasks.task
+def count_to(n):
+    for i in range(1, n + 1):
+        progress.report('count', str(i), i, n)
+
+@override_settings(RIOT_TASK_WORKER_THREADS=0)
+class TaskTest(TestCase):
+    def setUp(self):
+        progress._cache().clear()
+
+    def test_deduplication(self):
+        task = tasks.enqueue('add_numbers', 1, 2)
+        self.assertEqual(tasks.enqueue('add_numbers', 1, 2), task)
+        self.assertNotEqual(tasks.enqueue('add_numbers', 2, 2), task)
+        self.assertEqual(models.Task.objects.claim(), task)
+        self.assertNotEqual(tasks.enqueue('add_numbers', 1, 2), task)
+
+    def test_long_arguments(self):
+        task = tasks.enqueue('add_numbers', range(1000), 2)
+        self.assertEqual(len(task.key), 40)
+        self.assertEqual(tasks.enqueue('add_numbers', range(1000), 2), task)
+
+    def test_recover(self):
+        process = subprocess.Popen(['true'])
+        process.wait()
+        dead, alive = [models.Task.objects.create(
+            name='count_to', status=models.Task.RUNNING,
+            worker='{}:{}'.format(socket.gethostname(), pid))
+            for pid in (process.pid, os.getpid())]
+        tasks.work(once=True)
+        self.assertEqual(models.Task.objects.get(pk=dead.pk).status,
+                         models.Task.FAILED)
+        self.assertEqual(models.Task.objects.get(pk=alive.pk).status,
+                         models.Task.RUNNING)
+
+    def test_work(self):
+        done = tasks.enqueue('add_numbers', 1, 2)
+        failed = tasks.enqueue('add_numbers', 1, None)
+        tasks.work(once=True)
+        done = models.Task.objects.get(pk=done.pk)
+        self.assertEqual((done.status, done.result), (models.Task.DONE, '3'))
+        failed = models.Task.objects.get(pk=failed.pk)
+        self.assertEqual(failed.status, models.Task.FAILED)
+        self.assertIn('b is None', failed.result)
+        response = self.client.get(failed.get_absolute_url())
+        self.assertContains(response, 'Failed')
+
+    def test_events(self):
+        task = tasks.enqueue('count_to', progress.RING_SIZE + 10)
+        tasks.work(once=True)
+        response = self.client.get(reverse('task-events', args=(task.pk,)),
+                                   HTTP_LAST_EVENT_ID='3')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = ''.join(response.streaming_content).split('\n\n')
+        self.assertEqual(stream[0].split('\n')[0], 'id: 11')
+        self.assertEqual(len(stream), progress.RING_SIZE + 2)
+        self.assertEqual(stream[-2], 'event: end\ndata: "Done"')
+
+class EventRingTest(SimpleTestCase):
+    def setUp(self):
+        progress._cache().clear()
+
+    def test_ring(self):
+        self.assertIsNone(progress.since('ring', 0, 0))
+        ring = progress.EventRing('ring', size=3)
+        for i in range(5):
+            ring.append({'n': i})
+        ring.flush()
+        # read back through the cache, as another process does
+        events, closed = progress.since('ring', 0, 0)
+        self.assertEqual([e['id'] for e in events], [3, 4, 5])
+        self.assertFalse(closed)
+        self.assertEqual(progress.since('ring', 4, 0)[0], [{'n': 4, 'id': 5}])
+        ring.close()
+        self.assertEqual(progress.since('ring', 5), ([], True))
+
+class StubFlasher(hil.Flasher):
+    def __init__(self):
+        self.calls = []
+        self.failures = {}
+
+    def _call(self, action, port, board, application):
+        self.calls.append((action, port.path, board.riot_name,
+                           application.name))
+        if action in self.failures:
+            self.failures.pop(action)()
+        return '{} {}'.format(action, application.name)
+
+    def flash(self, *args):
+        return self._call('flash', *args)
+
+    def test(self, *args):
+        return self._call('test', *args)
+
+class SchedulerTest(TestCase):
+    def setUp(self):
+        self.inventory = [
+            usb.USBDevice('/dev/bus/usb/001/002', 'A', '0403:6001'),
+            usb.USBDevice('/dev/bus/usb/001/003', 'A', '0403:6001'),
+            usb.USBDevice('/dev/bus/usb/002/002', 'B', '10c4:ea60')]
+        models.USBDevice.objects.update_from_system(self.inventory)
+        self.boards = [models.Board.objects.create(
+            riot_name=name, usb_device=models.USBDevice.objects.get(
+                usb_id=usb_id)) for name, usb_id in (('a', '0403:6001'),
+                                                     ('b', '10c4:ea60'))]
+        self.apps = [models.Application.objects.create(name=name)
+                     for name in ('app0', 'app1')]
+        self.flasher = StubFlasher()
+        self.scheduler = hil.Scheduler(self.flasher, lambda: self.inventory,
+                                       hub_concurrency=1, max_attempts=2,
+                                       threaded=False)
+
+    def enqueue(self, board, app, action=None):
+        return models.FlashRequest.objects.enqueue(self.boards[board],
+                                                   self.apps[app], action)
+
+    def test_batches(self):
+        for board, app in ((0, 0), (0, 1), (0, 0)):
+            self.enqueue(board, app)
+        self.enqueue(1, 0, models.FlashRequest.FLASH)
+        batches = self.scheduler.step()
+        # one batch per hub, both tests of app0 on board a flashed once
+        self.assertEqual([(port.path, len(requests))
+                          for port, requests in batches],
+                         [('/dev/bus/usb/001/002', 2),
+                          ('/dev/bus/usb/002/002', 1)])
+        self.assertEqual(self.flasher.calls, [
+            ('flash', '/dev/bus/usb/001/002', 'a', 'app0'),
+            ('test', '/dev/bus/usb/001/002', 'a', 'app0'),
+            ('test', '/dev/bus/usb/001/002', 'a', 'app0'),
+            ('flash', '/dev/bus/usb/002/002', 'b', 'app0')])
+        self.assertEqual(models.FlashRequest.objects.filter(
+            status=models.FlashRequest.DONE).count(), 3)
+
+        # app1 goes to the other port, keeping app0 for its next request
+        self.enqueue(0, 0)
+        self.flasher.calls = []
+        self.scheduler.step()
+        self.scheduler.step()
+        self.assertEqual(self.flasher.calls, [
+            ('flash', '/dev/bus/usb/001/003', 'a', 'app1'),
+            ('test', '/dev/bus/usb/001/003', 'a', 'app1'),
+            ('test', '/dev/bus/usb/001/002', 'a', 'app0')])
+        self.assertEqual(self.scheduler.step(), [])
+        self.assertFalse(self.scheduler.busy)
+        self.assertFalse(models.FlashRequest.objects.exclude(
+            status=models.FlashRequest.DONE).exists())
+
+    def test_device_disappears(self):
+        request = self.enqueue(1, 1)
+        def unplug():
+            self.inventory.pop()
+            raise hil.FlasherError('lost')
+        self.flasher.failures['test'] = unplug
+        self.scheduler.step()
+        request = models.FlashRequest.objects.get(pk=request.pk)
+        self.assertEqual((request.status, request.attempts, request.port),
+                         (models.FlashRequest.QUEUED, 1, None))
+        self.assertEqual(self.scheduler.step(), [])
+
+        self.inventory.append(usb.USBDevice('/dev/bus/usb/002/005', 'B',
+                                            '10c4:ea60'))
+        self.scheduler.step()
+        request = models.FlashRequest.objects.get(pk=request.pk)
+        self.assertEqual((request.status, request.port.path, request.result),
+                         (models.FlashRequest.DONE, '/dev/bus/usb/002/005',
+                          'test app1'))
+        self.assertEqual(self.flasher.calls[-2][:2],
+                         ('flash', '/dev/bus/usb/002/005'))
+
+        # a failing test on a present device fails only its request
+        self.enqueue(1, 0)
+        self.enqueue(1, 0, models.FlashRequest.FLASH)
+        self.flasher.failures['test'] = self.raise_failure
+        self.scheduler.step()
+        self.assertEqual(sorted(models.FlashRequest.objects.filter(
+            application=self.apps[0]).values_list('action', 'status')),
+            [('flash', models.FlashRequest.DONE),
+             ('test', models.FlashRequest.FAILED)])
+
+    def raise_failure(self):
+        raise hil.FlasherError('failed')
+
+class USBTTYTest(SimpleTestCase):
+    def setUp(self):
+        self.sysfs = tempfile.mkdtemp()
+        # an ACM and an FTDI device, each with one interface
+        for name, dev, tty in (('1-1', 4, 'tty/ttyACM0'),
+                               ('1-2', 5, 'ttyUSB1')):
+            device = os.path.join(self.sysfs, name)
+            os.makedirs(os.path.join(device, name + ':1.0', tty))
+            for attribute, value in (('busnum', 1), ('devnum', dev)):
+                with open(os.path.join(device, attribute), 'w') as f:
+                    f.write('{}\n'.format(value))
+
+    def tearDown(self):
+        shutil.rmtree(self.sysfs)
+
+    def test_tty(self):
+        self.assertEqual(usb.tty('/dev/bus/usb/001/004', self.sysfs),
+                         '/dev/ttyACM0')
+        self.assertEqual(usb.tty('/dev/bus/usb/001/005', self.sysfs),
+                         '/dev/ttyUSB1')
+        self.assertIsNone(usb.tty('/dev/bus/usb/001/006', self.sysfs))
+
+    @override_settings(RIOT_HIL_TTYS={'/dev/bus/usb/001/006': '/dev/ttyS0'})
+    def test_configured_tty(self):
+        flasher = hil.MakeFlasher()
+        self.assertEqual(flasher.tty(models.Port(path='/dev/bus/usb/001/006')),
+                         '/dev/ttyS0')
+        with self.assertRaises(hil.FlasherError):
+            flasher.tty(models.Port(path='/dev/unknown'))
+
+class USBSnapshotTest(TestCase):
+    def setUp(self):
+        self.inventory = [usb.USBDevice('/dev/bus/usb/001/002', 'Board',
+                                        '0403:6001')]
+        self.calls = 0
+        def source():
+            self.calls += 1
+            return list(self.inventory)
+        self.snapshot = models.USBDeviceManager._snapshot = \
+            usb.Snapshot(3600, source)
+
+    def tearDown(self):
+        del models.USBDeviceManager._snapshot
+        models.USBDeviceManager._synced = None
+
+    def test_writes_only_on_change(self):
+        models.USBDevice.objects.update_from_snapshot()
+        self.assertEqual(self.calls, 1)
+        port = models.Port.objects.get()
+        self.assertEqual(port.usb_device.usb_id, '0403:6001')
+        # the own writes are compared once more
+        models.USBDevice.objects.update_from_snapshot()
+        with self.assertNumQueries(1):
+            models.USBDevice.objects.update_from_snapshot()
+
+        # ports changed by another process are rewritten from the same
+        # snapshot
+        models.Port.objects.update(usb_device=None)
+        models.ChangeCounter.objects.bump(models.Port._meta.db_table)
+        models.USBDevice.objects.update_from_snapshot()
+        self.assertEqual(self.calls, 1)
+        self.assertIsNotNone(models.Port.objects.get().usb_device)
+
+        self.inventory.append(usb.USBDevice('/dev/bus/usb/001/003', 'Other',
+                                            '10c4:ea60'))
+        self.snapshot.refresh()
+        models.USBDevice.objects.update_from_snapshot()
+        self.assertEqual(models.Port.objects.filter(
+            usb_device__isnull=False).count(), 2)
+
+        self.snapshot.refresh()
+        with self.assertNumQueries(2):
+            models.USBDevice.objects.update_from_snapshot()
+
+    def test_refreshes_in_background(self):
+        self.snapshot.devices()
+        self.snapshot.ttl = 0
+        self.assertEqual(len(self.snapshot.devices()), 1)
+        for _ in range(100):
+            if self.calls == 2:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.calls, 2)
+
+class QueryBudgetTestCase(TestCase):
+    """
+    Asserts that views render with a bounded number of queries that does
+    not grow with the number of rows shown.
+    """
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertQueryBudget(self, url, budget, grow):
+        """
+        Checks url against budget before and after calling grow(), which
+        should add rows shown by url.
+        """
+        before = self.count_queries(url)
+        grow()
+        after = self.count_queries(url)
+        self.assertLessEqual(after, budget,
+            "{} ran {} queries, budget is {}".format(url, after, budget))
+        self.assertEqual(before, after,
+            "{} ran {} queries before and {} after adding rows".format(
+                url, before, after))
+
+class ListViewQueryBudgetTest(QueryBudgetTestCase):
+    def setUp(self):
+        models.Repository.objects.bulk_create([
+            models.Repository(url='https://github.com/RIOT-OS/RIOT.git',
+                              path='RIOT', is_default=True,
+                              has_boards_tree=True, boards_tree='boards'),
+            models.Repository(url='https://github.com/RIOT-OS/applications.git',
+                              path='applications')])
+        self.riot, self.applications = models.Repository.objects.all()
+        self.namespace = models.JobNamespace.objects.create(
+            name='RIOT', repository=self.riot)
+        models.JobNamespace.objects.create(name='Applications',
+                                           repository=self.applications)
+        self.multijob = models.Job.objects.create(name='RIOT-tests',
+                                                  namespace=self.namespace)
+        self.rows = 0
+        self.add_rows(4)
+
+    def add_rows(self, count):
+        for i in range(self.rows, self.rows + count):
+            device = models.USBDevice.objects.create(usb_id='0403:{:04}'.format(i),
+                                                     tag='FT232')
+            models.Port.objects.create(path='/dev/bus/usb/001/{:03}'.format(i),
+                                       usb_device=device)
+            board = models.Board.objects.create(riot_name='board{}'.format(i),
+                                                repo=self.riot,
+                                                cpu_repo=self.riot,
+                                                usb_device=device)
+            app = models.Application.objects.create(name='app{}'.format(i),
+                                                    path='examples/app{}'.format(i))
+            models.ApplicationTree.objects.create(repo=self.applications,
+                                                  tree_name='examples',
+                                                  application=app)
+            job = models.ApplicationJob.objects.create(
+                name='RIOT-board{0}-app{0}'.format(i), namespace=self.namespace,
+                upstream_job=self.multijob, board=board, application=app)
+            board.prototype_jobs.add(job)
+            app.prototype_jobs.add(job)
+            models.Job.objects.create(name='RIOT-board{}-app{}-downstream'.format(i, i),
+                                      namespace=self.namespace, upstream_job=job)
+        self.rows += count
+
+    def test_job_list(self):
+        self.assertQueryBudget(reverse('job-list'), 10,
+                               lambda: self.add_rows(5))
+
+    def test_board_list(self):
+        self.assertQueryBudget(reverse('board-list'), 5,
+                               lambda: self.add_rows(5))
+
+    def test_application_list(self):
+        self.assertQueryBudget(reverse('application-list'), 5,
+                               lambda: self.add_rows(5))
+
+    def test_repository_list(self):
+        def grow():
+            models.Repository.objects.bulk_create([
+                models.Repository(url='https://example.org/{}.git'.format(i),
+                                  path='repo{}'.format(i)) for i in range(5)])
+        self.assertQueryBudget(reverse('repository-list'), 4, grow)
+
+class PageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        models.Repository.objects.bulk_create([
+            models.Repository(url='https://github.com/RIOT-OS/RIOT.git',
+                              path='RIOT')])
+        self.board = models.Board.objects.create(
+            riot_name='msba2', repo=models.Repository.objects.get())
+
+    def test_list_and_detail(self):
+        for url in (reverse('board-list'), self.board.get_absolute_url()):
+            self.assertContains(self.client.get(url), 'msba2')
+            with self.assertNumQueries(1):
+                self.assertContains(self.client.get(url), 'msba2')
+
+            self.board.riot_name = 'native'
+            self.board.save()
+            self.assertContains(self.client.get(url), 'native')
+            self.board.riot_name = 'msba2'
+            self.board.save()
+
+    def test_unplugging_all_devices(self):
+        models.USBDevice.objects.update_from_system([
+            usb.USBDevice('/dev/bus/usb/001/002', 'FT232', '0403:6001')])
+        version = pagecache.version()
+        models.USBDevice.objects.update_from_system([])
+        self.assertNotEqual(pagecache.version(), version)
+
+class StartupTest(SimpleTestCase):
+    def test_registry(self):
+        backends = registry.Registry('test')
+        backends.register('json', 'json.JSONDecoder')
+        self.assertEqual(backends.names(), ['json'])
+        self.assertIs(backends.get('json'), json.JSONDecoder)
+        with self.assertRaises(ValueError):
+            backends.get('xml')
+        modules = []
+        registry.when_imported('json', modules.append)
+        self.assertEqual(modules, [json])
+
+    def test_lazy_imports(self):
+        result = startup.import_time(['board_app_creator.models',
+                                      'board_app_creator.urls'])
+        # lxml is still loaded by the OpenID library of the social logins
+        self.assertEqual([m for m in result['loaded'] if m != 'lxml.etree'],
+                         [])
+
+    def test_check(self):
+        self.assertLess(startup.check_time(), 5)
@@ -0,0 +1,187 @@
+"""
+Nested timing spans of sync pipelines in the Chrome trace event format.
+
+A trace is started for a task (Task.trace) or a command (--trace) and
+attached to the thread running it; the functions a traced thread hands to
+worker threads inherit its trace through inherit(). span() and the hooks
+installed around vcs.git and jenkins (once they are imported) do nothing in
+threads without a trace. Each process writes its
+part of a trace to RIOT_TRACE_DIR as <name>.<pid>.json and merge()
+combines the parts into one file for chrome://tracing or Perfetto.
+"""
+from contextlib import contextmanager
+import glob
+import json
+import os
+import threading
+import time
+from os.path import join as path_join
+
+from django.conf import settings
+
+from registry import when_imported
+
+_current = threading.local()
+
+class Trace(object):
+    def __init__(self, name):
+        self.name = name
+        self.events = []
+        self.threads = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, category, start, end, args=None):
+        thread = threading.current_thread()
+        event = {'name': name, 'cat': category, 'ph': 'X',
+                 'ts': int(start * 1e6), 'dur': int((end - start) * 1e6),
+                 'pid': os.getpid(), 'tid': thread.ident}
+        if args:
+            event['args'] = args
+        with self._lock:
+            self.events.append(event)
+            self.threads[(event['pid'], thread.ident)] = thread.name
+
+    def to_dict(self):
+        with self._lock:
+            events = list(self.events)
+            threads = sorted(self.threads.items())
+        metadata = [{'ph': 'M', 'name': 'process_name', 'pid': pid, 'tid': 0,
+                     'args': {'name': '{} ({})'.format(self.name, pid)}}
+                    for pid in sorted(set(pid for (pid, _), _ in threads))]
+        metadata += [{'ph': 'M', 'name': 'thread_name', 'pid': pid,
+                      'tid': tid, 'args': {'name': name}}
+                     for (pid, tid), name in threads]
+        return {'traceEvents': metadata + events, 'displayTimeUnit': 'ms'}
+
+def start(name):
+    """Attaches a new trace to the current thread and returns it"""
+    trace = _current.trace = Trace(name)
+    return trace
+
+def current():
+    return getattr(_current, 'trace', None)
+
+def stop():
+    """Detaches the trace of the current thread and returns it"""
+    trace = current()
+    _current.trace = None
+    return trace
+
+def inherit(func):
+    """
+    func running under the trace of the current thread, for threads and
+    thread pools started by it
+    """
+    trace = current()
+    if trace is None:
+        return func
+    def wrapper(*args, **kwargs):
+        previous = current()
+        _current.trace = trace
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current.trace = previous
+    wrapper.__name__ = func.__name__
+    return wrapper
+
+@contextmanager
+def span(name, category='sync', **args):
+    """Records the block as a span of the trace of the current thread"""
+    trace = getattr(_current, 'trace', None)
+    if trace is None:
+        yield
+        return
+    begin = time.time()
+    try:
+        yield
+    finally:
+        trace.add(name, category, begin, time.time(), args)
+
+def write_part(trace, directory=None):
+    """Writes the part of trace recorded in this process"""
+    directory = directory or settings.RIOT_TRACE_DIR
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    path = path_join(directory, '{}.{}.json'.format(trace.name, os.getpid()))
+    with open(path, 'w') as f:
+        json.dump(trace.to_dict(), f)
+    return path
+
+def load_parts(name, directory=None):
+    """The parts of trace name written by all processes"""
+    directory = directory or settings.RIOT_TRACE_DIR
+    parts = []
+    for path in sorted(glob.glob(path_join(directory,
+                                           '{}.*.json'.format(name)))):
+        with open(path) as f:
+            parts.append(json.load(f))
+    return parts
+
+def merge(parts):
+    """One trace of the events of parts, ordered by time"""
+    metadata = []
+    events = []
+    for part in parts:
+        for event in part['traceEvents']:
+            if event['ph'] == 'M':
+                if event not in metadata:
+                    metadata.append(event)
+            else:
+                events.append(event)
+    events.sort(key=lambda e: (e['ts'], -e.get('dur', 0)))
+    return {'traceEvents': metadata + events, 'displayTimeUnit': 'ms'}
+
+def _traced(func, name, category):
+    def wrapper(*args, **kwargs):
+        if getattr(_current, 'trace', None) is None:
+            return func(*args, **kwargs)
+        with span(name, category):
+            return func(*args, **kwargs)
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+HOOKS = (
+    ('vcs.git', 'GitRepository', ('clone', 'fetch', 'pull', 'get_commit'),
+     'git'),
+    ('vcs.git', 'GitCommit', ('get_file',), 'git'),
+    ('vcs.git', 'GitTree', ('get_file',), 'git'),
+    ('jenkins.jobs', 'Job', ('load', 'save'), 'jenkins'),
+    ('jenkins.jobs', 'ApplicationJob', ('create_from_prototype',), 'jenkins'),
+    ('jenkins.jobs', 'MultiJob', ('update_job_by_prototype',
+                                  'update_jobs_by_prototype'), 'jenkins'),
+    ('jenkins.backends', 'FilesystemBackend', ('list_jobs', 'read', 'write'),
+     'jenkins'),
+    ('jenkins.backends', 'HTTPBackend', ('list_jobs', 'read', 'read_many',
+                                         'write'), 'jenkins'),
+)
+
+def _hooking(name, methods, category):
+    def hook(module):
+        cls = getattr(module, name)
+        for method in methods:
+            setattr(cls, method, _traced(cls.__dict__[method], '{}.{}'.format(
+                name, method), category))
+    return hook
+
+_installed = False
+
+def install():
+    """Installs the hooks once"""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    for module, name, methods, category in HOOKS:
+        when_imported(module, _hooking(name, methods, category))
+    when_imported('jenkins.backends', _install_backends)
+
+def _install_backends(backends):
+    # the thread pool of HTTPBackend.read_many()
+    map_ = backends.HTTPBackend._map
+    def inheriting_map(self, func, items, *args):
+        return map_(self, inherit(func), items, *args)
+    backends.HTTPBackend._map = inheriting_map
+
+install()
@@ -1,12 +1,18 @@
 from django.conf.urls import url, include
 from django.contrib.auth.decorators import login_required
 
-from board_app_creator import models, views
+from board_app_creator import api, models, views
 
 urlpatterns = [
     url(r'^/*$', views.index, name='index'),
     url(r'^social_auth/', include('social.apps.django_app.urls', namespace='social')),
     url(r'^logout/', 'django.contrib.auth.views.logout', {'template_name': 'board_app_creator/logout.html'}, name='logout'),
+    url(r'^metrics$', views.metrics_text, name='metrics'),
+    url(r'^api/application/?$', api.ApplicationAPIList.as_view(), name='api-application-list'),
+    url(r'^api/application_job/?$', api.ApplicationJobAPIList.as_view(), name='api-application-job-list'),
+    url(r'^api/board/?$', api.BoardAPIList.as_view(), name='api-board-list'),
+    url(r'^api/job/?$', api.JobAPIList.as_view(), name='api-job-list'),
+    url(r'^api/repository/?$', api.RepositoryAPIList.as_view(), name='api-repository-list'),
     url(r'^application/?$', views.ApplicationList.as_view(queryset=models.Application.objects.all_real()), name='application-list'),
     url(r'^application/create/?$', login_required(views.ApplicationCreate.as_view()), name='application-create'),
     url(r'^application/hidden/?$', views.ApplicationList.as_view(), name='application-hidden'),
@@ -23,6 +29,13 @@ urlpatterns = [
     url(r'^board/(?P<pk>\d+)/ignore/?$', login_required(views.board_toggle_no_board), name='board-ignore'),
     url(r'^board/(?P<pk>\d+)/update/?$', login_required(views.BoardUpdate.as_view()), name='board-update'),
     url(r'^job/?$', views.JobList.as_view(queryset=models.Job.objects.select_subclasses()), name='job-list'),
+    url(r'^job/coverage/?$', views.job_coverage, name='job-coverage'),
+    url(r'^job/coverage\.json$', views.job_coverage_json, name='job-coverage-json'),
+    url(r'^job/coverage/export\.(?P<format>csv|jsonl)$', views.job_coverage_export, name='job-coverage-export'),
+    url(r'^job/export\.(?P<format>csv|jsonl)$', views.job_export, name='job-export'),
+    url(r'^job/graph/?$', views.job_graph, name='job-graph'),
+    url(r'^job/graph\.json$', views.job_graph_json, name='job-graph-json'),
+    url(r'^job/bulk_create/?$', login_required(views.job_bulk_create), name='job-bulk-create'),
     url(r'^job/create/?$', login_required(views.JobCreate.as_view()), name='job-create'),
     url(r'^job/create_appjob/?$', login_required(views.ApplicationJobCreate.as_view()), name='application-job-create'),
     url(r'^job/renew/?$', login_required(views.job_update_all), name='job-renew-all'),
@@ -38,5 +51,11 @@ urlpatterns = [
     url(r'^repository/(?P<pk>\d+)/add_application_trees/$', login_required(views.RepositoryAddApplicationTrees.as_view()), name='repository-add-application-trees'),
     url(r'^repository/(?P<pk>\d+)/delete/?$', login_required(views.RepositoryDelete.as_view()), name='repository-delete'),
     url(r'^repository/(?P<pk>\d+)/renew/?$', login_required(views.repository_update_applications_and_boards), name='repository-renew'),
+    url(r'^repository/(?P<pk>\d+)/sync/?$', login_required(views.repository_sync_changes), name='repository-sync-changes'),
+    url(r'^repository/(?P<pk>\d+)/impact\.json$', views.repository_impact_json, name='repository-impact-json'),
     url(r'^repository/(?P<pk>\d+)/update/?$', login_required(views.RepositoryUpdate.as_view()), name='repository-update'),
+    url(r'^task/?$', views.TaskList.as_view(), name='task-list'),
+    url(r'^task/(?P<pk>\d+)/?$', views.TaskDetail.as_view(), name='task-detail'),
+    url(r'^task/(?P<pk>\d+)/events/?$', views.task_events, name='task-events'),
+    url(r'^task/(?P<pk>\d+)/trace\.json$', views.task_trace, name='task-trace'),
 ]
@@ -1,21 +1,30 @@
+import itertools
+import json
 import re
-from os.path import join as path_join
+import time
 from urllib import urlencode
 
 from django.conf import settings
 from django.core.urlresolvers import reverse_lazy
-from django.db.models import Q
+from django.db.models import Count, Q
 from django.forms import RadioSelect
 from django.forms.formsets import formset_factory
 from django.forms.models import modelform_factory
-from django.http import HttpResponseRedirect, Http404
+from django.http import HttpResponse, HttpResponseRedirect, Http404, \
+                        StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
 from django.views.generic import View, DetailView, ListView
 from django.views.generic.edit import CreateView, DeleteView, UpdateView
 
-from board_app_creator import forms, models
+from board_app_creator import coverage, export, forms, generation, graph, \
+                              impact, metrics, models, pagecache, progress, \
+                              tasks, tracing
 import vcs
 
+def _enqueue(request, name, *args):
+    """Queues a task, traced if the request has a trace parameter"""
+    return tasks.enqueue(name, *args, trace='trace' in request.GET)
+
 def index(request):
     if not models.Repository.objects.exists():
         return HttpResponseRedirect(reverse_lazy('repository-create'))
@@ -24,13 +33,17 @@ def index(request):
     else:
         return HttpResponseRedirect(reverse_lazy('job-list'))
 
-class ApplicationDetail(DetailView):
+class ApplicationDetail(pagecache.VersionedCacheMixin, DetailView):
     model = models.Application
 
-class ApplicationList(ListView):
+class ApplicationList(pagecache.VersionedCacheMixin, ListView):
     model = models.Application
     paginate_by = settings.RIOT_DEFAULT_PAGINATION
 
+    def get_queryset(self):
+        return super(ApplicationList, self).get_queryset().prefetch_related(
+            'repository', 'prototype_jobs')
+
     def get_context_data(self, **kwargs):
         context = super(ApplicationList, self).get_context_data(**kwargs)
         context['hidden_shown'] = any(b.no_application for b in context['application_list'])
@@ -75,13 +88,18 @@ def application_update_from_makefile(request, pk):
     app.update_from_makefile()
     return HttpResponseRedirect(reverse_lazy('application-list'))
 
-class BoardDetail(DetailView):
+class BoardDetail(pagecache.VersionedCacheMixin, DetailView):
     model = models.Board
 
-class BoardList(ListView):
+class BoardList(pagecache.VersionedCacheMixin, ListView):
     model = models.Board
     paginate_by = settings.RIOT_DEFAULT_PAGINATION
 
+    def get_queryset(self):
+        return super(BoardList, self).get_queryset().select_related(
+            'repo', 'cpu_repo', 'usb_device').prefetch_related(
+            'usb_device__ports', 'prototype_jobs')
+
     def get_context_data(self, **kwargs):
         context = super(BoardList, self).get_context_data(**kwargs)
         context['hidden_shown'] = any(b.no_board for b in context['board_list'])
@@ -93,11 +111,11 @@ class BoardCreate(CreateView):
     form_class = forms.BoardForm
 
     def get(self, *args, **kwargs):
-        models.USBDevice.objects.update_from_system()
+        models.USBDevice.objects.update_from_snapshot()
         return super(BoardCreate, self).get(*args, **kwargs)
 
     def post(self, *args, **kwargs):
-        models.USBDevice.objects.update_from_system()
+        models.USBDevice.objects.update_from_snapshot()
         return super(BoardCreate, self).post(*args, **kwargs)
 
     def get_context_data(self, **kwargs):
@@ -115,11 +133,11 @@ class BoardUpdate(UpdateView):
     form_class = forms.BoardForm
 
     def get(self, *args, **kwargs):
-        models.USBDevice.objects.update_from_system()
+        models.USBDevice.objects.update_from_snapshot()
         return super(BoardUpdate, self).get(*args, **kwargs)
 
     def post(self, *args, **kwargs):
-        models.USBDevice.objects.update_from_system()
+        models.USBDevice.objects.update_from_snapshot()
         return super(BoardUpdate, self).post(*args, **kwargs)
 
     def get_context_data(self, **kwargs):
@@ -138,26 +156,7 @@ def board_toggle_no_board(request, pk):
         return HttpResponseRedirect(reverse_lazy('board-hidden'))
 
 def _get_next_application_job_params(prev_app_name, prev_board_name):
-    next_applications = models.Application.objects.filter(name__gt=prev_app_name)
-    next_boards = models.Board.objects.filter(riot_name__gt=prev_board_name)
-
-    while next_applications.exists() and \
-        not models.ApplicationJob.objects.exclude(board__riot_name=prev_board_name,
-                                                  application=next_applications.first(),
-                                                  update_behavior__gt=0):
-        next_applications = models.Application.objects.filter(name__gt=next_applications.first().name)
-
-    if next_applications.exists():
-        return next_applications.first().name, prev_board_name
-    while next_boards.exists() and \
-        not models.ApplicationJob.objects.exclude(board=next_boards.first(),
-                                                  application__name=prev_app_name,
-                                                  update_behavior__gt=0):
-        next_boards = models.Board.objects.filter(riot_name__gt=next_boards.first().name)
-
-    if next_boards.exists():
-        return prev_app_name, next_boards.first().riot_name
-    return None, None
+    return coverage.get_matrix().next_missing(prev_app_name, prev_board_name)
 
 class JobCreate(CreateView):
     form_class = modelform_factory(models.Job, widgets={
@@ -176,19 +175,29 @@ class JobDelete(DeleteView):
     success_url = reverse_lazy('job-list')
     template_name = 'board_app_creator/job_confirm_delete.html'
 
-class JobDetail(DetailView):
+class JobDetail(pagecache.VersionedCacheMixin, DetailView):
     model = models.Job
     template_name = 'board_app_creator/job_detail.html'
 
     def get_object(self, queryset=None):
         return super(JobDetail, self).get_object(queryset).get_subclass()
 
-class JobList(ListView):
+class JobList(pagecache.VersionedCacheMixin, ListView):
     model = models.Job
     paginate_by = settings.RIOT_DEFAULT_PAGINATION
 
+    def get_queryset(self):
+        self.filter_form = forms.JobFilterForm(self.request.GET)
+        return self.filter_form.filter(super(JobList, self).get_queryset()).\
+            select_related('namespace', 'upstream_job',
+                           'applicationjob__board',
+                           'applicationjob__application').prefetch_related(
+            'downstream_jobs').annotate(
+            downstream_count=Count('downstream_jobs'))
+
     def get_context_data(self, **kwargs):
         context = super(JobList, self).get_context_data(**kwargs)
+        context['filter_form'] = self.filter_form
         board = models.Board.objects.first()
         application = models.Application.objects.first()
 
@@ -208,6 +217,75 @@ class JobList(ListView):
                                         })+params
         return context
 
+def job_coverage(request):
+    boards, applications, rows = coverage.get_matrix().states()
+    return render(request, 'board_app_creator/job_coverage.html',
+                  {'applications': applications,
+                   'rows': zip(boards, rows),
+                   'states': coverage.STATES})
+
+def job_coverage_json(request):
+    boards, applications, rows = coverage.get_matrix().states()
+    return HttpResponse(json.dumps({'boards': boards,
+                                    'applications': applications,
+                                    'states': dict(coverage.STATES),
+                                    'rows': rows}),
+                        content_type='application/json')
+
+GRAPH_TREE_LIMIT = 1000
+
+def job_graph(request):
+    index = graph.get_graph()
+    context = {'job_count': len(index.names), 'edge_count': index.edge_count,
+               'cycles': index.cycles()}
+    name = request.GET.get('job')
+    if name:
+        if name not in index.index:
+            raise Http404
+        tree = list(itertools.islice(index.tree(name), GRAPH_TREE_LIMIT + 1))
+        context.update({'job': name, 'depth': index.depth(name),
+                        'upstream': index.upstream(name),
+                        'tree': tree[1:GRAPH_TREE_LIMIT],
+                        'truncated': len(tree) > GRAPH_TREE_LIMIT})
+    else:
+        roots = ((n, index.downstream_count(n)) for n in index.root_names())
+        context['roots'] = [(n, count) for n, count in roots if count]
+    return render(request, 'board_app_creator/job_graph.html', context)
+
+def job_graph_json(request):
+    index = graph.get_graph()
+    name = request.GET.get('job')
+    if name:
+        if name not in index.index:
+            raise Http404
+        data = {'job': name, 'depth': index.depth(name),
+                'upstream': index.upstream(name),
+                'downstream': index.downstream(name)}
+    else:
+        data = {'roots': index.root_names(), 'cycles': index.cycles(),
+                'edges': [[index.names[i], index.names[j]]
+                          for i, children in enumerate(index.children)
+                          for j in children]}
+    return HttpResponse(json.dumps(data), content_type='application/json')
+
+def _export_response(format, filename, header, rows):
+    lines, content_type = export.FORMATS[format]
+    response = StreamingHttpResponse(lines(header, rows),
+                                     content_type=content_type)
+    response['Content-Disposition'] = 'attachment; filename="{}.{}"'.format(
+        filename, format)
+    return response
+
+def job_export(request, format):
+    jobs = forms.JobFilterForm(request.GET).filter(models.Job.objects.all())
+    return _export_response(format, 'jobs',
+                            [name for name, _ in export.JOB_FIELDS],
+                            export.iter_jobs(jobs))
+
+def job_coverage_export(request, format):
+    return _export_response(format, 'coverage', export.COVERAGE_FIELDS,
+                            export.iter_coverage())
+
 class JobUpdate(UpdateView):
     form_class = modelform_factory(models.Job, widgets={
         'update_behavior': RadioSelect})
@@ -255,8 +333,8 @@ class ApplicationJobUpdate(JobUpdate):
         return obj
 
 def job_update_all(request):
-    models.Job.create_from_jenkins_xml()
-    return HttpResponseRedirect(reverse_lazy('job-list'))
+    task = _enqueue(request, 'job_update_all')
+    return HttpResponseRedirect(task.get_absolute_url())
 
 def job_update(request, pk):
     job = get_object_or_404(models.Job, pk=pk).get_subclass()
@@ -290,9 +368,8 @@ def job_update_from_board_app(request, board, application):
                      'next_board': next_board,
                      'upstream_job': prototype_job.upstream_job,
                      'namespace': prototype_job.namespace,
-                     'name': prototype_job.name.replace(
-                         prototype_job.board.riot_name, board.riot_name).replace(
-                         prototype_job.application.name, application.name),
+                     'name': generation.job_name_from_prototype(
+                         prototype_job, board, application),
                      'prototype_job': prototype_job} 
                      for prototype_job in prototype_jobs]
         
@@ -319,6 +396,22 @@ def job_update_from_board_app(request, board, application):
             kwargs={'application': next_application,
                     'board': next_board})+params)
 
+def job_bulk_create(request):
+    if request.method == 'POST':
+        form = forms.JobBulkCreateForm(request.POST)
+        if form.is_valid():
+            if form.cleaned_data['all_missing']:
+                task = _enqueue(request, 'job_bulk_create')
+            else:
+                task = _enqueue(request, 'job_bulk_create',
+                    sorted(b.pk for b in form.cleaned_data['boards']),
+                    sorted(a.pk for a in form.cleaned_data['applications']))
+            return HttpResponseRedirect(task.get_absolute_url())
+    else:
+        form = forms.JobBulkCreateForm()
+    return render(request, 'board_app_creator/job_bulk_form.html',
+                  {'form': form})
+
 class RepositoryAddApplicationTrees(View):
     form_class = forms.TreeSelectMultipleForm
     template_name = 'board_app_creator/repository_add_application_trees.html'
@@ -344,36 +437,22 @@ class RepositoryAddApplicationTrees(View):
 
         form = self.form_class(request.POST, choices=choices)
         if form.is_valid():
-            for tree in form.cleaned_data['trees']:
-                for app in repo.vcs_repo.head.get_file(tree).trees:
-                    abs_path = path_join(tree, app.name)
-                    makefile = path_join(abs_path, 'Makefile')
-                    try:
-                        app_name, blacklist, whitelist = models.Application.get_name_and_lists_from_makefile(repo, makefile)
-                    except models.Application.DoesNotExist:
-                        continue
-                    except AssertionError:
-                        continue
-                    appobj = models.Application(name=app_name, path=abs_path)
-                    appobj.save()
-                    app_tree, created = models.ApplicationTree.objects.get_or_create(
-                        tree_name=tree, repo=repo, application=appobj)
-                    for board in models.Board.objects.all():
-                        if board.riot_name in blacklist and board not in appobj.blacklisted_boards.all():
-                            appobj.blacklisted_boards.add(board)
-                        if board.riot_name in whitelist and board not in appobj.blacklisted_boards.all():
-                            appobj.whitelisted_boards.add(board)
-            models.Job.create_from_jenkins_xml()
-            return HttpResponseRedirect(reverse_lazy('repository-list'))
+            task = _enqueue(request, 'repository_add_application_trees',
+                            repo.pk, sorted(form.cleaned_data['trees']))
+            return HttpResponseRedirect(task.get_absolute_url())
         return render(request, self.template_name, {'form': form, 'object': repo})
 
-class RepositoryDetail(DetailView):
+class RepositoryDetail(pagecache.VersionedCacheMixin, DetailView):
     model = models.Repository
 
-class RepositoryList(ListView):
+class RepositoryList(pagecache.VersionedCacheMixin, ListView):
     model = models.Repository
     paginate_by = settings.RIOT_DEFAULT_PAGINATION
 
+    def get_queryset(self):
+        return super(RepositoryList, self).get_queryset().select_related(
+            'job_namespace').prefetch_related('application_trees')
+
 class RepositoryCreate(CreateView):
     model = models.Repository
     form_class = forms.RepositoryForm
@@ -402,8 +481,97 @@ class RepositoryUpdate(UpdateView):
 
 def repository_update_applications_and_boards(request, pk):
     repo = get_object_or_404(models.Repository, pk=pk)
-    repo.update_boards()
-    repo.update_applications()
-    return HttpResponseRedirect(reverse_lazy('repository-list'))
+    task = _enqueue(request, 'repository_update_applications_and_boards',
+                    repo.pk)
+    return HttpResponseRedirect(task.get_absolute_url())
+
+def repository_sync_changes(request, pk):
+    repo = get_object_or_404(models.Repository, pk=pk)
+    task = _enqueue(request, 'repository_sync_changes', repo.pk)
+    return HttpResponseRedirect(task.get_absolute_url())
+
+def repository_impact_json(request, pk):
+    repo = get_object_or_404(models.Repository, pk=pk)
+    old = request.GET.get('old') or repo.synced_commit
+    if not old:
+        raise Http404
+    try:
+        changes = impact.analyze(repo, old, request.GET.get('new'))
+    except ValueError as e:
+        raise Http404(str(e))
+    data = {
+        'old': old, 'new': changes.commit.identifier,
+        'paths': changes.paths, 'unmapped': changes.unmapped,
+        'cpus': sorted(changes.cpu_names),
+        'boards': list(changes.boards().values_list('riot_name', flat=True)),
+        'applications': list(changes.applications().values_list(
+            'name', flat=True)),
+        'jobs': list(changes.jobs().values_list('name', flat=True)),
+    }
+    return HttpResponse(json.dumps(data), content_type='application/json')
+
+def metrics_text(request):
+    return HttpResponse(metrics.render(),
+                        content_type='text/plain; version=0.0.4')
+
+def task_trace(request, pk):
+    task = get_object_or_404(models.Task, pk=pk)
+    parts = tracing.load_parts('task-{}'.format(task.pk))
+    if not parts:
+        raise Http404
+    response = HttpResponse(json.dumps(tracing.merge(parts)),
+                            content_type='application/json')
+    response['Content-Disposition'] = \
+        'attachment; filename="task-{}-trace.json"'.format(task.pk)
+    return response
+
+class TaskDetail(DetailView):
+    model = models.Task
+
+def _sse(event, data, event_id=None):
+    lines = ['event: {}'.format(event), 'data: {}'.format(json.dumps(data))]
+    if event_id is not None:
+        lines.insert(0, 'id: {}'.format(event_id))
+    return '\n'.join(lines) + '\n\n'
+
+def _task_event_stream(task, last_id, keepalive=15):
+    while True:
+        state = progress.since(task.pk, last_id, keepalive)
+        if state is None:
+            # task is queued or its events expired: report its status only
+            task = models.Task.objects.get(pk=task.pk)
+            yield _sse('status', task.get_status_display())
+            if task.is_finished():
+                yield _sse('end', task.get_status_display())
+                return
+            time.sleep(2)
+            continue
+        events, closed = state
+        for event in events:
+            yield _sse('progress', event, event['id'])
+            last_id = event['id']
+        if closed and not events:
+            task = models.Task.objects.get(pk=task.pk)
+            yield _sse('end', task.get_status_display())
+            return
+        if not events:
+            yield ': keepalive\n\n'
+
+def task_events(request, pk):
+    task = get_object_or_404(models.Task, pk=pk)
+    try:
+        last_id = int(request.META.get('HTTP_LAST_EVENT_ID',
+                                       request.GET.get('last_event_id', 0)))
+    except ValueError:
+        last_id = 0
+    response = StreamingHttpResponse(_task_event_stream(task, last_id),
+                                     content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+class TaskList(ListView):
+    model = models.Task
+    paginate_by = settings.RIOT_DEFAULT_PAGINATION
 
 # Create your views here.
@@ -16,7 +16,8 @@ def after_install(option, home_dir):
                      'django-model-utils',
                      'lxml',
                      'pygit2',
-                     'python-social-auth'])
+                     'python-social-auth',
+                     'requests'])
     subprocess.call([os.path.join(home_dir, 'bin', 'python'),
                      os.path.join(home_dir, '..', 'manage.py'),
                      'syncdb'])
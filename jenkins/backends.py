@@ -0,0 +1,211 @@
+"""Storage backends for Jenkins job configurations"""
+import threading
+import time
+from os import listdir, makedirs
+from os.path import exists, isdir, join as path_join
+from multiprocessing.pool import ThreadPool
+from urllib import quote
+
+from registry import Registry
+
+class Backend(object):
+    """
+    Abstract storage of Jenkins job configurations (config.xml).
+    """
+    def __str__(self):
+        return str(self.location(''))
+
+    def __repr__(self):
+        t = type(self)
+        return "<{}.{}: {}>".format(t.__module__, t.__name__, str(self))
+
+    def location(self, name):
+        """Human readable location of the config of job name"""
+        raise NotImplementedError
+
+    def list_jobs(self):
+        """Lists the names of all jobs"""
+        raise NotImplementedError
+
+    def exists(self, name):
+        """Checks if a job with the given name exists"""
+        return self.read(name) is not None
+
+    def read(self, name):
+        """Returns the content of the config of job name or None"""
+        raise NotImplementedError
+
+    def read_many(self, names, workers=None):
+        """
+        Returns a dict mapping each of names to its config or None. Storages
+        that read in parallel use up to workers threads.
+        """
+        return dict((name, self.read(name)) for name in names)
+
+    def write(self, name, config):
+        """Creates or updates the config of job name"""
+        raise NotImplementedError
+
+class FilesystemBackend(Backend):
+    """
+    Job configurations in a directory like JENKINS_HOME/jobs.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def location(self, name):
+        if not name:
+            return self.path
+        return path_join(self.path, name, 'config.xml')
+
+    def list_jobs(self):
+        return listdir(self.path)
+
+    def exists(self, name):
+        return exists(self.location(name))
+
+    def read(self, name):
+        try:
+            with open(self.location(name)) as fileobj:
+                return fileobj.read()
+        except IOError:
+            return None
+
+    def write(self, name, config):
+        job_dir = path_join(self.path, name)
+        if not isdir(job_dir):
+            makedirs(job_dir)
+        with open(self.location(name), 'w') as fileobj:
+            fileobj.write(config)
+
+class HTTPError(Exception):
+    """Raised if the Jenkins server answers with an unexpected status"""
+    def __init__(self, status, url):
+        super(HTTPError, self).__init__(
+            "Jenkins answered {} for {}".format(status, url))
+        self.status = status
+        self.url = url
+
+class HTTPBackend(Backend):
+    """
+    Job configurations of a remote Jenkins, accessed via its REST API.
+
+    All requests go through one keep-alive session whose connection pool
+    holds pool_size connections. At most pool_size requests are in flight
+    at the same time; failed connections and 5xx answers are retried
+    max_retries times with exponential backoff.
+    """
+    RETRY_STATUS = (500, 502, 503, 504)
+
+    def __init__(self, url, user=None, token=None, pool_size=4, max_retries=3,
+                 backoff=0.5, timeout=30):
+        import requests
+        self.url = url.rstrip('/')
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1,
+                                                pool_maxsize=pool_size,
+                                                pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if user:
+            self.session.auth = (user, token)
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._crumb = None
+
+    def _job_url(self, name, endpoint=''):
+        return "{}/job/{}/{}".format(self.url, quote(name, safe=''), endpoint)
+
+    def _request(self, method, url, **kwargs):
+        import requests
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            try:
+                with self._slots:
+                    response = self.session.request(method, url, **kwargs)
+                if response.status_code not in self.RETRY_STATUS or \
+                   attempt >= self.max_retries:
+                    return response
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+            time.sleep(self.backoff * (2 ** attempt))
+            attempt += 1
+
+    def _post_headers(self):
+        if self._crumb is None:
+            response = self._request('GET',
+                                     self.url + '/crumbIssuer/api/json')
+            if response.status_code == 200:
+                crumb = response.json()
+                self._crumb = {crumb['crumbRequestField']: crumb['crumb']}
+            else:
+                self._crumb = {}
+        headers = {'Content-Type': 'application/xml'}
+        headers.update(self._crumb)
+        return headers
+
+    def location(self, name):
+        if not name:
+            return self.url
+        return self._job_url(name, 'config.xml')
+
+    def list_jobs(self):
+        url = self.url + '/api/json'
+        response = self._request('GET', url, params={'tree': 'jobs[name]'})
+        if response.status_code != 200:
+            raise HTTPError(response.status_code, url)
+        return [job['name'] for job in response.json().get('jobs', [])]
+
+    def exists(self, name):
+        url = self._job_url(name, 'api/json')
+        response = self._request('GET', url, params={'tree': 'name'})
+        if response.status_code not in (200, 404):
+            raise HTTPError(response.status_code, url)
+        return response.status_code == 200
+
+    def read(self, name):
+        url = self.location(name)
+        response = self._request('GET', url)
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise HTTPError(response.status_code, url)
+        return response.content
+
+    def _map(self, func, items, workers=None):
+        """func of each of items, run in workers (pool_size) threads"""
+        pool = ThreadPool(workers or self.pool_size)
+        try:
+            return pool.map(func, items)
+        finally:
+            pool.close()
+
+    def read_many(self, names, workers=None):
+        names = list(names)
+        return dict(zip(names, self._map(self.read, names, workers)))
+
+    def write(self, name, config):
+        if self.exists(name):
+            url = self.location(name)
+            params = None
+        else:
+            url = self.url + '/createItem'
+            params = {'name': name}
+        response = self._request('POST', url, params=params, data=config,
+                                 headers=self._post_headers())
+        if response.status_code not in (200, 201):
+            raise HTTPError(response.status_code, url)
+
+# further storages register their class path here and are imported on use
+backends = Registry('job storage')
+backends.register('filesystem', 'jenkins.backends.FilesystemBackend')
+backends.register('http', 'jenkins.backends.HTTPBackend')
+
+def get_backend(backend='filesystem', *args, **kwargs):
+    """Get the implementation of a job configuration storage by its name"""
+    return backends.get(backend)(*args, **kwargs)
@@ -1,34 +1,52 @@
 """Parses and creates Jenkins jobs"""
 import copy
 import re
-from os import makedirs
-from os.path import basename, dirname, exists, join as path_join
+from os.path import basename, dirname
 from lxml import etree
 
+from .backends import FilesystemBackend
+
 class Job(object):
     """
     Abstraction layer for Jenkins jobs.
+
+    The configuration is read from and written to backend, by default the
+    directory path lies in. It is only read if config is None.
     """
-    def __init__(self, path):
+    def __init__(self, path, backend=None, config=None):
         path = re.sub('/*$', '', path)
         self.name = basename(path)
-        self.filename = path_join(path, 'config.xml')
-        if exists(self.filename):
-            self.fileobj = open(self.filename)
-            self.filetree = etree.parse(self.fileobj)
-        else:
-            self.fileobj = None
-            self.filetree = None
+        if backend == None:
+            backend = FilesystemBackend(dirname(path))
+        self.backend = backend
+        self.filename = backend.location(self.name)
+        self.load(backend.read(self.name) if config is None else config)
 
     def __getitem__(self, key):
         raise KeyError(key)
 
+    def load(self, config):
+        """Parses config into the job's XML tree"""
+        self.config = config
+        if config != None:
+            self.filetree = etree.ElementTree(etree.fromstring(config))
+        else:
+            self.filetree = None
+
+    def save(self):
+        """Writes the job's XML tree back to the backend"""
+        config = etree.tostring(self.filetree, pretty_print=True,
+                                xml_declaration=True, encoding='UTF-8')
+        self.backend.write(self.name, config)
+        self.load(config)
+
 class ApplicationJob(Job):
     """
     Abstraction layer for the Jenkins application job
     """
-    def __init__(self, path, board, application_name, application_path):
-        super(ApplicationJob, self).__init__(path)
+    def __init__(self, path, board, application_name, application_path,
+                 backend=None):
+        super(ApplicationJob, self).__init__(path, backend)
         self.board = board
         self.application_name = application_name
         self.application_path = application_path
@@ -45,22 +63,19 @@ class ApplicationJob(Job):
         prototype_board = str(prototype_job.board)
         prototype_application_name = str(prototype_job.application_name)
         prototype_application_path = str(prototype_job.application_path)
+        if prototype_job.config == None:
+            raise ValueError("{} has no config".format(prototype_job.name))
         if hasattr(prototype_job, 'compiler'):
             prototype_compiler = prototype_job.compiler
         else:
             prototype_compiler = None
-        prototype_fileobj = prototype_job.fileobj
 
         if (not prototype_compiler and self.compiler) or \
            (prototype_compiler and not self.compiler):
             raise ValueError("Both jobs do need a compiler or do not have any.")
 
-        if not self.fileobj:
-            makedirs(dirname(self.filename))
-
-        self.fileobj = open(self.filename, 'w')
-
-        for proto_line in prototype_fileobj.readlines():
+        lines = []
+        for proto_line in prototype_job.config.splitlines(True):
             line = re.sub(prototype_board, self.board, proto_line)
             line = re.sub(prototype_application_name, self.application_name,
                           line)
@@ -69,14 +84,18 @@ class ApplicationJob(Job):
             if prototype_compiler and self.compiler:
                 line = re.sub(prototype_compiler, self.compiler,
                               line)
-            self.fileobj.write(line)
+            lines.append(line)
 
-        self.fileobj.close()
-        self.fileobj = open(self.filename)
+        config = ''.join(lines)
+        if isinstance(config, unicode):
+            # names from the data base make the substituted lines unicode
+            config = config.encode('utf-8')
+        self.backend.write(self.name, config)
+        self.load(config)
 
 class MultiJob(Job):
-    def __init__(self, path):
-        super(MultiJob, self).__init__(path)
+    def __init__(self, path, backend=None, config=None):
+        super(MultiJob, self).__init__(path, backend, config)
         if (self.filetree == None):
             raise ValueError("{} does not exist".format(path))
         if (self.filetree.getroot().tag != "com.tikal.jenkins.plugins.multijob.MultiJobProject"):
@@ -94,24 +113,49 @@ class MultiJob(Job):
         for jobname in self.filetree.xpath('//jobName/text()'):
             yield jobname
 
-    def update_job_by_prototype(self, job, prototype_job):
+    def update_job_by_prototype(self, job, prototype_job, save=True):
+        """
+        Adds job to the phase of prototype_job, with a copy of the
+        prototype's entry. Pass save=False to write several updates at once
+        with save().
+        """
         entry = self[prototype_job.name]
+        parent = entry.getparent()
         try:
-            new_entry = self[job]
-            parent = new_entry.getparent()
-            parent.remove(new_entry)
+            old_entry = self[job.name]
+            old_entry.getparent().remove(old_entry)
         except KeyError:
-            new_entry = copy.deepcopy(entry)
-            parent = new_entry.getparent()
-
+            pass
+        new_entry = copy.deepcopy(entry)
         new_entry.find('jobName').text = job.name
-        # look if phase is the right one.
-        unique_list = {}
-        unique_list[job.name] = new_entry
-        for e in parent:
-            job_name = e.find('jobName').text
-            if job_name not in unique_list:
-                unique_list[job.name] = e
-
-        parent[:] = sorted(unique_list.values(), key=lambda x: x.find('jobName').text)
-        self.filetree.write(self.fileobj, pretty_print=True)
+
+        entries = dict((e.find('jobName').text, e) for e in parent)
+        entries[job.name] = new_entry
+        parent[:] = [entries[name] for name in sorted(entries)]
+        if save:
+            self.save()
+
+    def update_jobs_by_prototype(self, pairs, save=True):
+        """
+        update_job_by_prototype() for many (job, prototype job) pairs,
+        sorting every phase only once.
+        """
+        index = dict((e.text, e.getparent())
+                     for e in self.filetree.iter('jobName'))
+        phases = set()
+        for job, prototype_job in pairs:
+            entry = index[prototype_job.name]
+            # before the removal, job may be the prototype itself
+            parent = entry.getparent()
+            old_entry = index.get(job.name)
+            if old_entry is not None:
+                old_entry.getparent().remove(old_entry)
+            new_entry = copy.deepcopy(entry)
+            new_entry.find('jobName').text = job.name
+            parent.append(new_entry)
+            index[job.name] = new_entry
+            phases.add(parent)
+        for parent in phases:
+            parent[:] = sorted(parent, key=lambda e: e.find('jobName').text)
+        if save:
+            self.save()
@@ -0,0 +1,96 @@
+"""
+Lazily loaded implementations and post import hooks.
+
+A Registry maps names to the dotted paths of implementations, which are
+only imported when they are first asked for, so that importing the code
+that uses them does not import their dependencies (e.g. pygit2 or lxml).
+when_imported() runs a callback once a module is imported, so modules can
+be patched without importing them.
+"""
+import imp
+import sys
+import threading
+
+class Registry(object):
+    """Implementations of kind by name, given as 'package.module.Name'"""
+    def __init__(self, kind):
+        self.kind = kind
+        self._paths = {}
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, name):
+        return name in self._paths
+
+    def register(self, name, path):
+        """Registers the implementation at path (or an object) as name"""
+        with self._lock:
+            self._loaded.pop(name, None)
+            if isinstance(path, basestring):
+                self._paths[name] = path
+            else:
+                self._paths[name] = None
+                self._loaded[name] = path
+
+    def names(self):
+        return sorted(self._paths)
+
+    def get(self, name):
+        """The implementation registered as name, imported on first use"""
+        try:
+            return self._loaded[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._paths:
+                raise ValueError("Unknown {} {}".format(self.kind, name))
+            if name not in self._loaded:
+                module, _, attr = self._paths[name].rpartition('.')
+                __import__(module)
+                self._loaded[name] = getattr(sys.modules[module], attr)
+            return self._loaded[name]
+
+_hooks = {}
+
+class _PostImportFinder(object):
+    """
+    Finder on sys.meta_path that imports modules with hooks through the
+    other finders and then runs their hooks.
+    """
+    def __init__(self):
+        self._importing = set()
+
+    def find_module(self, fullname, path=None):
+        if fullname in _hooks and fullname not in self._importing:
+            return self
+        return None
+
+    def load_module(self, fullname):
+        self._importing.add(fullname)
+        try:
+            __import__(fullname)
+        finally:
+            self._importing.discard(fullname)
+        module = sys.modules[fullname]
+        for callback in _hooks.pop(fullname, ()):
+            callback(module)
+        return module
+
+_finder = _PostImportFinder()
+
+def when_imported(name, callback):
+    """
+    Calls callback(module) when module name is imported, at once if it is
+    imported already.
+    """
+    imp.acquire_lock()
+    try:
+        module = sys.modules.get(name)
+        if module is None:
+            if _finder not in sys.meta_path:
+                sys.meta_path.insert(0, _finder)
+            _hooks.setdefault(name, []).append(callback)
+            return
+    finally:
+        imp.release_lock()
+    callback(module)
@@ -10,6 +10,7 @@ https://docs.djangoproject.com/en/1.6/ref/settings/
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 import os
+import tempfile
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 
 
@@ -51,6 +52,7 @@ LOGIN_URL = "/jobs/social_auth/login/github-org/"
 LOGOUT_URL = "/jobs/logout"
 
 MIDDLEWARE_CLASSES = (
+    'board_app_creator.metrics.MetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -69,6 +71,24 @@ TEMPLATE_CONTEXT_PROCESSORS = (
     'social.apps.django_app.context_processors.login_redirect',
 )
 
+# Cache
+# https://docs.djangoproject.com/en/1.6/ref/settings/#caches
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'riot-job-manager',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # shared by all processes of this host; use memcached if the web and
+    # task worker processes run on several hosts
+    'progress': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(),
+                                 'riot-job-manager-progress'),
+    },
+}
+
 # Database
 # https://docs.djangoproject.com/en/1.6/ref/settings/#databases
 
@@ -79,6 +99,15 @@ DATABASES = {
     }
 }
 
+# Pragmas set on every new SQLite connection: WAL lets pages be read while
+# a sync writes, and with WAL, synchronous=NORMAL only syncs at checkpoints.
+# A negative cache_size is in KiB.
+RIOT_SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -16000),
+)
+
 # Internationalization
 # https://docs.djangoproject.com/en/1.6/topics/i18n/
 
@@ -103,8 +132,74 @@ SOCIAL_AUTH_GITHUB_ORG_NAME = 'RIOT-OS'
 SOCIAL_AUTH_GITHUB_ORG_SCOPE = ['read:org']
 
 JENKINS_JOBS_PATH = '/var/lib/jenkins/jobs'
+# 'filesystem' reads and writes JENKINS_JOBS_PATH, 'http' talks to the REST
+# API of the Jenkins at JENKINS_URL
+JENKINS_JOBS_BACKEND = 'filesystem'
+JENKINS_URL = 'http://localhost:8080'
+JENKINS_USER = None
+JENKINS_API_TOKEN = None
+JENKINS_HTTP_POOL_SIZE = 4
+JENKINS_HTTP_RETRIES = 3
+JENKINS_HTTP_BACKOFF = 0.5
 
 RIOT_DEFAULT_PAGINATION = 20
+# Seconds cached pages are kept. They are never stale since their cache keys
+# contain the change counters of the tables they show.
+RIOT_PAGE_CACHE_TIMEOUT = 600
 RIOT_REPO_BASE_PATH = os.path.join(BASE_DIR, 'repos')
 RIOT_DEFAULT_APPLICATIONS = ['default']
 RIOT_DEFAULT_BOARDS = ['msba2']
+# Seconds until the cached list of connected USB devices is refreshed
+RIOT_USB_SNAPSHOT_TTL = 30
+# Number of task worker threads started in each web process. Set to 0 if
+# tasks are executed by `manage.py runtaskworker` instead.
+RIOT_TASK_WORKER_THREADS = 1
+# Cache the progress events of running tasks are passed through to the web
+# processes (see board_app_creator.progress)
+RIOT_PROGRESS_CACHE = 'progress'
+# Directory the trace parts of traced tasks are written to
+RIOT_TRACE_DIR = os.path.join(BASE_DIR, 'traces')
+# Seconds reconciliation plans are cached. They are keyed by the hash of
+# their inputs, so a cached plan is never stale.
+RIOT_RECONCILE_PLAN_TIMEOUT = 3600
+# Number of job configs the reconciliation executor writes at once
+RIOT_RECONCILE_WRITERS = 4
+# Seconds jobs, boards and applications that vanished upstream are kept
+# before they are deleted (see board_app_creator.orphans)
+RIOT_ORPHAN_RETENTION = 7 * 24 * 3600
+# Class flashing and testing applications on the connected boards and the
+# number of boards flashed or tested at once per USB bus (see
+# board_app_creator.hil)
+RIOT_HIL_FLASHER = 'board_app_creator.hil.MakeFlasher'
+# Serial ports passed to make as PORT by USB device node, e.g.
+# {'/dev/bus/usb/001/004': '/dev/ttyACM0'}. Device nodes not listed here
+# are looked up in sysfs.
+RIOT_HIL_TTYS = {}
+RIOT_HIL_HUB_CONCURRENCY = 2
+# Times a request is queued again when its device disappears before it fails
+RIOT_HIL_MAX_ATTEMPTS = 3
+# Upper bounds in seconds of the request and task latency histograms
+RIOT_METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5,
+                        10, 30, 60, 300)
+
+# One JSON line per request and task (see board_app_creator.metrics)
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'board_app_creator': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+        },
+        'board_app_creator.metrics': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
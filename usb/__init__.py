@@ -3,6 +3,10 @@ Gives access and parses output of lsusb into python objects.
 """
 import re
 import subprocess
+import threading
+import time
+from glob import glob
+from os.path import basename, join as path_join
 
 class USBDevice(object):
     """
@@ -21,12 +25,18 @@ class USBDevice(object):
         return "<{}.{}: {}>".format(t.__module__, t.__name__, str(self))
 
 
+def lsusb():
+    """
+    Output of lsusb
+    """
+    return subprocess.check_output("lsusb", shell=True)
+
 def get_device_list():
     """
     Generator for USBDevice types
     """
     device_re = re.compile(r"Bus\s+(?P<bus>\d+)\s+Device\s+(?P<device>\d+).+ID\s(?P<usb_id>\w+:\w+)\s(?P<tag>.+)$", re.I)
-    device_output = subprocess.check_output("lsusb", shell=True)
+    device_output = lsusb()
     for i in device_output.split('\n'):
         info = device_re.match(i)
         if info:
@@ -35,3 +45,71 @@ def get_device_list():
                 dinfo.pop('bus'), dinfo.pop('device'))
             yield USBDevice(**dinfo)
 
+def tty(device, sysfs='/sys/bus/usb/devices'):
+    """
+    The serial port (/dev/ttyACM0, /dev/ttyUSB0, ...) of the USB device at
+    device (/dev/bus/usb/<bus>/<device>), found in sysfs, or None
+    """
+    match = re.match(r'/dev/bus/usb/(\d+)/(\d+)$', device)
+    if not match:
+        return None
+    wanted = tuple(int(n) for n in match.groups())
+    for path in glob(path_join(sysfs, '*')):
+        try:
+            with open(path_join(path, 'busnum')) as busnum, \
+                 open(path_join(path, 'devnum')) as devnum:
+                numbers = (int(busnum.read()), int(devnum.read()))
+        except (IOError, ValueError):
+            # an interface or no device
+            continue
+        if numbers != wanted:
+            continue
+        # ttyUSB<n> below the interface, ttyACM<n> in its tty directory
+        names = sorted(set(basename(t) for t in
+                           glob(path_join(path, '*', 'tty*')) +
+                           glob(path_join(path, '*', 'tty', 'tty*'))
+                           if re.match(r'tty\D+\d+$', basename(t))))
+        return '/dev/' + names[0] if names else None
+    return None
+
+class Snapshot(object):
+    """
+    Cached device list of get_device_list().
+
+    The first call of devices() takes the list synchronously. Later calls
+    return the cached list immediately and, once it is older than ttl
+    seconds, refresh it in a background thread.
+    """
+    def __init__(self, ttl, source=get_device_list):
+        self.ttl = ttl
+        self._source = source
+        self._devices = None
+        self._taken = 0
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Takes the device list synchronously"""
+        try:
+            devices = tuple(sorted(self._source(),
+                                   key=lambda d: (d.device, d.usb_id)))
+            with self._lock:
+                self._devices = devices
+                self._taken = time.time()
+        finally:
+            self._refreshing = False
+        return devices
+
+    def devices(self):
+        """The cached device list, sorted by device path"""
+        with self._lock:
+            devices = self._devices
+            stale = time.time() - self._taken >= self.ttl
+            if devices is not None and stale and not self._refreshing:
+                self._refreshing = True
+                thread = threading.Thread(target=self.refresh)
+                thread.daemon = True
+                thread.start()
+        if devices is None:
+            devices = self.refresh()
+        return devices
@@ -1,19 +1,20 @@
 """Provides abstract layer to version control systems"""
 from os.path import isdir, exists, join as path_join
 
-from ._vcs import Repository, Commit, Tree, Blob
-import vcs.git as git
-from pygit2 import GitError as VCSError
+from registry import Registry
 
-__REPO_IMPL = {
-    'git': git.GitRepository,
-}
+from ._vcs import Repository, Commit, Tree, Blob, VCSError
+
+# implementations are imported on first use, keeping pygit2 out of startup
+backends = Registry('VCS')
+backends.register('git', 'vcs.git.GitRepository')
 
 def get_repository(directory, vcs='git', url=None):
     """Get the implementation of a Repository based on its actual VCS"""
     if exists(directory) and not isdir(directory):
         raise ValueError("{} is not a directory".format(directory))
+    impl = backends.get(vcs)
     if url == None:
-        return __REPO_IMPL[vcs](directory)
+        return impl(directory)
     else:
-        return __REPO_IMPL[vcs](directory, url)
+        return impl(directory, url)
@@ -1,5 +1,9 @@
 """Provides abstract layer to version control systems"""
 
+class VCSError(Exception):
+    """Error of the underlying VCS, e.g. an unreachable remote"""
+    pass
+
 class Repository(object):
     """Abstract VCS repository"""
     def __init__(self, directory):
@@ -37,6 +41,10 @@ class Repository(object):
         """Returns the commit the repository is currently on"""
         raise NotImplementedError
 
+    def get_commit(self, identifier):
+        """Returns the commit identified by identifier"""
+        raise NotImplementedError
+
 class Commit(object):
     """Abstract VCS commit/patch"""
     def __init__(self, identifier):
@@ -60,6 +68,13 @@ class Commit(object):
         """
         return self.get_file('.')
 
+    def diff(self, other):
+        """
+        Generate the paths of the files that differ between the commit and
+        other. (see Tree.diff())
+        """
+        return self.base_tree.diff(other.base_tree)
+
 class Tree(object):
     """Abstract VCS tree/repository"""
     def __init__(self, identifier, name):
@@ -98,6 +113,14 @@ class Tree(object):
         top-down. (see pythons os.walk())
         """
 
+    def diff(self, other):
+        """
+        Generate the paths of the files that were added, removed or changed
+        between the tree and the Tree object other (None for an empty tree).
+        Subtrees with the same identifier in both are skipped.
+        """
+        raise NotImplementedError
+
 class Blob(object):
     """Abstract VCS blob/file"""
     def __init__(self, identifier, name):
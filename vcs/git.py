@@ -1,7 +1,7 @@
 """Provides an abstraction layer to pygit2"""
 from os.path import join as path_join, isdir
 import pygit2
-from . import Repository, Commit, Tree, Blob
+from . import Repository, Commit, Tree, Blob, VCSError
 
 class GitRepository(Repository):
     """A basic Git repository"""
@@ -9,7 +9,7 @@ class GitRepository(Repository):
         try:
             self.directory = pygit2.discover_repository(path_join(directory))
             self._repo = pygit2.Repository(directory)
-        except KeyError as e:
+        except (KeyError, pygit2.GitError) as e:
             if url != None:
                 self._repo = None
                 self.url = url
@@ -33,17 +33,19 @@ class GitRepository(Repository):
     def is_repository(directory):
         """Checks if the repository is a VCS repository"""
         try:
-            pygit2.discover_repository(path_join(directory))
-            return True
-        except KeyError:
+            return pygit2.discover_repository(path_join(directory)) is not None
+        except (KeyError, pygit2.GitError):
             return False
 
 
     def clone(self):
         """Clones the repository to local machine"""
-        self._repo = pygit2.clone_repository(
-            self.url, self.directory, bare=True, remote_name='origin',
-            checkout_branch=self.default_branch)
+        try:
+            self._repo = pygit2.clone_repository(
+                self.url, self.directory, bare=True, remote_name='origin',
+                checkout_branch=self.default_branch)
+        except pygit2.GitError as e:
+            raise VCSError(str(e))
         self.directory = self._repo.workdir
 
     def fetch(self, remote_name):
@@ -57,7 +59,10 @@ class GitRepository(Repository):
             raise KeyError("Remote {} not found in local repository",
                            remote_name)
 
-        remote[0].fetch()
+        try:
+            remote[0].fetch()
+        except pygit2.GitError as e:
+            raise VCSError(str(e))
 
     def pull(self, branch=None):
         """Fetches data from remote and merges branch into branch"""
@@ -81,11 +86,28 @@ class GitRepository(Repository):
                 "Branch {} has no upstream".format(ours.branch_name))
 
         self.fetch(theirs.remote_name)
-        self._repo.head = theirs.name
+        if hasattr(self._repo, 'set_head'):
+            self._repo.set_head(theirs.name)
+        else:
+            self._repo.head = theirs.name
 
     @property
     def head(self):
-        return GitCommit(self._repo, self._repo.head.get_object())
+        head = self._repo.head
+        if hasattr(head, 'peel'):
+            return GitCommit(self._repo, head.peel(pygit2.Commit))
+        return GitCommit(self._repo, head.get_object())
+
+    def get_commit(self, identifier):
+        try:
+            obj = self._repo.revparse_single(identifier)
+        except (KeyError, ValueError, pygit2.GitError):
+            raise ValueError("{} is no commit in {}".format(identifier, self))
+        if obj.type == pygit2.GIT_OBJ_TAG:
+            obj = self._repo.get(obj.target)
+        if obj.type != pygit2.GIT_OBJ_COMMIT:
+            raise ValueError("{} is no commit in {}".format(identifier, self))
+        return GitCommit(self._repo, obj)
 
 class GitCommit(Commit):
     """A basic Git commit"""
@@ -169,6 +191,34 @@ class GitTree(Tree):
         for entry in self._walk():
             yield entry
 
+    def diff(self, other):
+        stack = [('', self._tree, other._tree if other is not None else None)]
+        while stack:
+            prefix, old, new = stack.pop()
+            old_entries = dict((e.name, e) for e in old) if old is not None else {}
+            new_entries = dict((e.name, e) for e in new) if new is not None else {}
+            for name in sorted(set(old_entries) | set(new_entries)):
+                old_entry = old_entries.get(name)
+                new_entry = new_entries.get(name)
+                if old_entry is not None and new_entry is not None and \
+                   old_entry.oid == new_entry.oid:
+                    continue
+                path = prefix + name
+                old_tree = new_tree = None
+                if old_entry is not None:
+                    if old_entry.filemode == pygit2.GIT_FILEMODE_TREE:
+                        old_tree = self._repo.get(old_entry.oid)
+                    else:
+                        yield path
+                if new_entry is not None:
+                    if new_entry.filemode == pygit2.GIT_FILEMODE_TREE:
+                        new_tree = self._repo.get(new_entry.oid)
+                    elif old_entry is None or \
+                         old_entry.filemode == pygit2.GIT_FILEMODE_TREE:
+                        yield path
+                if old_tree is not None or new_tree is not None:
+                    stack.append((path + '/', old_tree, new_tree))
+
 class GitBlob(Blob):
     """A basic Git blob"""
     def __init__(self, repo, blob_object, name):